@@ -0,0 +1,19 @@
+'''
+Compare odyCy tagging throughput (tokens/s) for different batch sizes, with and without sorting sentences by length,
+to find the best settings for the machine at hand. Pass the winners to Macronizer(batch_size=..., sort_by_length=...).
+
+Pipeline components can be left out with e.g. DISABLE = ["parser", "ner"] (see the component names logged on load);
+check that the macronization output stays the same before relying on it.
+'''
+
+from grc_macronizer import Macronizer
+from grc_macronizer.tests.anabasis import anabasis_medium # "Anabasis" by Xenophon
+
+BATCH_SIZES = [16, 64, 256]
+DISABLE = []
+
+for sort_by_length in (False, True):
+    for batch_size in BATCH_SIZES:
+        macronizer = Macronizer(make_prints=False, doc_from_file=False, batch_size=batch_size, sort_by_length=sort_by_length, disable=DISABLE)
+        macronizer.macronize(anabasis_medium)
+        print(f"batch_size={batch_size:<5} sort_by_length={sort_by_length!s:<6} {macronizer.tokens_per_second:8.0f} tokens/s")
@@ -1,24 +1,38 @@
+import json
 import os
 from collections import defaultdict
 
-def aggregate_word_counts_from_tsv(folder_path):
+def aggregate_word_counts(folder_path):
+    '''
+    Sums the still-ambiguous words over the consolidated diagnostics files (diagnostics_*.json) in folder_path,
+    and over the still_ambiguous_*.tsv files of older versions in folder_path/still_ambiguous, if there are any.
+    '''
     word_counts = defaultdict(int)
 
     for filename in os.listdir(folder_path):
-        if filename.endswith('.tsv'):
+        if filename.startswith('diagnostics_') and filename.endswith('.json'):
             with open(os.path.join(folder_path, filename), encoding='utf-8') as f:
-                for line in f:
-                    parts = line.strip().split('\t')
-                    if len(parts) >= 2 and parts[0].isdigit():
-                        count = int(parts[0])
-                        word = parts[1]
-                        word_counts[word] += count
+                diagnostics = json.load(f)
+            for count, word, *analysis in diagnostics["still_ambiguous"]:
+                word_counts[word] += count
+
+    legacy_path = os.path.join(folder_path, 'still_ambiguous')
+    if os.path.isdir(legacy_path):
+        for filename in os.listdir(legacy_path):
+            if filename.endswith('.tsv'):
+                with open(os.path.join(legacy_path, filename), encoding='utf-8') as f:
+                    for line in f:
+                        parts = line.strip().split('\t')
+                        if len(parts) >= 2 and parts[0].isdigit():
+                            count = int(parts[0])
+                            word = parts[1]
+                            word_counts[word] += count
 
     return dict(word_counts)
 
 if __name__ == "__main__":
-    folder_path = 'diagnostics/still_ambiguous'
-    counts = aggregate_word_counts_from_tsv(folder_path)
+    folder_path = 'diagnostics'
+    counts = aggregate_word_counts(folder_path)
 
     with open('oga_still_ambiguous.tsv', 'w', encoding='utf-8') as f:
         for word, count in sorted(counts.items(), key=lambda x: x[1], reverse=True):
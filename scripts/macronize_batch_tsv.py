@@ -1,34 +1,28 @@
 '''
-The Macronizer is very CPU intensive. On a system with multiple cores, ProcessPoolExecutor can speed up the process.
-Assuming a quadcore system as per default, I divide the input text into four parts and set max_workers=4.
-The Macronizer is faster if left to do its own sentence splitting, whence I will feed it four maximally long batches of texts.
+The Macronizer is very CPU intensive. On a system with multiple cores, Macronizer.macronize_parallel spreads the work over a pool of processes.
+The sentences are fed to it as a work queue of modest chunks, so the workers stay busy until the end and the output comes back in order.
+Each worker loads its own odyCy pipeline (the databases are shared), with torch limited to its share of the cores.
 
-Note that on MacOS the script is re-imported in each worker, so that only picklable code can stay outside the __main__ block.
+Note that on MacOS and Windows the workers are spawned, not forked, so each of them re-imports this script: everything that should run once must stay in the __main__ block.
 
-This script is (at least initially!) *really* taxing on everyday computers because it runs four instances of the AI parts of the spaCy pipeline concurrently, and should either be run
+This script is (at least initially!) *really* taxing on everyday computers because it runs several instances of the AI parts of the spaCy pipeline concurrently, and should either be run
     1) on a cluster or a powerful desktop or
-    2) with `nice -n 19` and after having switched to max_workers=2 to avoid hangs or crashing the OS.
+    2) with `nice -n 19` and with fewer workers (the optional third argument, default 4) to avoid hangs or crashing the OS.
 
 '''
 
-from concurrent.futures import ProcessPoolExecutor
 import re
 import sys
 
 from grc_macronizer import Macronizer
 from grc_utils import count_dichrona_in_open_syllables
 
-# -- Prepare the picklable fnc for the executor.map --
-
-def macronize_batch(batch):
-    macronizer = Macronizer(make_prints=False)
-    return macronizer.macronize(batch)
-
 if __name__ == "__main__":
     # -- args --
 
     input_file = sys.argv[1]
     output_file = sys.argv[2]
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else 4
 
     # -- Reading --
 
@@ -47,32 +41,12 @@ if __name__ == "__main__":
         print("No sentences found in input.")
         sys.exit(1)
 
-    # -- Batching --
-
-    length = len(input_sentences)
-    batch_size = length // 4
-
-    batches = [
-        "".join(input_sentences[:batch_size]),
-        "".join(input_sentences[batch_size:2 * batch_size]),
-        "".join(input_sentences[2 * batch_size:3 * batch_size]),
-        "".join(input_sentences[3 * batch_size:])
-    ]
-
     print("Finished preparation... Ready to execute!")
 
     # -- Executing --
 
-    with ProcessPoolExecutor(max_workers=4) as executor:
-        output_list = executor.map(macronize_batch, batches)
-
-    output_text = "".join(output_list)
-    output_sentences = re.findall(r'.+?[.\n;\u037e]', output_text, flags=re.DOTALL)
-
-    # -- Sanity check --
-
-    if len(input_sentences) != len(output_sentences):
-        print(f"WARNING: sentence count mismatch: {len(input_sentences)} input vs {len(output_sentences)} output")
+    macronizer = Macronizer(make_prints=False)
+    output_sentences = list(macronizer.macronize_parallel(input_sentences, workers=workers)) # one output per input sentence, in order
 
     # -- Writing output .tsv --
 
@@ -1,7 +1,8 @@
 import sys
 
-from grc_macronizer import Macronizer
+from grc_macronizer import configure_logging, Macronizer
 
+configure_logging() # full per-token trace in diagnostics/logs
 macronizer = Macronizer(make_prints=True)
 
 input_file = sys.argv[1]
@@ -18,7 +18,7 @@ import signal
 import time
 from tqdm import tqdm
 
-from grc_macronizer import Macronizer
+from grc_macronizer import configure_logging, Macronizer
 from grc_utils import count_dichrona_in_open_syllables, lower_grc, vowel
 
 #########################
@@ -29,6 +29,7 @@ CHUNK_SIZE = 1000
 make_prints = False
 no_hypotactic = True # Now trying with Hypotactic again
 lowercase = True
+errors = "skip-token" # a token the modules fail on is left as it is, instead of the whole chunk failing
 
 #########################
 ### Utility functions ###
@@ -83,7 +84,8 @@ batch_nr = args.input_file.split('_')[-1].split('.')[0]
 
 signal.signal(signal.SIGINT, signal_handler)
 
-macronizer = Macronizer(make_prints=make_prints, doc_from_file=False, no_hypotactic=no_hypotactic, lowercase=lowercase)
+configure_logging("INFO") # no per-token trace on corpus runs
+macronizer = Macronizer(make_prints=make_prints, doc_from_file=False, no_hypotactic=no_hypotactic, lowercase=lowercase, errors=errors)
 
 print(f"###########################################")
 print(f"### Macronizing OGA batch {batch_nr}... ###")
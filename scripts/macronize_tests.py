@@ -7,7 +7,7 @@ a prosodically much more complex text than the straight-forward prose story Anab
 This is not a benchmark: I have added quite a few of the proper names of Anabasis to the custom db, 
 as an example of the high results that can be achieved by manually "localizing" the macronizer to your target text.
 
-A good work flow is to first run the macronizer as-is on your target text, inspect the list of un-disambiguated words in diagnostics/still_ambiguous, 
+A good work flow is to first run the macronizer as-is on your target text, inspect the list of un-disambiguated words in diagnostics/diagnostics_*.json, 
 and then manually add the most common of them to the db/custom.py. 
 Of course, "manually" could mean using a good LLM with research capabilities. 
 '''
@@ -15,12 +15,13 @@ Of course, "manually" could mean using a good LLM with research capabilities.
 import re
 import time
 
-from grc_macronizer import Macronizer
+from grc_macronizer import configure_logging, Macronizer
 from grc_macronizer.tests.hiketides import hiketides # "Supplices" by Sophocles
 from grc_macronizer.tests.anabasis import anabasis, anabasis_medium, anabasis_short # "Anabasis" by Xenophon
 
 from grc_utils import colour_dichrona_in_open_syllables, macronization_stats
 
+configure_logging() # full per-token trace in diagnostics/logs
 macronizer = Macronizer(no_hypotactic=False, make_prints=True, lowercase=True)
 
 #input = hiketides
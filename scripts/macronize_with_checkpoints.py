@@ -1,3 +1,15 @@
+'''
+Macronizes a file line by line into "original<TAB>macronized" lines, with checkpoints.
+
+After every chunk of lines, a manifest next to the output (<output_file>.manifest.jsonl) records what has been done,
+so if the run is interrupted, just run the same command again: it checks the output, drops any half-written chunk
+and continues where it stopped (see grc_macronizer/runner.py).
+
+python macronize_with_checkpoints.py input.txt output.tsv
+
+An existing output without a manifest is only overwritten with --restart.
+'''
+
 import sys
 import signal
 import warnings
@@ -5,13 +17,15 @@ import argparse
 
 warnings.filterwarnings("ignore", message=".*Can't initialize NVML.*", category=UserWarning)
 
-from grc_macronizer import Macronizer
+from grc_macronizer import configure_logging, Macronizer
+from grc_macronizer.runner import CorpusRunner
 
+configure_logging("INFO") # no per-token trace on corpus runs
 macronizer = Macronizer(make_prints=True, doc_from_file=False)
 
 # Handle SIGINT (Ctrl+C)
 def signal_handler(sig, frame):
-    print("\nAborted by user. Cleaning up...")
+    print("\nAborted by user. Run the same command again to resume.")
     sys.exit(130)
 
 signal.signal(signal.SIGINT, signal_handler)
@@ -20,53 +34,21 @@ signal.signal(signal.SIGINT, signal_handler)
 parser = argparse.ArgumentParser()
 parser.add_argument("input_file", help="Path to the input file")
 parser.add_argument("output_file", help="Path to the output file")
-parser.add_argument("--start-line", type=int, default=0, help="Line number to resume from (default: 0)")
+parser.add_argument("--restart", action="store_true", help="Start over, overwriting the output and its manifest")
 args = parser.parse_args()
 
 CHUNK_SIZE = 1000
 
-# Read and slice the input lines
 try:
-    with open(args.input_file, 'r', encoding='utf-8') as f:
-        all_lines = f.readlines()
-        print(f'Total lines: {len(all_lines)}')
+    runner = CorpusRunner(macronizer, args.input_file, args.output_file, chunk_lines=CHUNK_SIZE, tsv=True, restart=args.restart)
+    manifest = runner.run()
 except FileNotFoundError:
     print(f"File '{args.input_file}' not found.")
     sys.exit(1)
+except (FileExistsError, ValueError) as e:
+    print(e)
+    sys.exit(1)
 
-lines = all_lines[args.start_line:]
-total_lines = len(lines)
-
-with open(args.output_file, 'a', encoding='utf-8') as out_f:
-    for i in range(0, total_lines, CHUNK_SIZE):
-        chunk_lines = lines[i:i + CHUNK_SIZE]
-        chunk_text = ''.join(chunk_lines)
-        absolute_start_line = args.start_line + i
-
-        try:
-            output = macronizer.macronize(chunk_text)
-            if not output:
-                print(f"Warning: macronizer returned empty output for lines {absolute_start_line}–{absolute_start_line + len(chunk_lines)}")
-                continue
-
-            macronized_lines = output.splitlines()
-            original_lines = [line.rstrip('\n') for line in chunk_lines]
-
-            if len(macronized_lines) != len(original_lines):
-                print(f"Mismatch at line {absolute_start_line}: {len(original_lines)} input vs {len(macronized_lines)} output lines")
-                sys.exit(1)
-
-            for orig, macr in zip(original_lines, macronized_lines):
-                out_f.write(f"{orig}\t{macr}\n")
-            out_f.flush()
-
-            print(f"Processed and saved lines up to {absolute_start_line + len(chunk_lines)}")
-
-        except KeyboardInterrupt:
-            print(f"\nInterrupted. Last successfully processed line: {absolute_start_line}")
-            sys.exit(130)
-        except Exception as e:
-            print(f"Error at line {absolute_start_line}: {e}")
-            sys.exit(1)
-
-print("All done.")
\ No newline at end of file
+print(f"All done: {sum(chunk['lines'] for chunk in manifest['chunks'])} lines.")
+if runner.failed_lines:
+    print(f"{len(runner.failed_lines)} lines could not be macronized and were written as they are: {runner.failed_lines[:20]}")
@@ -1 +1,2 @@
-from .class_macronizer import Macronizer
\ No newline at end of file
+from .class_macronizer import Macronizer
+from .logs import configure_logging
@@ -0,0 +1,102 @@
+'''
+Reading pre-annotated input, for Macronizer.macronize_annotated.
+
+Treebanks and corpora such as Opera Graeca Adnotata already carry a lemma, UPOS and morphological features for every word,
+so there is no need to strip them to plain text and tag everything again with odyCy. Two kinds of input are accepted:
+
+- CoNLL-U, as a path, a string or an iterable of lines:
+
+    # sent_id = 1
+    1	Δαρείου	Δαρεῖος	PROPN	_	Case=Gen|Gender=Masc|Number=Sing	...	_
+    2	καὶ	καί	CCONJ	_	_	...	_
+
+- an iterable of (form, lemma, upos, feats) tuples, with None (or an empty tuple) between sentences.
+  feats is a UD FEATS string, "_" or "" for none. A fifth element, space_after, may be given; it defaults to True.
+  Without separators, the tuples are split into sentences after every '.', ';' and Greek question mark.
+
+Either way the result is an iterator over the sentences, each a list of AnnotatedTokens.
+The input is read as the sentences are consumed, so a corpus is never held in memory as a whole.
+'''
+
+from collections import namedtuple
+import os
+from pathlib import Path
+
+AnnotatedToken = namedtuple("AnnotatedToken", ["form", "lemma", "upos", "feats", "space_after"])
+
+SENTENCE_END_FORMS = (".", ";", "\u037e") # as in Text's sentence splitting
+
+_EMPTY = object()
+
+def _field(value):
+    return "" if value in (None, "_") else value
+
+def read_conllu(source):
+    '''
+    Yields the sentences of CoNLL-U as lists of AnnotatedTokens, reading a file line by line. Multiword token ranges (1-2)
+    and empty nodes (1.1) are skipped, so each sentence consists of the syntactic words, as in the treebanks of Ancient Greek.
+    '''
+    if isinstance(source, Path) or (isinstance(source, str) and "\n" not in source and os.path.isfile(source)):
+        with open(source, encoding="utf-8") as f:
+            yield from read_conllu(f)
+        return
+    lines = source.splitlines() if isinstance(source, str) else source
+
+    sentence = []
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if not line.strip():
+            if sentence:
+                yield sentence
+                sentence = []
+            continue
+        if line.startswith("#"):
+            continue
+
+        columns = line.split("\t")
+        if len(columns) != 10:
+            raise ValueError(f"Not a CoNLL-U word line (expected 10 tab-separated columns): {line!r}")
+        if "-" in columns[0] or "." in columns[0]:
+            continue
+        _, form, lemma, upos, _, feats, _, _, _, misc = columns
+        sentence.append(AnnotatedToken(form, _field(lemma), _field(upos), _field(feats), "SpaceAfter=No" not in misc.split("|")))
+    if sentence:
+        yield sentence
+
+def read_tuples(tokens):
+    '''
+    Yields the sentences of (form, lemma, upos, feats[, space_after]) tuples as lists of AnnotatedTokens.
+    '''
+    sentence = []
+    for token in tokens:
+        if not token:
+            if sentence:
+                yield sentence
+                sentence = []
+            continue
+        form, lemma, upos, feats, *rest = token
+        sentence.append(AnnotatedToken(form, _field(lemma), _field(upos), _field(feats), rest[0] if rest else True))
+        if form in SENTENCE_END_FORMS:
+            yield sentence
+            sentence = []
+    if sentence:
+        yield sentence
+
+def read_annotated(source):
+    '''
+    Dispatches on the kind of input: CoNLL-U (path, string or lines) or tuples. Like the readers, a lazy iterator over the sentences.
+    '''
+    if isinstance(source, (str, Path)):
+        return read_conllu(source)
+    iterator = iter(source)
+    first = next(iterator, _EMPTY)
+    if first is _EMPTY:
+        return iter(())
+
+    def chained():
+        yield first
+        yield from iterator
+
+    if isinstance(first, str):
+        return read_conllu(chained())
+    return read_tuples(chained())
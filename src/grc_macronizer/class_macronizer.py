@@ -1,70 +1,85 @@
-from collections import Counter
-from datetime import datetime
-from importlib.resources import files
+from collections import defaultdict
+from itertools import islice
 import logging
-import os
 from pathlib import Path
-import pickle
 import re
 
 from tqdm import tqdm
 
-from grc_utils import ACCENTS, only_bases, CONSONANTS_LOWER_TO_UPPER, count_ambiguous_dichrona_in_open_syllables, count_dichrona_in_open_syllables, GRAVES, long_acute, lower_grc, no_macrons, normalize_word, paroxytone, patterns, proparoxytone, properispomenon, short_vowel, syllabifier, upper_grc, vowel, VOWELS_LOWER_TO_UPPER, word_with_real_dichrona
+from grc_utils import ACCENTS, only_bases, CONSONANTS_LOWER_TO_UPPER, count_ambiguous_dichrona_in_open_syllables, count_dichrona_in_open_syllables, GRAVES, long_acute, lower_grc, no_macrons, normalize_word, patterns, short_vowel, upper_grc, vowel, VOWELS_LOWER_TO_UPPER, word_with_real_dichrona
 
-from .ascii import ascii_macronizer
+from .annotated import read_annotated
 from .barytone import replace_grave_with_acute, replace_acute_with_grave
 from .class_text import Text
+from .db import LazyDB, load as load_db
 from .db.custom import custom_macronizer
-from .db.lsj import lsj
-from .db.proper_names import proper_names
-from .db.wiktionary_ambiguous import wiktionary_ambiguous_map
-from .db.wiktionary_singletons import wiktionary_singletons_map
-from .format_macrons import macron_unicode_to_markup, merge_or_overwrite_markup
+from .diagnostics import Diagnostics
+from .doc_cache import default_cache_dir, DocCache
+from .format_macrons import LONG_MARK, macron_unicode_to_markup, MARKUP_CHARS, SHORT_MARK
+from .logs import trace_enabled
 from .morph_disambiguator import morph_disambiguator
 from .nominal_forms import macronize_nominal_forms
+from .parallel import macronize_parallel, macronize_pipelined, regroup_lines
 from .sanity_check import demacronize_diphthong, macronized_diphthong
+from .token_cache import TokenCache, token_key
+from .token_store import TokenStore
 from .verbal_forms import macronize_verbal_forms
+from .word_analysis import analyze, open_dichrona
+from .writers import length_sources, MacronizedSentence, MacronizedToken, open_writer
 
-####################
-# --- Preamble --- #
-####################
+###########################
+# Load databases          #
+###########################
 
-# Logging setup
+# Each db is loaded on first access (see db/__init__.py), so e.g. no_hypotactic=True never loads hypotactic.
+# Compiled .lex files are memory-mapped; without them we fall back to the Python modules and pickles (see lexicon.py)
 
-timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-log_dir = Path("diagnostics") / "logs"  # relative to working directory!
-log_filename = log_dir / f"macronizer_{timestamp}.log"
+lsj = LazyDB("lsj")
+proper_names = LazyDB("proper_names")
+wiktionary_ambiguous_map = LazyDB("wiktionary_ambiguous")
+wiktionary_singletons_map = LazyDB("wiktionary_singletons")
 
-os.makedirs(log_dir, exist_ok=True)
+lsj_keys_set = LazyDB("lsj_keys") # only_bases of the LSJ keys
+hypotactic = LazyDB("hypotactic")
 
-logging.basicConfig(
-    level=logging.DEBUG,
-    filename=log_filename,
-    format="%(asctime)s - %(message)s"
-)
+#######################
+# --- Main class ---  #
+#######################
 
-logging.info("Starting new log...")
-for line in ascii_macronizer:
-    logging.info(line)
+ERROR_POLICIES = ("raise", "skip-token", "passthrough-sentence")
 
-###########################
-# Load pickled databases  #
-###########################
+# Names of the modules whose efficacy is tracked, in the order of the efficacy lists written by macronize
+MODULES = (
+    "custom",
+    "wiktionary",
+    "lsj",
 
-lsj_keys_path = files("grc_macronizer.db").joinpath("lsj_keys.pkl")
-with lsj_keys_path.open("rb") as f:
-    lsj_keys = pickle.load(f)
+    "nominal_forms",
+    "verbal_forms",
+    "accent_rules",
+    "prefix",
 
-# Convert lsj_keys to a set for faster lookups
-lsj_keys_set = {only_bases(key) for key in lsj_keys}
+    "double_accent_recursion",
+    "case_ending_recursion",
+    "reversed_elision_recursion",
+    "oxytonization",
+    "decapitalization",
 
-hypotactic_path = files("grc_macronizer.db").joinpath("hypotactic.pkl")
-with hypotactic_path.open("rb") as f:
-    hypotactic = pickle.load(f)
+    "hypotactic",
+)
 
-#######################
-# --- Main class ---  #
-#######################
+def growing_chunks(items, chunk_lines):
+    '''
+    Lists of consecutive items of any iterable, read lazily: first 32 (so that the first output appears quickly), then twice as many each time, up to chunk_lines.
+    '''
+    iterator = iter(items)
+    size = min(chunk_lines, 32)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+        size = min(size * 2, chunk_lines)
 
 class Macronizer:
     def __init__(self, 
@@ -75,7 +90,25 @@ class Macronizer:
                  doc_from_file=True,
                  no_hypotactic=False,
                  custom_doc="",
-                 lowercase=False):
+                 lowercase=False,
+                 token_cache_size=100_000,
+                 cache_dir=None,
+                 deduplicate=False,
+                 doc_cache_dir=None,
+                 doc_cache_max_bytes=2 * 1024**3,
+                 docs_dir=None,
+                 disable=None,
+                 exclude=None,
+                 batch_size=None,
+                 sort_by_length=False,
+                 max_sentence_tokens=None,
+                 window_overlap=8,
+                 errors='raise',
+                 diagnostics='periodic',
+                 diagnostics_path=None,
+                 diagnostics_interval=300):
+
+        self.init_kwargs = {name: value for name, value in locals().items() if name != "self"} # to build identical Macronizers in worker processes
 
         self.macronize_everything = macronize_everything
         self.make_prints = make_prints
@@ -85,6 +118,111 @@ class Macronizer:
         self.no_hypotactic = no_hypotactic
         self.custom_doc = custom_doc
         self.lowercase = lowercase
+        self.deduplicate = deduplicate
+
+        # what to do when the modules raise on a token: 'raise', 'skip-token' (leave it as it is) or 'passthrough-sentence' (leave its whole sentence as it is)
+        if errors not in ERROR_POLICIES:
+            raise ValueError(f"errors must be one of {', '.join(ERROR_POLICIES)}, not {errors!r}")
+        self.errors = errors
+        self.error_report = [] # one dict per token that failed, over the lifetime of this Macronizer; see report_failure
+
+        # module hits and still-ambiguous words, counted over all calls and flushed to one file: 'periodic', 'manual' (flush_diagnostics) or 'off'
+        self.diagnostics = Diagnostics(diagnostics, path=diagnostics_path, interval=diagnostics_interval)
+
+        self._nlp = None # odyCy pipeline, loaded lazily by the nlp property and shared by all Text objects
+
+        # tagging-stage options: pipeline components not to run (disable) or not even to load (exclude), and how to batch
+        self.disable = list(disable or [])
+        self.exclude = list(exclude or [])
+        self.batch_size = batch_size
+        self.sort_by_length = sort_by_length
+        self.max_sentence_tokens = max_sentence_tokens # longer sentences are tagged in windows overlapping by window_overlap words
+        self.window_overlap = window_overlap
+        self.tagging_stats = {"sentences": 0, "tokens": 0, "seconds": 0.0} # summed over all calls to macronize
+        self.token_cache = TokenCache(maxsize=token_cache_size) # shared by all calls to macronize; see macronize_token
+        self.token_store = TokenStore(cache_dir) if cache_dir else None # optional on-disk store shared across runs and processes
+
+        # sentence-level cache of the odyCy docs; without one, Text keeps one file of docs per input in docs_dir (by default odycy_docs/ in the user cache dir)
+        doc_cache_dir = doc_cache_dir or cache_dir
+        self.doc_cache = DocCache(doc_cache_dir, max_bytes=doc_cache_max_bytes, variant=self.tagger_variant) if doc_cache_dir else None
+        self.docs_dir = Path(docs_dir).expanduser() if docs_dir else default_cache_dir() / "odycy_docs"
+
+    @property
+    def nlp(self):
+        '''
+        The odyCy pipeline (and with it its vocab), loaded on first access and then reused for every call to macronize.
+        Loading the transformer is by far the most expensive part of creating a Text, so we only ever want to pay for it once per process.
+        '''
+        if self._nlp is None:
+            import grc_odycy_joint_trf # imported here, so that importing grc_macronizer does not import torch
+
+            logging.info("Loading odyCy pipeline...")
+            overrides = {}
+            if self.disable:
+                overrides["disable"] = self.disable
+            if self.exclude:
+                overrides["exclude"] = self.exclude
+            self._nlp = grc_odycy_joint_trf.load(**overrides)
+            logging.info(f"odyCy components running: {self._nlp.pipe_names}")
+        return self._nlp
+
+    @property
+    def tagger_variant(self):
+        '''
+        Suffix for the keys of cached docs when not all pipeline components run or long sentences are split, since the docs then differ. Empty by default.
+        '''
+        variant = ""
+        if self.disable or self.exclude:
+            variant += f"/disable={','.join(sorted(self.disable))}/exclude={','.join(sorted(self.exclude))}"
+        if self.max_sentence_tokens:
+            variant += f"/max_sentence_tokens={self.max_sentence_tokens},{self.window_overlap}"
+        return variant
+
+    @property
+    def tokens_per_second(self):
+        seconds = self.tagging_stats["seconds"]
+        return self.tagging_stats["tokens"] / seconds if seconds else 0.0
+
+    def warmup(self):
+        '''
+        Load the odyCy pipeline and the databases this configuration uses up front, e.g. before forking workers or starting a timer.
+        '''
+        self.nlp
+        return self.preload()
+
+    def preload(self):
+        '''
+        Load the databases this configuration uses, but not odyCy, e.g. so that forked workers inherit them (see parallel.py).
+        '''
+        for name in self.required_dbs():
+            load_db(name)
+        return self
+
+    def required_dbs(self):
+        '''
+        Names of the databases macronize can touch with this configuration (proper_names is only needed by macronization_ratio).
+        '''
+        names = ["lsj", "lsj_keys", "wiktionary_ambiguous", "wiktionary_singletons", "ionic"]
+        if not self.no_hypotactic:
+            names.append("hypotactic")
+        return names
+
+    def close(self):
+        '''
+        Release the odyCy pipeline (and the connections to the on-disk token store and doc cache, if any). The next call to macronize will reopen them.
+        '''
+        self._nlp = None
+        self.diagnostics.flush()
+        if self.token_store is not None:
+            self.token_store.close()
+        if self.doc_cache is not None:
+            self.doc_cache.close()
+
+    def __enter__(self):
+        return self.warmup()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
             
     def wiktionary(self, word, lemma, pos, morph):
         """
@@ -131,583 +269,813 @@ class Macronizer:
 
         return macronized
 
-    def macronize(self, text, genre='prose'):
-        """
-        Macronization is a modular and recursive process comprised of the following 13 steps, 
-        with the high-trust db modules first, then the algorithmic modules, the recursive ones and finally the hypotactic db module:
-            
-            [custom]
-            [wiktionary]
-            [lsj]
+    def macronize_token(self, token, lemma, pos, morph, genre='prose'):
+        '''
+        Memoized entry point to macronization_modules.
+        Returns the macronized token together with the (module, token) events that the modules reported,
+        so that the efficacy lists can be replayed correctly on cache hits.
 
-            [nominal forms]
-            [verbal forms]
-            [accent rules]
-            [prefixes]
+        Lookup order: in-memory token cache, then the on-disk token store (if cache_dir was given), then the modules themselves.
+        '''
+        key = token_key(token, lemma, pos, morph)
+        cached = self.token_cache.get(key)
+        if cached is not None:
+            return cached
+
+        if self.token_store is not None:
+            store_key = [*key, genre, self.no_hypotactic, self.debug] # everything the stored result may depend on, apart from the db fingerprint
+            stored = self.token_store.get(store_key)
+            if stored is not None:
+                cached = (stored[0], tuple(stored[1]))
+                self.token_cache.put(key, cached)
+                return cached
+
+        events = []
+        result = self.macronization_modules(token, lemma, pos, morph, results=events).word # the modules pass WordAnalyses; render them once, here
+        events = [(module, analysis.word) for module, analysis in events]
+        cached = (result, tuple(events))
+        self.token_cache.put(key, cached)
+        if self.token_store is not None:
+            self.token_store.put(store_key, result, events)
+
+        return cached
+
+    def macronize_tokens(self, token_lemma_pos_morph, genre='prose', failed=None):
+        '''
+        Runs macronize_token over a list of [token, lemma, pos, morph] and returns one (result, events) pair per occurrence, in order.
 
-            [double-accent recursion]
-            [reversed-elision recursion]
-            [wrong-case recursion]
-            [oxytonizing recursion]
-            [decapitalization recursion]
+        With deduplicate=True, the tokens are first grouped into unique (orth, lemma, pos, morph) signatures,
+        the cascade is run once per signature, and the results are written back to every occurrence.
 
-            [hypotactic]
-            [accent rules] (re-applied in overwrite mode as a sanity check)
+        Unless errors='raise', a token on which the modules raise is returned as it is, without events,
+        and (index, error type, message) is appended to failed for each of its occurrences.
+        '''
+        if failed is None:
+            failed = []
 
-        Accent rules relies on the output of the other modules for optimal performance.
-        Hypotactic has special safety measures in place; refer to it's docstring below. 
-        My design goal is that it should be easy for the "power user" to change the order of the other modules, and to graft in new ones.
-        """
+        if not self.deduplicate:
+            results = [self.try_macronize_token(token, lemma, pos, morph, genre) for token, lemma, pos, morph in tqdm(token_lemma_pos_morph, desc="Macronizing tokens ☕️", leave=self.make_prints)]
+        else:
+            keys = []
+            signatures = {} # key => first occurrence
+            for token, lemma, pos, morph in token_lemma_pos_morph:
+                key = token_key(token, lemma, pos, morph)
+                keys.append(key)
+                signatures.setdefault(key, (token, lemma, pos, morph))
 
-        text_object = Text(text, genre, doc_from_file=self.doc_from_file, debug=self.debug, custom_doc=self.custom_doc, lowercase=self.lowercase)
-        token_lemma_pos_morph = text_object.token_lemma_pos_morph # format: [[orth, token.lemma_, token.pos_, token.morph], ...]
+            logging.debug(f'Deduplicated {len(keys)} tokens into {len(signatures)} signatures')
+
+            signature_results = {}
+            for key, (token, lemma, pos, morph) in tqdm(signatures.items(), desc="Macronizing unique tokens ☕️", leave=self.make_prints):
+                signature_results[key] = self.try_macronize_token(token, lemma, pos, morph, genre)
 
-        # lists to keep track of the modules' efficacy
+            results = [signature_results[key] for key in keys]
+
+        for i, result in enumerate(results):
+            if isinstance(result, Exception):
+                failed.append((i, type(result).__name__, str(result)))
+                results[i] = (token_lemma_pos_morph[i][0], ())
+        return results
+
+    def try_macronize_token(self, token, lemma, pos, morph, genre='prose'):
+        '''
+        macronize_token, but returning the exception instead of raising it, unless errors='raise'.
+        '''
+        if self.errors == 'raise':
+            return self.macronize_token(token, lemma, pos, morph, genre)
+        try:
+            return self.macronize_token(token, lemma, pos, morph, genre)
+        except Exception as e:
+            return e
+
+    def report_failure(self, token, lemma, pos, morph, error_type, message, sentence=None):
+        '''
+        Adds a token the modules failed on to the error report (which write_diagnostics also adds to the consolidated diagnostics).
+        '''
+        logging.warning(f"Modules failed on {token!r} ({error_type}: {message}); errors={self.errors}")
+        failure = {"token": token, "lemma": lemma, "pos": pos, "morph": str(morph), "error": error_type, "message": message, "policy": self.errors, "sentence": sentence}
+        self.error_report.append(failure)
+        return failure
+
+    def macronization_modules(self, token, lemma, pos, morph, recursion_depth=0, oxytonized_pass=False, capitalized_pass=False, decapitalized_pass=False, different_ending_pass=False, is_lemma=False, double_accent_pass=False, reversed_elision_pass=False, results=None):
+        '''
+        NOTE it is possible to change the order of modules without having to rewrite too many lines. 
+
+        token is a string; the modules pass a WordAnalysis (see word_analysis.py) on to each other, and one is returned.
+        Every time a module helps, a (module name, WordAnalysis after the module) pair is appended to results (see MODULES).
+        The recursions render the ^/_ string of what they get back, to cut and paste endings and accents.
+        '''
+        trace = trace_enabled() # see logs.py
+
+        if results is None:
+            results = []
         
-        custom_results = []
-        wiktionary_results = []
-        lsj_results = []
-
-        nominal_forms_results = []
-        verbal_forms_results = []
-        accent_rules_results = []
-        prefix_results = []
-
-        double_accent_recursion_results = []
-        reversed_elision_recursion_results = []
-        case_ending_recursion_results = []
-        oxytonization_results = []
-        decapitalization_results = []
+        recursion_depth += 1
+        if recursion_depth > 10:
+            raise RecursionError("Maximum recursion depth exceeded in macronization_modules")
         
-        hypotactic_results = []
-            
-        def macronization_modules(token, lemma, pos, morph, recursion_depth=0, oxytonized_pass=False, capitalized_pass=False, decapitalized_pass=False, different_ending_pass=False, is_lemma=False, double_accent_pass=False, reversed_elision_pass=False):
-            '''
-            NOTE it is possible to change the order of modules without having to rewrite too many lines. 
-            '''
-            
-            recursion_depth += 1
-            if recursion_depth > 10:
-                raise RecursionError("Maximum recursion depth exceeded in macronization_modules")
-            
-            if oxytonized_pass:
+        if oxytonized_pass:
+            if trace:
                 logging.debug(f'🔄 Macronizing (oxytonized): {token} ({lemma}, {pos}, {morph})')
-            elif capitalized_pass:
+        elif capitalized_pass:
+            if trace:
                 logging.debug(f'🔄 Macronizing (capitalized): {token} ({lemma}, {pos}, {morph})')
-            elif decapitalized_pass:
+        elif decapitalized_pass:
+            if trace:
                 logging.debug(f'🔄 Macronizing (decapitalized): {token} ({lemma}, {pos}, {morph})')
-            elif different_ending_pass:
+        elif different_ending_pass:
+            if trace:
                 logging.debug(f'🔄 Macronizing (different-ending): {token} ({lemma}, {pos}, {morph})')
-            elif is_lemma:
+        elif is_lemma:
+            if trace:
                 logging.debug(f'🔄 Macronizing (lemma): {token} ({lemma}, {pos}, {morph})')
-            elif reversed_elision_pass:
+        elif reversed_elision_pass:
+            if trace:
                 logging.debug(f'🔄 Macronizing (reversed elision): {token} ({lemma}, {pos}, {morph})')
-            else:
+        else:
+            if trace:
                 logging.debug(f'🔄 Macronizing: {token} ({lemma}, {pos}, {morph})')
 
-            macronized_token = token
+        macronized_token = analyze(token)
 
-            ### CUSTOM OVERRIDING ###
+        ### CUSTOM OVERRIDING ###
 
-            # Minimal pairs requiring special disambiguation
+        # Minimal pairs requiring special disambiguation
 
-            if token == 'ἄλλα':
-                if 'Fem' in morph.get("Gender"):
+        if token == 'ἄλλα':
+            if 'Fem' in morph.get("Gender"):
+                if trace:
                     logging.debug(f'\t✅ Macronized feminine {token}')
-                    return 'ἄλλα_'
-                else:
+                return analyze('ἄλλα_')
+            else:
+                if trace:
                     logging.debug(f'\t✅ Macronized neutre {token}')
-                    return 'ἄλλα^' # neutre plural
-            
-            custom_token = custom_macronizer(macronized_token)
-            if self.debug and custom_token != macronized_token:
-                logging.debug(f'\t✅ Custom: {macronized_token} => {merge_or_overwrite_markup(custom_token, macronized_token)}, with {count_dichrona_in_open_syllables(merge_or_overwrite_markup(custom_token, macronized_token))} left')
-            elif self.debug:
-                logging.debug(f'\t❌ Custom did not help')
-            macronized_token = merge_or_overwrite_markup(custom_token, macronized_token)
-
-            if count_dichrona_in_open_syllables(macronized_token) == 0:
-                custom_results.append(macronized_token)
-                return macronized_token
+                return analyze('ἄλλα^') # neutre plural
+        
+        custom_token = custom_macronizer(token)
+        if self.debug and custom_token != token:
+            logging.debug(f'\t✅ Custom: {macronized_token.word} => {macronized_token.merge(custom_token).word}, with {macronized_token.merge(custom_token).open_dichrona} left')
+        elif self.debug:
+            logging.debug(f'\t❌ Custom did not help')
+        macronized_token = macronized_token.merge(custom_token)
+
+        if macronized_token.open_dichrona == 0:
+            results.append(('custom', macronized_token))
+            return macronized_token
 
-            ### DB MODULES ####
+        ### DB MODULES ####
 
-            # WIKTIONARY
+        # WIKTIONARY
 
-            old_macronized_token = macronized_token
-            wiktionary_token = self.wiktionary(macronized_token, lemma, pos, morph)
-            macronized_token = merge_or_overwrite_markup(wiktionary_token, macronized_token)
-            if count_dichrona_in_open_syllables(macronized_token) < count_dichrona_in_open_syllables(old_macronized_token):
-                wiktionary_results.append(macronized_token)
-                logging.debug(f'\t✅ Wiktionary: {token} => {wiktionary_token}, with {count_dichrona_in_open_syllables(wiktionary_token)} left')
-            else:
+        old_macronized_token = macronized_token
+        wiktionary_token = self.wiktionary(macronized_token.base, lemma, pos, morph) # only the bare word is looked up
+        macronized_token = macronized_token.merge(wiktionary_token)
+        if macronized_token.open_dichrona < old_macronized_token.open_dichrona:
+            results.append(('wiktionary', macronized_token))
+            if trace:
+                logging.debug(f'\t✅ Wiktionary: {token} => {wiktionary_token}, with {open_dichrona(wiktionary_token)} left')
+        else:
+            if trace:
                 logging.debug(f'\t❌ Wiktionary did not help')
-            
-            if count_dichrona_in_open_syllables(macronized_token) == 0:
-                return macronized_token
+        
+        if macronized_token.open_dichrona == 0:
+            return macronized_token
 
-            # LSJ
-            
-            old_macronized_token = macronized_token
-            lsj_token = lsj.get(token, token)
-            if normalize_word(lsj_token.replace('^', '').replace('_', '')) == normalize_word(token.replace('^', '').replace('_', '')): # There are some accent bugs in the lsj db. Better safe than sorry
-                macronized_token = merge_or_overwrite_markup(lsj_token, macronized_token)
-                if count_dichrona_in_open_syllables(macronized_token) < count_dichrona_in_open_syllables(old_macronized_token):
-                    lsj_results.append(macronized_token)
-                    logging.debug(f'\t✅ LSJ helped: {old_macronized_token} => {macronized_token}, with {count_dichrona_in_open_syllables(macronized_token)} left')
-                else:
+        # LSJ
+        
+        old_macronized_token = macronized_token
+        lsj_token = lsj.get(token, token)
+        if normalize_word(lsj_token.replace('^', '').replace('_', '')) == normalize_word(token.replace('^', '').replace('_', '')): # There are some accent bugs in the lsj db. Better safe than sorry
+            macronized_token = macronized_token.merge(lsj_token)
+            if macronized_token.open_dichrona < old_macronized_token.open_dichrona:
+                results.append(('lsj', macronized_token))
+                if trace:
+                    logging.debug(f'\t✅ LSJ helped: {old_macronized_token.word} => {macronized_token.word}, with {macronized_token.open_dichrona} left')
+            else:
+                if trace:
                     logging.debug(f'\t❌ LSJ did not help')
 
-            if count_dichrona_in_open_syllables(macronized_token) == 0:
-                return macronized_token
+        if macronized_token.open_dichrona == 0:
+            return macronized_token
 
-            ### ALGORITHMIC MODULES ###
+        ### ALGORITHMIC MODULES ###
 
-            old_macronized_token = macronized_token
-            nominal_forms_token = macronize_nominal_forms(token, lemma, pos, morph, debug=self.debug)
-            macronized_token = merge_or_overwrite_markup(nominal_forms_token, macronized_token)
-            if count_dichrona_in_open_syllables(macronized_token) < count_dichrona_in_open_syllables(old_macronized_token):
-                nominal_forms_results.append(macronized_token)
-                logging.debug(f'\t✅ Nominal forms helped: {old_macronized_token} => {macronized_token}, with {count_dichrona_in_open_syllables(macronized_token)} left')
-            else:
+        old_macronized_token = macronized_token
+        nominal_forms_token = macronize_nominal_forms(token, lemma, pos, morph, debug=self.debug)
+        macronized_token = macronized_token.merge(nominal_forms_token)
+        if macronized_token.open_dichrona < old_macronized_token.open_dichrona:
+            results.append(('nominal_forms', macronized_token))
+            if trace:
+                logging.debug(f'\t✅ Nominal forms helped: {old_macronized_token.word} => {macronized_token.word}, with {macronized_token.open_dichrona} left')
+        else:
+            if trace:
                 logging.debug(f'\t❌ Nominal forms did not help')
 
 
-            old_macronized_token = macronized_token
-            verbal_forms_token = macronize_verbal_forms(token, lemma, pos, morph, debug=self.debug)
-            macronized_token = merge_or_overwrite_markup(verbal_forms_token, macronized_token)
-            if count_dichrona_in_open_syllables(macronized_token) < count_dichrona_in_open_syllables(old_macronized_token):
-                verbal_forms_results.append(macronized_token)
-                logging.debug(f'\t✅ Verbal forms helped: {old_macronized_token} => {macronized_token}, with {count_dichrona_in_open_syllables(macronized_token)} left')
-            else:
+        old_macronized_token = macronized_token
+        verbal_forms_token = macronize_verbal_forms(token, lemma, pos, morph, debug=self.debug)
+        macronized_token = macronized_token.merge(verbal_forms_token)
+        if macronized_token.open_dichrona < old_macronized_token.open_dichrona:
+            results.append(('verbal_forms', macronized_token))
+            if trace:
+                logging.debug(f'\t✅ Verbal forms helped: {old_macronized_token.word} => {macronized_token.word}, with {macronized_token.open_dichrona} left')
+        else:
+            if trace:
                 logging.debug(f'\t❌ Verbal forms did not help')
-            
-            if count_dichrona_in_open_syllables(macronized_token) == 0:
-                return macronized_token
+        
+        if macronized_token.open_dichrona == 0:
+            return macronized_token
 
-            old_macronized_token = macronized_token
-            accent_rules_token = self.apply_accentuation_rules(macronized_token) # accent rules benefit from earlier macronization
-            macronized_token = merge_or_overwrite_markup(accent_rules_token, macronized_token)
-            if count_dichrona_in_open_syllables(macronized_token) < count_dichrona_in_open_syllables(old_macronized_token):
-                accent_rules_results.append(macronized_token)
-                logging.debug(f'\t✅ Accent rules helped: {old_macronized_token} => {macronized_token}, with {count_dichrona_in_open_syllables(macronized_token)} left')
-            else:
+        old_macronized_token = macronized_token
+        accent_rules_token = self.apply_accentuation_rules(macronized_token) # accent rules benefit from earlier macronization
+        macronized_token = macronized_token.merge(accent_rules_token)
+        if macronized_token.open_dichrona < old_macronized_token.open_dichrona:
+            results.append(('accent_rules', macronized_token))
+            if trace:
+                logging.debug(f'\t✅ Accent rules helped: {old_macronized_token.word} => {macronized_token.word}, with {macronized_token.open_dichrona} left')
+        else:
+            if trace:
                 logging.debug(f'\t❌ Accent rules did not help')
 
-            if count_dichrona_in_open_syllables(macronized_token) == 0:
-                return macronized_token
-            
-            ### PREFIXES ###
-            '''
-            If the word's lemma minus a prefix string is still an LSJ entry, then we macronize the prefix.
-            Example: ἀφίκοντο can be macronized to ἀ^φίκοντο because ικνεομαι is in LSJ
-            '''
-            dichronic_prefixes = {
-                                'ἀνα': 'ἀ^να^', 
-                                'ἀντι': 'ἀντι^',
-                                'ἀπο': 'ἀ^πο',
-                                'ἀφ': 'ἀ^φ',
-                                'δια': 'δι^α^',
-                                'ἐπι': 'ἐπι^',
-                                'κατα': 'κα^τα^',
-                                'καθ': 'κα^θ',
-                                'μετα': 'μετα^',
-                                'παρα': 'πα^ρα^',
-                                'περι': 'περι^',
-                                'συν': 'συ^ν',
-                                'ξυν': 'ξυ^ν',
-                                'συμ': 'συ^μ',
-                                'ὑπερ': 'ὑ^περ',
-                                'ὑπο': 'ὑ^πο',
-                                'ὑφ': 'ὑ^φ',
-            }
-
-            dichronic_prefixes_unaspirated_elision = { # these need to be checked after the above since they are substrings of some of them
-                                'ἀν': 'ἀ^ν', # e.g. ἀν-ειλέω 
-                                'ἀπ': 'ἀ^π',
-                                'δι': 'δι^', # e.g. δι-έχω
-                                'κατ': 'κα^τ',
-                                'παρ': 'πα^ρ',
-                                'ὑπ': 'ὑ^π'
-            }
-
-            prefix_match = ''
-            macronized_prefix_match = ''
-            unprefixed_lemma = ''
-            old_macronized_token = macronized_token
-            for prefix, macronized_prefix in dichronic_prefixes.items():
-                if token.startswith(prefix) and lemma.startswith(prefix):
-                    prefix_match = prefix
-                    macronized_prefix_match = macronized_prefix
+        if macronized_token.open_dichrona == 0:
+            return macronized_token
+        
+        ### PREFIXES ###
+        '''
+        If the word's lemma minus a prefix string is still an LSJ entry, then we macronize the prefix.
+        Example: ἀφίκοντο can be macronized to ἀ^φίκοντο because ικνεομαι is in LSJ
+        '''
+        dichronic_prefixes = {
+                            'ἀνα': 'ἀ^να^', 
+                            'ἀντι': 'ἀντι^',
+                            'ἀπο': 'ἀ^πο',
+                            'ἀφ': 'ἀ^φ',
+                            'δια': 'δι^α^',
+                            'ἐπι': 'ἐπι^',
+                            'κατα': 'κα^τα^',
+                            'καθ': 'κα^θ',
+                            'μετα': 'μετα^',
+                            'παρα': 'πα^ρα^',
+                            'περι': 'περι^',
+                            'συν': 'συ^ν',
+                            'ξυν': 'ξυ^ν',
+                            'συμ': 'συ^μ',
+                            'ὑπερ': 'ὑ^περ',
+                            'ὑπο': 'ὑ^πο',
+                            'ὑφ': 'ὑ^φ',
+        }
 
-                    unprefixed_lemma = lemma.removeprefix(prefix) # cool python 3.9 method!
-                    unprefixed_lemma = only_bases(unprefixed_lemma)
-                    logging.debug(f'\t Unprefixed lemma for {token}: {unprefixed_lemma}')
-                    break
-                
-            for prefix, macronized_prefix in dichronic_prefixes_unaspirated_elision.items():
-                if token.startswith(prefix) and lemma.startswith(prefix):
-                    prefix_match = prefix
-                    macronized_prefix_match = macronized_prefix
+        dichronic_prefixes_unaspirated_elision = { # these need to be checked after the above since they are substrings of some of them
+                            'ἀν': 'ἀ^ν', # e.g. ἀν-ειλέω 
+                            'ἀπ': 'ἀ^π',
+                            'δι': 'δι^', # e.g. δι-έχω
+                            'κατ': 'κα^τ',
+                            'παρ': 'πα^ρ',
+                            'ὑπ': 'ὑ^π'
+        }
 
-                    unprefixed_lemma = lemma.removeprefix(prefix)
-                    unprefixed_lemma = only_bases(unprefixed_lemma)
+        prefix_match = ''
+        macronized_prefix_match = ''
+        unprefixed_lemma = ''
+        old_macronized_token = macronized_token
+        for prefix, macronized_prefix in dichronic_prefixes.items():
+            if token.startswith(prefix) and lemma.startswith(prefix):
+                prefix_match = prefix
+                macronized_prefix_match = macronized_prefix
+
+                unprefixed_lemma = lemma.removeprefix(prefix) # cool python 3.9 method!
+                unprefixed_lemma = only_bases(unprefixed_lemma)
+                if trace:
                     logging.debug(f'\t Unprefixed lemma for {token}: {unprefixed_lemma}')
-                    break
+                break
+            
+        for prefix, macronized_prefix in dichronic_prefixes_unaspirated_elision.items():
+            if token.startswith(prefix) and lemma.startswith(prefix):
+                prefix_match = prefix
+                macronized_prefix_match = macronized_prefix
+
+                unprefixed_lemma = lemma.removeprefix(prefix)
+                unprefixed_lemma = only_bases(unprefixed_lemma)
+                if trace:
+                    logging.debug(f'\t Unprefixed lemma for {token}: {unprefixed_lemma}')
+                break
 
-            if unprefixed_lemma in lsj_keys_set:
-                prefix_token = token.removeprefix(prefix_match)
-                prefix_token = macronized_prefix_match + prefix_token
-                prefix_token = normalize_word(prefix_token)
+        if unprefixed_lemma in lsj_keys_set:
+            prefix_token = token.removeprefix(prefix_match)
+            prefix_token = macronized_prefix_match + prefix_token
+            prefix_token = normalize_word(prefix_token)
+            if trace:
                 logging.debug(f'\t Prefix token for {token}: {prefix_token}')
 
-                macronized_token = merge_or_overwrite_markup(prefix_token, macronized_token)
-                if self.debug and count_dichrona_in_open_syllables(macronized_token) < count_dichrona_in_open_syllables(old_macronized_token):
-                    prefix_results.append(macronized_token)
-                    logging.debug(f'\t✅ Prefix macronization helped: {count_dichrona_in_open_syllables(macronized_token)} left')
-                else:
+            macronized_token = macronized_token.merge(prefix_token)
+            if self.debug and macronized_token.open_dichrona < old_macronized_token.open_dichrona:
+                results.append(('prefix', macronized_token))
+                if trace:
+                    logging.debug(f'\t✅ Prefix macronization helped: {macronized_token.open_dichrona} left')
+            else:
+                if trace:
                     logging.debug(f'\t❌ Prefix macronization did not help')
 
-            if count_dichrona_in_open_syllables(macronized_token) == 0:
-                return macronized_token
-
-            #################
-            ### RECURSION ###
-            #################
-
-            '''
-            # Example of working two-level recursion:
-                # 2025-03-30 11:39:44,565 - 🔄 Macronizing: Διὰ (διά, ADP, )
-                # 2025-03-30 11:39:44,565 - 🔄 Macronizing (oxytonized): Διά (διά, ADP, )
-                # 2025-03-30 11:39:44,566 - 	 Decapitalizing Διά as διά
-                # 2025-03-30 11:39:44,566 - 🔄 Macronizing (oxytonized): διά (διά, ADP, )
-                # 2025-03-30 11:39:44,566 - 	✅ Custom: διά => δι^ά^, with 0 left
-                # 2025-03-30 11:39:44,566 - 	✅ Decapitalization helped: 0 left
-                # 2025-03-30 11:39:44,567 - 	✅ Oxytonizing helped: : 0 left
-            '''
-
-            ### DOUBLE-ACCENT RECURSION ###
-
-            '''
-            Recursively handle paroxytone or properispomenon tokens with >1 accent, like Καλλίμαχός or οἷός or πράγματά.
-            # NOTE that if follows that such tokens cannot have final long, and so no risk of loosing iota subscript.
-            Hence we should be able to safely use only_bases().
-            # NOTE that what we need to handle is just that final accent can be on *the last or next to last syllable*. 
-            '''
-
-            if not double_accent_pass and len(normalize_word(token)) > 1:
-                accents = [char for char in token if char in ACCENTS]
-                if len(accents) > 1:
-                    one_accent_token_last = ''
-                    one_accent_token_next_to_last = ''
-                    reconstituted_token = ''
-                    old_macronized_token = macronized_token
-
-                    if token[-1] in ACCENTS:
-                        one_accent_token_last = token[:-1] + only_bases(token[-1])
-                    if token[-2] in ACCENTS:
-                        one_accent_token_next_to_last = token[:-2] + only_bases(token[-2:])
-                    
-                    if one_accent_token_last:
-                        one_accent_token_last = macronization_modules(one_accent_token_last, lemma, pos, morph, recursion_depth, oxytonized_pass=oxytonized_pass, capitalized_pass=capitalized_pass, decapitalized_pass=decapitalized_pass, different_ending_pass=different_ending_pass, is_lemma=is_lemma, double_accent_pass=True)
+        if macronized_token.open_dichrona == 0:
+            return macronized_token
+
+        #################
+        ### RECURSION ###
+        #################
+
+        '''
+        # Example of working two-level recursion:
+            # 2025-03-30 11:39:44,565 - 🔄 Macronizing: Διὰ (διά, ADP, )
+            # 2025-03-30 11:39:44,565 - 🔄 Macronizing (oxytonized): Διά (διά, ADP, )
+            # 2025-03-30 11:39:44,566 - 	 Decapitalizing Διά as διά
+            # 2025-03-30 11:39:44,566 - 🔄 Macronizing (oxytonized): διά (διά, ADP, )
+            # 2025-03-30 11:39:44,566 - 	✅ Custom: διά => δι^ά^, with 0 left
+            # 2025-03-30 11:39:44,566 - 	✅ Decapitalization helped: 0 left
+            # 2025-03-30 11:39:44,567 - 	✅ Oxytonizing helped: : 0 left
+        '''
+
+        ### DOUBLE-ACCENT RECURSION ###
+
+        '''
+        Recursively handle paroxytone or properispomenon tokens with >1 accent, like Καλλίμαχός or οἷός or πράγματά.
+        # NOTE that if follows that such tokens cannot have final long, and so no risk of loosing iota subscript.
+        Hence we should be able to safely use only_bases().
+        # NOTE that what we need to handle is just that final accent can be on *the last or next to last syllable*. 
+        '''
+
+        if not double_accent_pass and len(normalize_word(token)) > 1:
+            accents = [char for char in token if char in ACCENTS]
+            if len(accents) > 1:
+                one_accent_token_last = ''
+                one_accent_token_next_to_last = ''
+                reconstituted_token = ''
+                old_macronized_token = macronized_token
+
+                if token[-1] in ACCENTS:
+                    one_accent_token_last = token[:-1] + only_bases(token[-1])
+                if token[-2] in ACCENTS:
+                    one_accent_token_next_to_last = token[:-2] + only_bases(token[-2:])
+                
+                if one_accent_token_last:
+                    one_accent_token_last = self.macronization_modules(one_accent_token_last, lemma, pos, morph, recursion_depth, oxytonized_pass=oxytonized_pass, capitalized_pass=capitalized_pass, decapitalized_pass=decapitalized_pass, different_ending_pass=different_ending_pass, is_lemma=is_lemma, double_accent_pass=True, results=results).word
+                    if trace:
                         logging.debug(f'\t One-accent token macronized (last): {one_accent_token_last}')
-                        if one_accent_token_last[-1] == '_' or not one_accent_token_last: # no words with 2 accents have final long (they are either proparoxytone or properispomenon)
-                            pass
-                        elif one_accent_token_last[-1] == '^':
-                            reconstituted_token = one_accent_token_last[:-2] + token[-1] + one_accent_token_last[-1]
-                        else:
-                            reconstituted_token = one_accent_token_last[:-1] + token[-1]
-                    
-                    if one_accent_token_next_to_last:
-                        one_accent_token_next_to_last = macronization_modules(one_accent_token_next_to_last, lemma, pos, morph, recursion_depth, oxytonized_pass=oxytonized_pass, capitalized_pass=capitalized_pass, decapitalized_pass=decapitalized_pass, different_ending_pass=different_ending_pass, is_lemma=is_lemma, double_accent_pass=True)
+                    if one_accent_token_last[-1] == '_' or not one_accent_token_last: # no words with 2 accents have final long (they are either proparoxytone or properispomenon)
+                        pass
+                    elif one_accent_token_last[-1] == '^':
+                        reconstituted_token = one_accent_token_last[:-2] + token[-1] + one_accent_token_last[-1]
+                    else:
+                        reconstituted_token = one_accent_token_last[:-1] + token[-1]
+                
+                if one_accent_token_next_to_last:
+                    one_accent_token_next_to_last = self.macronization_modules(one_accent_token_next_to_last, lemma, pos, morph, recursion_depth, oxytonized_pass=oxytonized_pass, capitalized_pass=capitalized_pass, decapitalized_pass=decapitalized_pass, different_ending_pass=different_ending_pass, is_lemma=is_lemma, double_accent_pass=True, results=results).word
+                    if trace:
                         logging.debug(f'\t One-accent token macronized (next to last): {one_accent_token_next_to_last}')
-                        if one_accent_token_next_to_last[-2] == '_' or not one_accent_token_next_to_last: # no words with 2 accents have final long (they are either proparoxytone or properispomenon)
-                            pass
-                        elif one_accent_token_next_to_last[-2] == '^':
-                            reconstituted_token = one_accent_token_next_to_last[:-3] + token[-2] + one_accent_token_next_to_last[-2] + token[-1]
-                        else:
-                            reconstituted_token = one_accent_token_next_to_last[:-2] + token[-2:]
-                    if reconstituted_token:    
-                        macronized_token = merge_or_overwrite_markup(reconstituted_token, macronized_token)
-                    if count_dichrona_in_open_syllables(macronized_token) < count_dichrona_in_open_syllables(old_macronized_token):
-                        double_accent_recursion_results.append(macronized_token)
-                        logging.debug(f'\t✅ Double accent macronization helped: {count_dichrona_in_open_syllables(macronized_token)} left')
+                    if one_accent_token_next_to_last[-2] == '_' or not one_accent_token_next_to_last: # no words with 2 accents have final long (they are either proparoxytone or properispomenon)
+                        pass
+                    elif one_accent_token_next_to_last[-2] == '^':
+                        reconstituted_token = one_accent_token_next_to_last[:-3] + token[-2] + one_accent_token_next_to_last[-2] + token[-1]
                     else:
+                        reconstituted_token = one_accent_token_next_to_last[:-2] + token[-2:]
+                if reconstituted_token:    
+                    macronized_token = macronized_token.merge(reconstituted_token)
+                if macronized_token.open_dichrona < old_macronized_token.open_dichrona:
+                    results.append(('double_accent_recursion', macronized_token))
+                    if trace:
+                        logging.debug(f'\t✅ Double accent macronization helped: {macronized_token.open_dichrona} left')
+                else:
+                    if trace:
                         logging.debug(f'\t❌ Double accent macronization did not help')
-                    
-            if count_dichrona_in_open_syllables(macronized_token) == 0:
-                return macronized_token
+                
+        if macronized_token.open_dichrona == 0:
+            return macronized_token
 
-            ### REVERSED-ELISION RECURSION ###
+        ### REVERSED-ELISION RECURSION ###
 
-            '''
-            Handle elided words like παρ'
-            Elided final vowels: {"α^", "ε", "ι^"}. 
-                - Example of elided alpha: διωλόμεσθ' (Sophocles)
-            
-            NOTE: When sent to full recursion, a reversed non-existent token like *διωλόμεσθι will get macronized by the proparoxytone rule
-            and merged, introducing an error. Hence the extra check for ^ in the newly macronized token before re-elision.
-            '''
+        '''
+        Handle elided words like παρ'
+        Elided final vowels: {"α^", "ε", "ι^"}. 
+            - Example of elided alpha: διωλόμεσθ' (Sophocles)
+        
+        NOTE: When sent to full recursion, a reversed non-existent token like *διωλόμεσθι will get macronized by the proparoxytone rule
+        and merged, introducing an error. Hence the extra check for ^ in the newly macronized token before re-elision.
+        '''
 
-            elided_vowels = ["ε", "ι", "α"]
-            reversed_worked = False
-            old_macronized_token = macronized_token
-            if not reversed_elision_pass and token[-1] == "'":
-                reversed_elision_token = token[:-1] + elided_vowels[0] # remove the apostrophe and add a vowel
-                reversed_elision_token = macronization_modules(reversed_elision_token, lemma, pos, morph, recursion_depth, oxytonized_pass=oxytonized_pass, capitalized_pass=capitalized_pass, decapitalized_pass=decapitalized_pass, different_ending_pass=different_ending_pass, is_lemma=is_lemma, double_accent_pass=double_accent_pass, reversed_elision_pass=True)
+        elided_vowels = ["ε", "ι", "α"]
+        reversed_worked = False
+        old_macronized_token = macronized_token
+        if not reversed_elision_pass and token[-1] == "'":
+            reversed_elision_token = token[:-1] + elided_vowels[0] # remove the apostrophe and add a vowel
+            reversed_elision_token = self.macronization_modules(reversed_elision_token, lemma, pos, morph, recursion_depth, oxytonized_pass=oxytonized_pass, capitalized_pass=capitalized_pass, decapitalized_pass=decapitalized_pass, different_ending_pass=different_ending_pass, is_lemma=is_lemma, double_accent_pass=double_accent_pass, reversed_elision_pass=True, results=results).word
+            if trace:
                 logging.debug(f'\t Reversed elision token: {reversed_elision_token}')
-                restored_token = reversed_elision_token[:-1] + "'"
-                macronized_token = merge_or_overwrite_markup(restored_token, macronized_token)
-                if count_dichrona_in_open_syllables(macronized_token) < count_dichrona_in_open_syllables(old_macronized_token):
-                    reversed_worked = True
-                    reversed_elision_recursion_results.append(macronized_token)
-                    logging.debug(f'\t✅ Reversed elision with iota macronization helped: {count_dichrona_in_open_syllables(macronized_token)} left')
-                else:
+            restored_token = reversed_elision_token[:-1] + "'"
+            macronized_token = macronized_token.merge(restored_token)
+            if macronized_token.open_dichrona < old_macronized_token.open_dichrona:
+                reversed_worked = True
+                results.append(('reversed_elision_recursion', macronized_token))
+                if trace:
+                    logging.debug(f'\t✅ Reversed elision with iota macronization helped: {macronized_token.open_dichrona} left')
+            else:
+                if trace:
                     logging.debug(f'\t❌ Reversed elision with epsilon macronization did not help')
 
-            if not reversed_worked and not reversed_elision_pass and token[-1] == "'":
-                reversed_elision_token = token[:-1] + elided_vowels[1] # remove the apostrophe and add a vowel
-                reversed_elision_token = macronization_modules(reversed_elision_token, lemma, pos, morph, recursion_depth, oxytonized_pass=oxytonized_pass, capitalized_pass=capitalized_pass, decapitalized_pass=decapitalized_pass, different_ending_pass=different_ending_pass, is_lemma=is_lemma, double_accent_pass=double_accent_pass, reversed_elision_pass=True)
+        if not reversed_worked and not reversed_elision_pass and token[-1] == "'":
+            reversed_elision_token = token[:-1] + elided_vowels[1] # remove the apostrophe and add a vowel
+            reversed_elision_token = self.macronization_modules(reversed_elision_token, lemma, pos, morph, recursion_depth, oxytonized_pass=oxytonized_pass, capitalized_pass=capitalized_pass, decapitalized_pass=decapitalized_pass, different_ending_pass=different_ending_pass, is_lemma=is_lemma, double_accent_pass=double_accent_pass, reversed_elision_pass=True, results=results).word
+            if trace:
                 logging.debug(f'\t Reversed elision token: {reversed_elision_token}')
-                if reversed_elision_token[-1] == '^' or reversed_elision_token[-1] == '_': # I have encountered pathological cases with long ultima
-                    restored_token = reversed_elision_token[:-2] + "'"
-                else:
-                    restored_token = reversed_elision_token[:-1] + "'"
-                macronized_token = merge_or_overwrite_markup(restored_token, macronized_token)
-                if count_dichrona_in_open_syllables(macronized_token) < count_dichrona_in_open_syllables(old_macronized_token):
-                    reversed_elision_recursion_results.append(macronized_token)
-                    logging.debug(f'\t✅ Reversed elision with iota macronization helped: {count_dichrona_in_open_syllables(macronized_token)} left')
-                else:
+            if reversed_elision_token[-1] == '^' or reversed_elision_token[-1] == '_': # I have encountered pathological cases with long ultima
+                restored_token = reversed_elision_token[:-2] + "'"
+            else:
+                restored_token = reversed_elision_token[:-1] + "'"
+            macronized_token = macronized_token.merge(restored_token)
+            if macronized_token.open_dichrona < old_macronized_token.open_dichrona:
+                results.append(('reversed_elision_recursion', macronized_token))
+                if trace:
+                    logging.debug(f'\t✅ Reversed elision with iota macronization helped: {macronized_token.open_dichrona} left')
+            else:
+                if trace:
                     logging.debug(f'\t❌ Reversed elision with iota macronization did not help either')
 
-            ### WRONG-CASE-ENDING RECURSION ### 
-
-            '''
-            e.g. πόλιν should go through πόλις
-            '''
+        ### WRONG-CASE-ENDING RECURSION ### 
 
-            # 2nd declension
-            ''' 
-            Confirmed to yield στρα^τηγόν when having only "στρα^τηγός" in the db
-            '''
-            if not different_ending_pass and len(token) > 2 and only_bases(lemma[-2:]) == 'ος': # we enforce length for the last two chars to really be an ending (and for there to be dichrona)
-                logging.debug(f'\t Testing for 2D wrong-case-ending recursion: {macronized_token} ({lemma})')
-                old_macronized_token = macronized_token
-                restored_token = ''
-
-                # cases only differing wrt the last char: gen and acc sing, and nom plur
-                if (only_bases(macronized_token[-2:]) == 'ου' and 'Gen' in morph.get("Case")) or (only_bases(macronized_token[-2:]) == 'ον' and 'Acc' in morph.get("Case")) or (only_bases(macronized_token[-2:]) == 'οι' and 'Nom' in morph.get("Case")):
-                    nominative_token = token[:-1] + 'ς'
-                    nominative_token = macronization_modules(nominative_token, lemma, pos, morph, recursion_depth, oxytonized_pass=oxytonized_pass, capitalized_pass=capitalized_pass, decapitalized_pass=decapitalized_pass, different_ending_pass=True, is_lemma=is_lemma)
-                    restored_token = nominative_token[:-1] + token[-1]
-
-                # non-oxytone dative
-                elif token[-1] == 'ῳ' and 'Dat' in morph.get("Case"):
-                    nominative_token = token[:-1] + 'ος'
-                    nominative_token = macronization_modules(nominative_token, lemma, pos, morph, recursion_depth, oxytonized_pass=oxytonized_pass, capitalized_pass=capitalized_pass, decapitalized_pass=decapitalized_pass, different_ending_pass=True, is_lemma=is_lemma)
-                    restored_token = nominative_token[:-2] + token[-1]
-
-                # oxytone dative
-                elif token[-1] == 'ῷ' and 'Dat' in morph.get("Case"):
-                    nominative_token = token[:-1] + 'ός'
-                    nominative_token = macronization_modules(nominative_token, lemma, pos, morph, recursion_depth, oxytonized_pass=oxytonized_pass, capitalized_pass=capitalized_pass, decapitalized_pass=decapitalized_pass, different_ending_pass=True, is_lemma=is_lemma)
-                    restored_token = nominative_token[:-2] + token[-1]
+        '''
+        e.g. πόλιν should go through πόλις
+        '''
 
-                # non-oxytone gen plur
-                elif token[-2:] == 'ων' and 'Gen' in morph.get("Case"):
-                    nominative_token = token[:-2] + 'ος'
-                    nominative_token = macronization_modules(nominative_token, lemma, pos, morph, recursion_depth, oxytonized_pass=oxytonized_pass, capitalized_pass=capitalized_pass, decapitalized_pass=decapitalized_pass, different_ending_pass=True, is_lemma=is_lemma)
-                    restored_token = nominative_token[:-2] + token[-2:]
-                
-                # oxytone gen plur
-                elif token[-2:] == 'ῶν' and 'Gen' in morph.get("Case"):
-                    nominative_token = token[:-2] + 'ός'
-                    nominative_token = macronization_modules(nominative_token, lemma, pos, morph, recursion_depth, oxytonized_pass=oxytonized_pass, capitalized_pass=capitalized_pass, decapitalized_pass=decapitalized_pass, different_ending_pass=True, is_lemma=is_lemma)
-                    restored_token = nominative_token[:-2] + token[-2:]
-
-                # non-oxytone dat plur
-                elif token[-3:] == 'οις' and 'Dat' in morph.get("Case"):
-                    nominative_token = token[:-3] + 'ος'
-                    nominative_token = macronization_modules(nominative_token, lemma, pos, morph, recursion_depth, oxytonized_pass=oxytonized_pass, capitalized_pass=capitalized_pass, decapitalized_pass=decapitalized_pass, different_ending_pass=True, is_lemma=is_lemma)
-                    restored_token = nominative_token[:-2] + token[-3:]
-
-                # oxytone dat plur
-                elif token[-3:] == 'οῖς' and 'Dat' in morph.get("Case"):
-                    nominative_token = token[:-3] + 'ός'
-                    nominative_token = macronization_modules(nominative_token, lemma, pos, morph, recursion_depth, oxytonized_pass=oxytonized_pass, capitalized_pass=capitalized_pass, decapitalized_pass=decapitalized_pass, different_ending_pass=True, is_lemma=is_lemma)
-                    restored_token = nominative_token[:-2] + token[-3:]
-                
-                # non-oxytone acc plur
-                elif token[-3:] == 'ους' and 'Acc' in morph.get("Case"):
-                    nominative_token = token[:-3] + 'ος'
-                    nominative_token = macronization_modules(nominative_token, lemma, pos, morph, recursion_depth, oxytonized_pass=oxytonized_pass, capitalized_pass=capitalized_pass, decapitalized_pass=decapitalized_pass, different_ending_pass=True, is_lemma=is_lemma)
-                    restored_token = nominative_token[:-2] + token[-3:]
-
-                # oxytone acc plur
-                elif token[-3:] == 'ούς' and 'Acc' in morph.get("Case"):
-                    nominative_token = token[:-3] + 'ος'
-                    nominative_token = macronization_modules(nominative_token, lemma, pos, morph, recursion_depth, oxytonized_pass=oxytonized_pass, capitalized_pass=capitalized_pass, decapitalized_pass=decapitalized_pass, different_ending_pass=True, is_lemma=is_lemma)
-                    restored_token = nominative_token[:-2] + token[-3:]
-
-                macronized_token = merge_or_overwrite_markup(restored_token, macronized_token)
-
-                if self.debug and count_dichrona_in_open_syllables(macronized_token) < count_dichrona_in_open_syllables(old_macronized_token):
-                    case_ending_recursion_results.append(macronized_token)
-                    logging.debug(f'\t✅ Wrong-case-ending (D2) helped: {count_dichrona_in_open_syllables(macronized_token)} left')
-                else:
-                    logging.debug(f'\t❌ Wrong-case-ending (D2) did not help')
+        # 2nd declension
+        ''' 
+        Confirmed to yield στρα^τηγόν when having only "στρα^τηγός" in the db
+        '''
+        if not different_ending_pass and len(token) > 2 and only_bases(lemma[-2:]) == 'ος': # we enforce length for the last two chars to really be an ending (and for there to be dichrona)
+            if trace:
+                logging.debug(f'\t Testing for 2D wrong-case-ending recursion: {macronized_token.word} ({lemma})')
+            old_macronized_token = macronized_token
+            restored_token = ''
+
+            # cases only differing wrt the last char: gen and acc sing, and nom plur
+            if (only_bases(macronized_token.word[-2:]) == 'ου' and 'Gen' in morph.get("Case")) or (only_bases(macronized_token.word[-2:]) == 'ον' and 'Acc' in morph.get("Case")) or (only_bases(macronized_token.word[-2:]) == 'οι' and 'Nom' in morph.get("Case")):
+                nominative_token = token[:-1] + 'ς'
+                nominative_token = self.macronization_modules(nominative_token, lemma, pos, morph, recursion_depth, oxytonized_pass=oxytonized_pass, capitalized_pass=capitalized_pass, decapitalized_pass=decapitalized_pass, different_ending_pass=True, is_lemma=is_lemma, results=results).word
+                restored_token = nominative_token[:-1] + token[-1]
+
+            # non-oxytone dative
+            elif token[-1] == 'ῳ' and 'Dat' in morph.get("Case"):
+                nominative_token = token[:-1] + 'ος'
+                nominative_token = self.macronization_modules(nominative_token, lemma, pos, morph, recursion_depth, oxytonized_pass=oxytonized_pass, capitalized_pass=capitalized_pass, decapitalized_pass=decapitalized_pass, different_ending_pass=True, is_lemma=is_lemma, results=results).word
+                restored_token = nominative_token[:-2] + token[-1]
+
+            # oxytone dative
+            elif token[-1] == 'ῷ' and 'Dat' in morph.get("Case"):
+                nominative_token = token[:-1] + 'ός'
+                nominative_token = self.macronization_modules(nominative_token, lemma, pos, morph, recursion_depth, oxytonized_pass=oxytonized_pass, capitalized_pass=capitalized_pass, decapitalized_pass=decapitalized_pass, different_ending_pass=True, is_lemma=is_lemma, results=results).word
+                restored_token = nominative_token[:-2] + token[-1]
+
+            # non-oxytone gen plur
+            elif token[-2:] == 'ων' and 'Gen' in morph.get("Case"):
+                nominative_token = token[:-2] + 'ος'
+                nominative_token = self.macronization_modules(nominative_token, lemma, pos, morph, recursion_depth, oxytonized_pass=oxytonized_pass, capitalized_pass=capitalized_pass, decapitalized_pass=decapitalized_pass, different_ending_pass=True, is_lemma=is_lemma, results=results).word
+                restored_token = nominative_token[:-2] + token[-2:]
             
-            # 1st declension
-            if not different_ending_pass and len(token) > 2 and (only_bases(lemma[-1]) == 'α' or only_bases(lemma[-1]) == 'η') and "Fem" in morph.get("Gender"):
-                logging.debug(f'\t Testing for 1D wrong-case-ending recursion: {macronized_token} ({lemma})')
-                old_macronized_token = macronized_token
-                restored_token = ''
-
-                # gen sing
-                if (token[-2:] == 'ης' or token[-2:] == 'ας') and 'Gen' in morph.get("Case"): # e.g. οἰκίας
-                    nominative_token = token[:-1] # e.g. οἰκία
-                if token[-2:] == 'ῆς' and 'Gen' in morph.get("Case"): # e.g. καλῆς
-                    nominative_token = token[:-2] + 'ή' # e.g. καλή, note that this does not accomodate -α following non-ειρ.
-                if token[-2:] == 'ᾶς' and 'Gen' in morph.get("Case"): # e.g. καλᾶς
-                    nominative_token = token[:-2] + 'ά' # e.g. καλά
+            # oxytone gen plur
+            elif token[-2:] == 'ῶν' and 'Gen' in morph.get("Case"):
+                nominative_token = token[:-2] + 'ός'
+                nominative_token = self.macronization_modules(nominative_token, lemma, pos, morph, recursion_depth, oxytonized_pass=oxytonized_pass, capitalized_pass=capitalized_pass, decapitalized_pass=decapitalized_pass, different_ending_pass=True, is_lemma=is_lemma, results=results).word
+                restored_token = nominative_token[:-2] + token[-2:]
+
+            # non-oxytone dat plur
+            elif token[-3:] == 'οις' and 'Dat' in morph.get("Case"):
+                nominative_token = token[:-3] + 'ος'
+                nominative_token = self.macronization_modules(nominative_token, lemma, pos, morph, recursion_depth, oxytonized_pass=oxytonized_pass, capitalized_pass=capitalized_pass, decapitalized_pass=decapitalized_pass, different_ending_pass=True, is_lemma=is_lemma, results=results).word
+                restored_token = nominative_token[:-2] + token[-3:]
+
+            # oxytone dat plur
+            elif token[-3:] == 'οῖς' and 'Dat' in morph.get("Case"):
+                nominative_token = token[:-3] + 'ός'
+                nominative_token = self.macronization_modules(nominative_token, lemma, pos, morph, recursion_depth, oxytonized_pass=oxytonized_pass, capitalized_pass=capitalized_pass, decapitalized_pass=decapitalized_pass, different_ending_pass=True, is_lemma=is_lemma, results=results).word
+                restored_token = nominative_token[:-2] + token[-3:]
+            
+            # non-oxytone acc plur
+            elif token[-3:] == 'ους' and 'Acc' in morph.get("Case"):
+                nominative_token = token[:-3] + 'ος'
+                nominative_token = self.macronization_modules(nominative_token, lemma, pos, morph, recursion_depth, oxytonized_pass=oxytonized_pass, capitalized_pass=capitalized_pass, decapitalized_pass=decapitalized_pass, different_ending_pass=True, is_lemma=is_lemma, results=results).word
+                restored_token = nominative_token[:-2] + token[-3:]
+
+            # oxytone acc plur
+            elif token[-3:] == 'ούς' and 'Acc' in morph.get("Case"):
+                nominative_token = token[:-3] + 'ος'
+                nominative_token = self.macronization_modules(nominative_token, lemma, pos, morph, recursion_depth, oxytonized_pass=oxytonized_pass, capitalized_pass=capitalized_pass, decapitalized_pass=decapitalized_pass, different_ending_pass=True, is_lemma=is_lemma, results=results).word
+                restored_token = nominative_token[:-2] + token[-3:]
+
+            macronized_token = macronized_token.merge(restored_token)
+
+            if self.debug and macronized_token.open_dichrona < old_macronized_token.open_dichrona:
+                results.append(('case_ending_recursion', macronized_token))
+                if trace:
+                    logging.debug(f'\t✅ Wrong-case-ending (D2) helped: {macronized_token.open_dichrona} left')
+            else:
+                if trace:
+                    logging.debug(f'\t❌ Wrong-case-ending (D2) did not help')
+        
+        # 1st declension
+        if not different_ending_pass and len(token) > 2 and (only_bases(lemma[-1]) == 'α' or only_bases(lemma[-1]) == 'η') and "Fem" in morph.get("Gender"):
+            if trace:
+                logging.debug(f'\t Testing for 1D wrong-case-ending recursion: {macronized_token.word} ({lemma})')
+            old_macronized_token = macronized_token
+            restored_token = ''
+
+            # gen sing
+            if (token[-2:] == 'ης' or token[-2:] == 'ας') and 'Gen' in morph.get("Case"): # e.g. οἰκίας
+                nominative_token = token[:-1] # e.g. οἰκία
+            if token[-2:] == 'ῆς' and 'Gen' in morph.get("Case"): # e.g. καλῆς
+                nominative_token = token[:-2] + 'ή' # e.g. καλή, note that this does not accomodate -α following non-ειρ.
+            if token[-2:] == 'ᾶς' and 'Gen' in morph.get("Case"): # e.g. καλᾶς
+                nominative_token = token[:-2] + 'ά' # e.g. καλά
+            else:
+                nominative_token = ""
+            if nominative_token:
+                nominative_token = self.macronization_modules(nominative_token, lemma, pos, morph, recursion_depth, oxytonized_pass=oxytonized_pass, capitalized_pass=capitalized_pass, decapitalized_pass=decapitalized_pass, different_ending_pass=True, is_lemma=is_lemma, results=results).word
+                if nominative_token[-1] == '^' or nominative_token[-1] == '_': # e.g. κα^λά_ ; note that ending changes so is not to be macronized
+                    restored_token = nominative_token[:-2] + token[-2:] # e.g. κα^λ + ᾶς
                 else:
-                    nominative_token = ""
-                if nominative_token:
-                    nominative_token = macronization_modules(nominative_token, lemma, pos, morph, recursion_depth, oxytonized_pass=oxytonized_pass, capitalized_pass=capitalized_pass, decapitalized_pass=decapitalized_pass, different_ending_pass=True, is_lemma=is_lemma)
-                    if nominative_token[-1] == '^' or nominative_token[-1] == '_': # e.g. κα^λά_ ; note that ending changes so is not to be macronized
-                        restored_token = nominative_token[:-2] + token[-2:] # e.g. κα^λ + ᾶς
-                    else:
-                        restored_token = nominative_token[:-1] + token[-2:] # e.g. κα^λά => κα^λ + ᾶς
-
-                # dat sing
-                if (token[-1] == 'ῃ' or token[-1] == 'ῇ' or token[-1] == 'ᾳ' or token[-1] == 'ᾷ') and 'Dat' in morph.get("Case") and pos == 'NOUN': # adjectives have D1 lemmata
-                    nominative_token = macronized_token[:-1] + lemma[-1]
-                    nominative_token = macronization_modules(nominative_token, lemma, pos, morph, recursion_depth, oxytonized_pass=oxytonized_pass, capitalized_pass=capitalized_pass, decapitalized_pass=decapitalized_pass, different_ending_pass=True, is_lemma=is_lemma)
-                    if nominative_token[-1] == '^' or nominative_token[-1] == '_':
-                        restored_token = nominative_token[:-2] + token[-1:] # e.g. κα^λ + ῇ
-                    else:
-                        restored_token = nominative_token[:-1] + token[-1:]
-
-                # acc sing
-                if (only_bases(token)[-2:] == 'ην' or only_bases(token)[-2:] == 'αν') and 'Acc' in morph.get("Case") and pos == 'NOUN': # adjectives have D1 lemmata
-                    nominative_token = macronized_token[:-2] + lemma[-1]
-                    nominative_token = macronization_modules(nominative_token, lemma, pos, morph, recursion_depth, oxytonized_pass=oxytonized_pass, capitalized_pass=capitalized_pass, decapitalized_pass=decapitalized_pass, different_ending_pass=True, is_lemma=is_lemma)
-                    if nominative_token[-1] == '^' or nominative_token[-1] == '_':
-                        restored_token = nominative_token[:-2] + token[-1]
-                    else: 
-                        restored_token = nominative_token[:-1] + token[-1]
-                
-                if restored_token:
-                    macronized_token = merge_or_overwrite_markup(restored_token, macronized_token)
+                    restored_token = nominative_token[:-1] + token[-2:] # e.g. κα^λά => κα^λ + ᾶς
+
+            # dat sing
+            if (token[-1] == 'ῃ' or token[-1] == 'ῇ' or token[-1] == 'ᾳ' or token[-1] == 'ᾷ') and 'Dat' in morph.get("Case") and pos == 'NOUN': # adjectives have D1 lemmata
+                nominative_token = macronized_token.word[:-1] + lemma[-1]
+                nominative_token = self.macronization_modules(nominative_token, lemma, pos, morph, recursion_depth, oxytonized_pass=oxytonized_pass, capitalized_pass=capitalized_pass, decapitalized_pass=decapitalized_pass, different_ending_pass=True, is_lemma=is_lemma, results=results).word
+                if nominative_token[-1] == '^' or nominative_token[-1] == '_':
+                    restored_token = nominative_token[:-2] + token[-1:] # e.g. κα^λ + ῇ
+                else:
+                    restored_token = nominative_token[:-1] + token[-1:]
 
-                    if self.debug and count_dichrona_in_open_syllables(macronized_token) < count_dichrona_in_open_syllables(old_macronized_token):
-                        case_ending_recursion_results.append(macronized_token)
-                        logging.debug(f'\t✅ Wrong-case-ending (D1) helped: {count_dichrona_in_open_syllables(macronized_token)} left')
-                    else:
-                        logging.debug(f'\t❌ Wrong-case-ending (D1) did not help')
+            # acc sing
+            if (only_bases(token)[-2:] == 'ην' or only_bases(token)[-2:] == 'αν') and 'Acc' in morph.get("Case") and pos == 'NOUN': # adjectives have D1 lemmata
+                nominative_token = macronized_token.word[:-2] + lemma[-1]
+                nominative_token = self.macronization_modules(nominative_token, lemma, pos, morph, recursion_depth, oxytonized_pass=oxytonized_pass, capitalized_pass=capitalized_pass, decapitalized_pass=decapitalized_pass, different_ending_pass=True, is_lemma=is_lemma, results=results).word
+                if nominative_token[-1] == '^' or nominative_token[-1] == '_':
+                    restored_token = nominative_token[:-2] + token[-1]
+                else: 
+                    restored_token = nominative_token[:-1] + token[-1]
             
-            ### OXYTONIZING RECURSION ###
-            if (
-                not oxytonized_pass and (
-                    macronized_token[-1] in GRAVES or
-                    (len(macronized_token) > 1 and macronized_token[-2] in GRAVES)
-                )
-            ): # e.g. στρατηγὸν
-                old_macronized_token = macronized_token
-                oxytonized_token = old_macronized_token[:-2] + replace_grave_with_acute(old_macronized_token[-2:])
-                oxytonized_token = macronization_modules(oxytonized_token, lemma, pos, morph, recursion_depth, oxytonized_pass=True, capitalized_pass=capitalized_pass, decapitalized_pass=decapitalized_pass, is_lemma=is_lemma)
-                rebarytonized_token = ''
-                if len(oxytonized_token) > 2:
-                    rebarytonized_token = oxytonized_token[:-3] + replace_acute_with_grave(oxytonized_token[-3:])
-                else:
-                    rebarytonized_token = oxytonized_token[:-2] + replace_acute_with_grave(oxytonized_token[-2:])
-                macronized_token = merge_or_overwrite_markup(rebarytonized_token, macronized_token)
-                if self.debug and count_dichrona_in_open_syllables(macronized_token) < count_dichrona_in_open_syllables(old_macronized_token):
-                    oxytonization_results.append(macronized_token)
-                    logging.debug(f'\t✅ Oxytonizing helped: : {count_dichrona_in_open_syllables(macronized_token)} left')
+            if restored_token:
+                macronized_token = macronized_token.merge(restored_token)
+
+                if self.debug and macronized_token.open_dichrona < old_macronized_token.open_dichrona:
+                    results.append(('case_ending_recursion', macronized_token))
+                    if trace:
+                        logging.debug(f'\t✅ Wrong-case-ending (D1) helped: {macronized_token.open_dichrona} left')
                 else:
+                    if trace:
+                        logging.debug(f'\t❌ Wrong-case-ending (D1) did not help')
+        
+        ### OXYTONIZING RECURSION ###
+        if (
+            not oxytonized_pass and (
+                macronized_token.word[-1] in GRAVES or
+                (len(macronized_token.word) > 1 and macronized_token.word[-2] in GRAVES)
+            )
+        ): # e.g. στρατηγὸν
+            old_macronized_token = macronized_token
+            oxytonized_token = old_macronized_token.word[:-2] + replace_grave_with_acute(old_macronized_token.word[-2:])
+            oxytonized_token = self.macronization_modules(oxytonized_token, lemma, pos, morph, recursion_depth, oxytonized_pass=True, capitalized_pass=capitalized_pass, decapitalized_pass=decapitalized_pass, is_lemma=is_lemma, results=results).word
+            rebarytonized_token = ''
+            if len(oxytonized_token) > 2:
+                rebarytonized_token = oxytonized_token[:-3] + replace_acute_with_grave(oxytonized_token[-3:])
+            else:
+                rebarytonized_token = oxytonized_token[:-2] + replace_acute_with_grave(oxytonized_token[-2:])
+            macronized_token = macronized_token.merge(rebarytonized_token)
+            if self.debug and macronized_token.open_dichrona < old_macronized_token.open_dichrona:
+                results.append(('oxytonization', macronized_token))
+                if trace:
+                    logging.debug(f'\t✅ Oxytonizing helped: : {macronized_token.open_dichrona} left')
+            else:
+                if trace:
                     logging.debug(f'\t❌ Oxytonizing did not help')
 
-            if count_dichrona_in_open_syllables(macronized_token) == 0:
-                return macronized_token
+        if macronized_token.open_dichrona == 0:
+            return macronized_token
 
-            ### DECAPITALIZING RECURSION ###
-            
-            '''Useful because many editions capitalize the first word of a sentence or section! '''
+        ### DECAPITALIZING RECURSION ###
+        
+        '''Useful because many editions capitalize the first word of a sentence or section! '''
 
-            if count_dichrona_in_open_syllables(macronized_token) > 0 and (token[0] in VOWELS_LOWER_TO_UPPER.values() or token[0] in CONSONANTS_LOWER_TO_UPPER.values()):
-                old_macronized_token = macronized_token
-                decapitalized_token = lower_grc(token[0]) + token[1:]
-                if not decapitalized_pass and macronized_token != decapitalized_token: # without the capitalized_pass check, we get infinite recursion for capitalized tokens
+        if macronized_token.open_dichrona > 0 and (token[0] in VOWELS_LOWER_TO_UPPER.values() or token[0] in CONSONANTS_LOWER_TO_UPPER.values()):
+            old_macronized_token = macronized_token
+            decapitalized_token = lower_grc(token[0]) + token[1:]
+            if not decapitalized_pass and macronized_token.word != decapitalized_token: # without the capitalized_pass check, we get infinite recursion for capitalized tokens
+                if self.debug:
+                    logging.debug(f'\t Decapitalizing {macronized_token.word} as {decapitalized_token}')
+                
+                decapitalized_token = self.macronization_modules(decapitalized_token, lemma, pos, morph, recursion_depth, oxytonized_pass=oxytonized_pass, capitalized_pass=capitalized_pass,  decapitalized_pass=True, different_ending_pass=different_ending_pass, is_lemma=is_lemma, double_accent_pass=double_accent_pass, reversed_elision_pass=reversed_elision_pass, results=results).word
+                recapitalized_token = token[0] + decapitalized_token[1:] # restore the original first character
+
+                macronized_token = macronized_token.merge(recapitalized_token)
+
+                if macronized_token.open_dichrona < old_macronized_token.open_dichrona:
+                    results.append(('decapitalization', macronized_token))
                     if self.debug:
-                        logging.debug(f'\t Decapitalizing {macronized_token} as {decapitalized_token}')
-                    
-                    decapitalized_token = macronization_modules(decapitalized_token, lemma, pos, morph, recursion_depth, oxytonized_pass=oxytonized_pass, capitalized_pass=capitalized_pass,  decapitalized_pass=True, different_ending_pass=different_ending_pass, is_lemma=is_lemma, double_accent_pass=double_accent_pass, reversed_elision_pass=reversed_elision_pass)
-                    recapitalized_token = token[0] + decapitalized_token[1:] # restore the original first character
-
-                    macronized_token = merge_or_overwrite_markup(recapitalized_token, macronized_token)
-
-                    if count_dichrona_in_open_syllables(macronized_token) < count_dichrona_in_open_syllables(old_macronized_token):
-                        decapitalization_results.append(macronized_token)
-                        if self.debug:
-                            logging.debug(f'\t✅ Decapitalization helped: {count_dichrona_in_open_syllables(macronized_token)} left')
-                    elif self.debug:
-                        logging.debug(f'\t❌ Decapitalization did not help')
-
-            ###############################
-            # HYPOTACTIC (SPECIAL SAFETY) #
-            ###############################
-
-            '''
-            Hypotactic is the wildest of the databases, because it is culled directly from verse. 
-            To minimize bugs, the safety-net idea here is that
-                1) hypotactic is the last module so that fully macronized tokens will not reach it,
-                2) the merge is done with precedence='old' so that hypotactic does not overwrite any previous macronization, 
-                3) bugs like θύ^ελλα_ν should be allowed to be corrected by an extra final accent-rule call.
-            '''
+                        logging.debug(f'\t✅ Decapitalization helped: {macronized_token.open_dichrona} left')
+                elif self.debug:
+                    logging.debug(f'\t❌ Decapitalization did not help')
 
-            old_macronized_token = macronized_token
-            hypotactic_token = self.hypotactic(macronized_token)
-            macronized_token = merge_or_overwrite_markup(hypotactic_token, macronized_token, precedence='old')
-            if count_dichrona_in_open_syllables(macronized_token) < count_dichrona_in_open_syllables(old_macronized_token):
-                hypotactic_results.append(macronized_token)
-                logging.debug(f'\t✅ Hypotactic helped: {old_macronized_token} => {macronized_token}, with {count_dichrona_in_open_syllables(macronized_token)} left')
-            else:
+        ###############################
+        # HYPOTACTIC (SPECIAL SAFETY) #
+        ###############################
+
+        '''
+        Hypotactic is the wildest of the databases, because it is culled directly from verse. 
+        To minimize bugs, the safety-net idea here is that
+            1) hypotactic is the last module so that fully macronized tokens will not reach it,
+            2) the merge is done with precedence='old' so that hypotactic does not overwrite any previous macronization, 
+            3) bugs like θύ^ελλα_ν should be allowed to be corrected by an extra final accent-rule call.
+        '''
+
+        old_macronized_token = macronized_token
+        hypotactic_token = self.hypotactic(macronized_token.base) # only the bare word is looked up
+        macronized_token = macronized_token.merge(hypotactic_token, precedence='old')
+        if macronized_token.open_dichrona < old_macronized_token.open_dichrona:
+            results.append(('hypotactic', macronized_token))
+            if trace:
+                logging.debug(f'\t✅ Hypotactic helped: {old_macronized_token.word} => {macronized_token.word}, with {macronized_token.open_dichrona} left')
+        else:
+            if trace:
                 logging.debug(f'\t❌ Hypotactic did not help')
 
-            old_macronized_token = macronized_token
-            accent_rules_token = self.apply_accentuation_rules(macronized_token) # accent rules benefit from earlier macronization
-            macronized_token = merge_or_overwrite_markup(accent_rules_token, macronized_token)
+        old_macronized_token = macronized_token
+        accent_rules_token = self.apply_accentuation_rules(macronized_token) # accent rules benefit from earlier macronization
+        macronized_token = macronized_token.merge(accent_rules_token)
 
-            if count_dichrona_in_open_syllables(macronized_token) < count_dichrona_in_open_syllables(old_macronized_token):
-                accent_rules_results.append(macronized_token)
-                logging.debug(f'\t✅ Accent rules helped: {old_macronized_token} => {macronized_token}, with {count_dichrona_in_open_syllables(macronized_token)} left')
-            else:
+        if macronized_token.open_dichrona < old_macronized_token.open_dichrona:
+            results.append(('accent_rules', macronized_token))
+            if trace:
+                logging.debug(f'\t✅ Accent rules helped: {old_macronized_token.word} => {macronized_token.word}, with {macronized_token.open_dichrona} left')
+        else:
+            if trace:
                 logging.debug(f'\t❌ Accent rules did not help')
-    
-            ################
-            # SANITY CHECK #
-            ################
 
-            macronized_normalized_for_checking = normalize_word(macronized_token.replace("^", "").replace("_", ""))
-            token_normalized_for_checking = normalize_word(token.replace("^", "").replace("_", ""))
-            if macronized_normalized_for_checking != token_normalized_for_checking: 
-                logging.DEBUG(f"Watch out! We just accidentally perverted a token: {token_normalized_for_checking} has become {macronized_normalized_for_checking}")
+        ################
+        # SANITY CHECK #
+        ################
 
-            macronized_token = demacronize_diphthong(macronized_token)
+        macronized_normalized_for_checking = macronized_token.analysis.normalized
+        token_normalized_for_checking = normalize_word(token.replace("^", "").replace("_", ""))
+        if macronized_normalized_for_checking != token_normalized_for_checking: 
+            if trace:
+                logging.debug(f"Watch out! We just accidentally perverted a token: {token_normalized_for_checking} has become {macronized_normalized_for_checking}")
 
-            return macronized_token
+        macronized_token = demacronize_diphthong(macronized_token)
+
+        return macronized_token
+
+    def macronize(self, text, genre='prose'):
+        """
+        Macronization is a modular and recursive process comprised of the following 13 steps, 
+        with the high-trust db modules first, then the algorithmic modules, the recursive ones and finally the hypotactic db module:
+            
+            [custom]
+            [wiktionary]
+            [lsj]
+
+            [nominal forms]
+            [verbal forms]
+            [accent rules]
+            [prefixes]
+
+            [double-accent recursion]
+            [reversed-elision recursion]
+            [wrong-case recursion]
+            [oxytonizing recursion]
+            [decapitalization recursion]
+
+            [hypotactic]
+            [accent rules] (re-applied in overwrite mode as a sanity check)
+
+        Accent rules relies on the output of the other modules for optimal performance.
+        Hypotactic has special safety measures in place; refer to it's docstring below. 
+        My design goal is that it should be easy for the "power user" to change the order of the other modules, and to graft in new ones.
+        """
+
+        text_object = self.make_text(text, genre)
+
+        return self.macronize_text_object(text_object, text, genre)
+
+    def macronize_stream(self, lines, genre='prose', chunk_lines=1000):
+        """
+        Macronizes any iterable of lines or sentences (e.g. an open file), yielding one macronized string per input item, in order.
+
+        The input is read lazily and macronized in chunks of at most chunk_lines lines, so memory use does not grow with the corpus.
+        The first chunks are smaller, so that the first output appears quickly. Trailing newlines of the items are dropped.
+        Should the output of a chunk not have as many lines as its input, the chunk is macronized again line by line.
+
+        >>> with open("anabasis.txt", encoding="utf-8") as f:
+        ...     for line in macronizer.macronize_stream(f):
+        ...         print(line)
+        """
+        for chunk in growing_chunks(lines, chunk_lines):
+            yield from self.macronize_chunk([item.rstrip('\n') for item in chunk], genre)
+
+    def macronize_parallel(self, lines, workers=None, genre='prose', chunk_lines=200, start_method=None, torch_threads=None):
+        """
+        Like macronize_stream, but with the chunks macronized by a pool of worker processes configured like this Macronizer.
+        Yields one macronized string per input item, in order.
+
+        workers defaults to the number of cores, and torch_threads (per worker) to the cores divided by the workers.
+        start_method is 'fork' on Linux and the platform's default elsewhere; see parallel.py for how the workers share the databases.
+
+        >>> with open("anabasis.txt", encoding="utf-8") as f:
+        ...     macronized_lines = list(macronizer.macronize_parallel(f, workers=4))
+        """
+        return macronize_parallel(self, lines, workers=workers, genre=genre, chunk_lines=chunk_lines, start_method=start_method, torch_threads=torch_threads)
+
+    def macronize_pipelined(self, lines, tag_workers=None, rule_workers=None, genre='prose', chunk_lines=200, start_method=None, torch_threads=2):
+        """
+        Like macronize_parallel, but with tagging and the macronization modules in two separate pools of workers,
+        so that odyCy's matrix math and the pure-Python modules keep different cores busy at the same time (see parallel.py).
+        Yields one macronized string per input item, in order.
+
+        tag_workers defaults to a quarter of the cores, each running torch on torch_threads threads, and rule_workers to the remaining cores.
+        """
+        return macronize_pipelined(self, lines, tag_workers=tag_workers, rule_workers=rule_workers, genre=genre, chunk_lines=chunk_lines, start_method=start_method, torch_threads=torch_threads)
+
+    def macronize_chunk(self, chunk, genre='prose'):
+        """
+        Macronizes a list of strings as one text and splits the result back into one string per item.
+        """
+        macronized = regroup_lines(chunk, self.macronize('\n'.join(chunk), genre))
+        if macronized is None:
+            logging.warning(f"Macronizing {len(chunk)} items gave the wrong number of lines; macronizing them one by one")
+            return [self.macronize(item, genre) if item.strip() else item for item in chunk]
+        return macronized
+
+    def make_text(self, text, genre='prose', all_sentences=False):
+        """
+        Cleans, splits and tags text (or reads its tags from the caches) into a Text, keeping count of the tagging throughput.
+        With all_sentences=True, sentences without any dichrona are tagged and kept as well.
+        """
+        text_object = Text(text, genre, doc_from_file=self.doc_from_file, debug=self.debug, custom_doc=self.custom_doc, lowercase=self.lowercase, nlp=self._nlp, load_nlp=lambda: self.nlp, doc_cache=self.doc_cache, docs_dir=self.docs_dir,
+                           batch_size=self.batch_size, sort_by_length=self.sort_by_length, tagger_variant=self.tagger_variant,
+                           max_sentence_tokens=self.max_sentence_tokens, window_overlap=self.window_overlap, all_sentences=all_sentences)
+        for key, value in text_object.tagging_stats.items():
+            self.tagging_stats[key] += value
+        if text_object.tagging_stats["tokens"]:
+            tagging_report = f"Tagging: {self.tokens_per_second:.0f} tokens/s over this Macronizer's lifetime (batch_size={self.batch_size}, sort_by_length={self.sort_by_length}, disable={self.disable}, exclude={self.exclude})"
+            logging.info(tagging_report)
+            if self.make_prints:
+                print(tagging_report)
+
+        return text_object
+
+    def macronize_annotated(self, annotated, genre='prose'):
+        """
+        Macronizes pre-annotated input without ever loading odyCy: the given lemma, UPOS and FEATS of each word
+        are fed to the same filtering and macronization modules as odyCy's would be.
+
+        annotated is CoNLL-U (a path, a string or an iterable of lines),
+        or an iterable of (form, lemma, upos, feats) tuples with None between sentences; see annotated.py.
+        Returns the macronized text, one sentence per line.
+
+        >>> macronizer.macronize_annotated("treebank.conllu")
+        >>> macronizer.macronize_annotated([("Κῦρος", "Κῦρος", "PROPN", "Case=Nom|Gender=Masc|Number=Sing"), ...])
+        """
+        text_object = Text.from_annotations(read_annotated(annotated), genre, debug=self.debug, lowercase=self.lowercase)
+        logging.info(f"Macronizing {len(text_object.docs)} pre-annotated sentences, {len(text_object.token_lemma_pos_morph)} tokens")
+
+        return self.macronize_text_object(text_object, text_object.text, genre)
+
+    def macronize_text_object(self, text_object, text, genre='prose'):
+        """
+        Runs the macronization modules over the tokens of a Text and integrates the results into its .macronized_text.
+        text is the input the ratio is computed against.
+        """
+        token_lemma_pos_morph = text_object.token_lemma_pos_morph # format: [[orth, token.lemma_, token.pos_, token.morph], ...]
+
+        # lists to keep track of the modules' efficacy, filled from the (module, token) events reported by macronization_modules
+
+        results_dict = {f"{module}_results": [] for module in MODULES}
+
+        failed = []
+        macronized = self.macronize_tokens(token_lemma_pos_morph, genre, failed=failed)
+        failures, passthrough = self.contain_failures(text_object, failed)
 
         macronized_tokens = []
         still_ambiguous = []
-        for token, lemma, pos, morph in tqdm(token_lemma_pos_morph, desc="Macronizing tokens ☕️", leave=self.make_prints):
-            logging.debug(f'Sending to macronization_modules: {token} ({lemma}, {pos}, {morph})')
-            result = macronization_modules(token, lemma, pos, morph)
-            if count_dichrona_in_open_syllables(result) > 0:
+        for i, ((token, lemma, pos, morph), (result, events)) in enumerate(zip(token_lemma_pos_morph, macronized)):
+            if i in passthrough:
+                macronized_tokens.append(None) # integrate leaves the word as it is
+                continue
+            for module, module_token in events:
+                results_dict[f"{module}_results"].append(module_token)
+            if open_dichrona(result) > 0:
                 still_ambiguous.append((result, lemma, pos, morph))
             macronized_tokens.append(result)
 
         logging.info(f'\n\n### END OF MACRONIZATION ###\n\n')
+        logging.info(f'Token cache: {self.token_cache}')
+        if self.token_store is not None:
+            self.token_store.flush()
+            logging.info(f'Token store: {self.token_store}')
 
         text_object.macronized_words = macronized_tokens
         text_object.integrate() # creates the final .macronized_text
@@ -715,82 +1083,146 @@ class Macronizer:
         if self.make_prints:
             the_ratio = self.macronization_ratio(text, text_object.macronized_text, count_all_dichrona=True, count_proper_names=True)
         
-        # MODULE EFFICACY LISTS
+        self.write_diagnostics(results_dict, still_ambiguous, failures)
 
-        results_dict = {
-            "custom_results": custom_results,
-            "wiktionary_results": wiktionary_results,
-            "lsj_results": lsj_results,
+        return text_object.macronized_text
+    
+    def contain_failures(self, text_object, failed):
+        """
+        Reports the (index, error type, message) failures of macronize_tokens on the tokens of text_object.
+        Returns the report entries and, with errors='passthrough-sentence', the indices of all the tokens in the sentences of the failed ones.
+        """
+        failures = []
+        failed_docs = set()
+        for i, error_type, message in failed:
+            token, lemma, pos, morph = text_object.token_lemma_pos_morph[i]
+            sentence = None
+            if text_object.token_positions is not None:
+                doc_index = text_object.token_positions[i][0]
+                failed_docs.add(doc_index)
+                if text_object.docs is not None:
+                    sentence = text_object.docs[doc_index].text
+            failures.append(self.report_failure(token, lemma, pos, morph, error_type, message, sentence))
+
+        passthrough = set()
+        if self.errors == 'passthrough-sentence' and failed_docs:
+            passthrough = {i for i, (doc_index, _) in enumerate(text_object.token_positions) if doc_index in failed_docs}
+        return failures, passthrough
+
+    def macronized_sentences(self, text_object, genre='prose', results_dict=None, still_ambiguous=None, failures=None, first_sent_id=1):
+        """
+        Macronizes a Text one sentence at a time, yielding a MacronizedSentence (see writers.py) as soon as each is done,
+        with every token of the sentence, its macronized form and the module behind each vowel length.
+        The module events, still-ambiguous words and failures (see errors) are added to results_dict, still_ambiguous and failures, if given.
+        The sentences are numbered from first_sent_id.
+        """
+        token_lemma_pos_morph = text_object.token_lemma_pos_morph
+        to_macronize = defaultdict(dict) # doc index => {token index in the doc: index in token_lemma_pos_morph}
+        for i, (doc_index, token_index) in enumerate(text_object.token_positions):
+            to_macronize[doc_index][token_index] = i
+
+        for doc_index, doc in enumerate(text_object.docs):
+            indices = to_macronize.get(doc_index, {})
+            tokens = list(doc)
+
+            results = {}
+            failed = []
+            for token_index, i in indices.items():
+                result = self.try_macronize_token(*token_lemma_pos_morph[i], genre)
+                if isinstance(result, Exception):
+                    failed.append((i, type(result).__name__, str(result)))
+                    result = (token_lemma_pos_morph[i][0], ())
+                results[token_index] = result
+            sentence_failures, passthrough = self.contain_failures(text_object, failed)
+            if failures is not None:
+                failures += sentence_failures
+
+            macronized_tokens = []
+            pieces = []
+            position = 0
+            for token_index, token in enumerate(tokens):
+                macronized, sources = None, []
+                i = indices.get(token_index)
+                if i is not None and i not in passthrough:
+                    orth, lemma, pos, morph = token_lemma_pos_morph[i]
+                    macronized, events = results[token_index]
+                    sources = length_sources(orth, macronized, events)
+                    if results_dict is not None:
+                        for module, module_token in events:
+                            results_dict[f"{module}_results"].append(module_token)
+                    if still_ambiguous is not None and open_dichrona(macronized) > 0:
+                        still_ambiguous.append((macronized, lemma, pos, morph))
+
+                    bare = macronized.replace('_', '').replace('^', '')
+                    if sources and doc.text[token.idx:token.idx + len(bare)] == bare:
+                        pieces.append(doc.text[position:token.idx])
+                        pieces.append(macronized)
+                        position = token.idx + len(bare)
+
+                end = token.idx + len(token.text)
+                space_after = token_index == len(tokens) - 1 or doc.text[end:end + 1].isspace()
+                macronized_tokens.append(MacronizedToken(token.text, token.lemma_, token.pos_, str(token.morph), space_after, macronized, sources))
+            pieces.append(doc.text[position:])
+
+            yield MacronizedSentence(first_sent_id + doc_index, doc.text, ''.join(pieces), macronized_tokens)
+
+    def write_macronized(self, source, out, genre='prose', format='conllu', annotated=False, chunk_lines=1000):
+        """
+        Macronizes source and writes it to out (a path or an open text file) as CoNLL-U or JSON lines (format='jsonl'),
+        one sentence at a time as soon as it is macronized. Every sentence is written, those with nothing to macronize unchanged.
+        source is plain text (a string, or any iterable of lines, such as an open file), or with annotated=True anything macronize_annotated accepts.
+        Like macronize_stream, the input is tagged and macronized in chunks of at most chunk_lines lines (or annotated sentences),
+        and the diagnostics are recorded after every chunk, so that memory use does not grow with the corpus.
+        Returns the number of sentences written.
+
+        >>> macronizer.write_macronized(text, "anabasis.conllu")
+        """
+        if annotated:
+            chunks = growing_chunks(read_annotated(source), chunk_lines)
+        else:
+            lines = source.split('\n') if isinstance(source, str) else (line.rstrip('\n') for line in source)
+            chunks = growing_chunks(lines, chunk_lines)
+
+        with open_writer(out, format) as writer, tqdm(desc="Macronizing sentences ☕️", unit=" sentences", leave=self.make_prints) as progress:
+            for chunk in chunks:
+                if annotated:
+                    text_object = Text.from_annotations(chunk, genre, debug=self.debug, lowercase=self.lowercase)
+                elif any(line.strip() for line in chunk):
+                    text_object = self.make_text('\n'.join(chunk), genre, all_sentences=True) # every sentence, so that the output is aligned with the input
+                else:
+                    continue
 
-            "nominal_forms_results": nominal_forms_results,
-            "verbal_forms_results": verbal_forms_results,
-            "accent_rules_results": accent_rules_results,
-            "prefix_results": prefix_results,
+                results_dict = {f"{module}_results": [] for module in MODULES}
+                still_ambiguous = []
+                failures = []
+                for sentence in self.macronized_sentences(text_object, genre, results_dict, still_ambiguous, failures, first_sent_id=writer.sentences + 1):
+                    writer.write(sentence)
+                    progress.update()
 
-            "double_accent_recursion_results": double_accent_recursion_results,
-            "case_ending_recursion_results": case_ending_recursion_results,
-            "reversed_elision_recursion_results": reversed_elision_recursion_results,
-            "oxytonization_results": oxytonization_results,
-            "decapitalization_results": decapitalization_results,
+                if self.token_store is not None:
+                    self.token_store.flush()
+                self.write_diagnostics(results_dict, still_ambiguous, failures)
 
-            "hypotactic_results": hypotactic_results,
-        }
+        logging.info(f'Wrote {writer.sentences} macronized sentences as {format}. Token cache: {self.token_cache}')
+        if self.token_store is not None:
+            logging.info(f'Token store: {self.token_store}')
 
-        module_dir = Path("diagnostics") / "modules"
-        module_dir.mkdir(parents=True, exist_ok=True)  # better than os.makedirs
-
-        for name, result_list in results_dict.items():
-            logging.debug(f'RESULT LIST: Found {len(result_list)} results in {name}')
-
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            out_path = module_dir / f"{timestamp}_{name}.txt"
-            with out_path.open("w", encoding="utf-8") as f:
-                for word in result_list:
-                    f.write(f"{word}\n")
-
-        # STILL_AMBIGUOUS
-
-        def sort_by_occurrences(lst):
-            count = Counter(x[0] for x in lst)
-            sorted_lst = sorted(lst, key=lambda x: (-count[x[0]], x[0]))  # Sort by frequency (desc), then by value (asc)
-            return sorted_lst, count  # Return sorted list + count dictionary
-
-        sorted_list, counts = sort_by_occurrences(still_ambiguous)  # Preserve order
-        # Remove duplicates while preserving order (based on first element of quadruple)
-        seen = set()
-        unique_sorted_list = []
-        for item in sorted_list:
-            key = item[0]
-            if key not in seen:
-                seen.add(key)
-                unique_sorted_list.append(item)
-
-        file_version = 1
-        file_stub = ''
-        file_name = ''
-
-        still_ambiguous_dir = Path("diagnostics") / "still_ambiguous"
-        still_ambiguous_dir.mkdir(parents=True, exist_ok=True)  # Create directory if it doesn't exist
-
-        if len(macronized_tokens) > 0:
-            if macronized_tokens[0]:
-                file_stub = still_ambiguous_dir / f'still_ambiguous_{macronized_tokens[0].replace("^", "").replace("_", "")}'
-            else:
-                file_stub = still_ambiguous_dir / 'still_ambiguous'
+        return writer.sentences
 
-            while True:
-                file_name = file_stub.with_name(f'{file_stub.stem}_{file_version}.tsv')  # Output TSV now
-                if not file_name.exists():
-                    break
-                file_version += 1
+    def write_diagnostics(self, results_dict, still_ambiguous, failures=None):
+        """
+        Adds the module efficacy lists, the still-ambiguous words and the error report entries of a call to self.diagnostics (see diagnostics.py),
+        which writes them all to one file.
+        """
+        self.diagnostics.record(results_dict, still_ambiguous, failures)
 
-            with file_name.open('w', encoding='utf-8') as f:
-                for item in unique_sorted_list:
-                    count = counts[item[0]]
-                    f.write(f"{count}\t{item[0]}\t{item[1]}\t{item[2]}\t{item[3]}\n")
+    def flush_diagnostics(self):
+        """
+        Writes the diagnostics counted so far to their file (diagnostics/diagnostics_{timestamp}_{pid}.json unless diagnostics_path is given) and returns its path.
+        """
+        self.diagnostics.flush()
+        return self.diagnostics.path
 
-        return text_object.macronized_text
-    
     def macronization_ratio(self, text, macronized_text, count_all_dichrona=True, count_proper_names=True):
         def remove_proper_names(text):
             # Build a regex pattern that matches whole words from the set
@@ -834,57 +1266,57 @@ class Macronizer:
         return ratio
     
     def apply_accentuation_rules(self, old_version):
-        if "'" in old_version:
+        '''
+        Marks the dichrona that the accent decides: the penult of a paroxytone with a short ultima is short,
+        the ultima of a paroxytone with a long accented penult is long, and the ultima of a properispomenon or proparoxytone is short.
+        old_version is a string with markup or a WordAnalysis; returns a WordAnalysis.
+        '''
+        trace = trace_enabled() # see logs.py
+
+        old_version = analyze(old_version)
+        if "'" in old_version.base:
             return old_version
 
         if not old_version:
             return old_version
-        old_version = normalize_word(old_version)
-
-        new_version = old_version.replace('_', '').replace('^', '') # this will be updated later
-
-        list_of_syllables = syllabifier(old_version) # important: needs to use old_version, for markup to potentially decide short_vowel and long_acute
-        total_syllables = len(list_of_syllables)
-
-        syllable_positions = [ # can't filter out sylls here because I want to join them later
-            (-(total_syllables - i), syllable)  # Position from the end
-            for i, syllable in enumerate(list_of_syllables)
-        ]
+        old_version = old_version.normalized()
 
-        if not syllable_positions:
+        list_of_syllables = old_version.syllables # important: with the markup, which may decide short_vowel and long_acute
+        if not list_of_syllables:
             return old_version
         
         ultima = list_of_syllables[-1]
         penultima = list_of_syllables[-2] if len(list_of_syllables) > 1 else None
 
-        modified_syllable_positions = []
-        for position, syllable in syllable_positions:
-            modified_syllable = syllable.replace('_', '').replace('^', '')  # Create a new variable to store modifications
-            if position == -2 and paroxytone(new_version) and short_vowel(ultima):
-                # Find the last vowel in syllable and append '^' after it
-                for i in range(len(syllable)-1, -1, -1): # NB: len(syllable)-1 is the index of the last character (0-indexed); -1 is to go backwards
-                    if vowel(syllable[i]) and word_with_real_dichrona(syllable):
-                        modified_syllable = syllable[:i+1] + '^' + syllable[i+1:].replace("^", "").replace("_", "")
-                        break
-            elif position == -1 and paroxytone(new_version) and long_acute(penultima):
-                # Find the last vowel in syllable and append '_' after it
-                for i in range(len(syllable)-1, -1, -1):
-                    if vowel(syllable[i]) and word_with_real_dichrona(syllable):
-                        modified_syllable = syllable[:i+1] + '_' + syllable[i+1:].replace("^", "").replace("_", "")
-                        break
-            elif position == -1 and (properispomenon(new_version) or proparoxytone(new_version)):
-                # Find the last vowel in syllable and append '^' after it
-                for i in range(len(syllable)-1, -1, -1):
-                    if vowel(syllable[i]) and word_with_real_dichrona(syllable):
-                        modified_syllable = syllable[:i+1] + '^' + syllable[i+1:].replace("^", "").replace("_", "")
-                        break
-            modified_syllable_positions.append((position, modified_syllable))
-            
-        new_version = ''.join(syllable for _, syllable in modified_syllable_positions)
-
-        merged = merge_or_overwrite_markup(new_version, old_version)
+        is_paroxytone = old_version.paroxytone
+        is_properispomenon_or_proparoxytone = old_version.properispomenon or old_version.proparoxytone
+
+        rules = [] # (syllable position from the end, mark)
+        if penultima is not None and is_paroxytone and short_vowel(ultima):
+            rules.append((-2, SHORT_MARK))
+        if is_paroxytone and long_acute(penultima):
+            rules.append((-1, LONG_MARK))
+        elif is_properispomenon_or_proparoxytone:
+            rules.append((-1, SHORT_MARK))
+
+        merged = old_version
+        spans = old_version.analysis.spans
+        for position, mark in rules:
+            syllable = list_of_syllables[position]
+            # Find the last vowel in syllable and mark it; the merge keeps the markup of the rest of the word
+            for i in range(len(syllable)-1, -1, -1):
+                if vowel(syllable[i]) and word_with_real_dichrona(syllable):
+                    if spans is None:
+                        marked = [s.replace('_', '').replace('^', '') for s in list_of_syllables]
+                        marked[position] = syllable[:i+1] + MARKUP_CHARS[mark] + syllable[i+1:].replace("^", "").replace("_", "")
+                        merged = merged.merge(''.join(marked))
+                    else:
+                        markup_before = sum(char in '^_' for char in syllable[:i])
+                        merged = merged.with_mark(spans[position][0] + i - markup_before, mark)
+                    break
 
         if macronized_diphthong(merged):
-            logging.debug(f"apply_accentuation_rules just macronized a diphthong, so we returned the old version: {merged}")
+            if trace:
+                logging.debug(f"apply_accentuation_rules just macronized a diphthong, so we returned the old version: {merged.word}")
             return old_version
         return merged
@@ -1,16 +1,21 @@
+from collections import deque
 import logging
 from pathlib import Path
 import re
+from time import perf_counter
 from tqdm import tqdm
 import warnings
 
-import grc_odycy_joint_trf
 from spacy.tokens import DocBin
+from spacy.vocab import Vocab
 import xxhash
 
 from grc_utils import ACCENTS, ACUTES, count_dichrona_in_open_syllables, GRAVES, is_greek_numeral, lower_grc, normalize_word, ROUGHS, syllabifier
 
+from .doc_cache import default_cache_dir
+from .logs import trace_enabled
 from .stop_list import stop_list
+from .tagged import as_tagged, pack_docs, TaggedDoc, TaggedToken, unpack_docs
 from .stop_list_epic import epic_stop_words
 
 warnings.filterwarnings('ignore', category=FutureWarning)
@@ -21,60 +26,180 @@ middle_dot = "\u00b7"
 apostrophes = "'’‘´΄\u02bc᾿͵" # the last one is for thousands
 
 def word_list(text):
+    trace = trace_enabled() # see logs.py
+
     to_clean = r'[\u0387\u037e\u00b7\.,!?;:\"()\[\]{}<>«»\-—…|⏑⏓†×]' # NOTE hyphens must be escaped (AI usually misses this)
     
     cleaned_text = re.sub(to_clean, ' ', text)
 
     word_list = [word for word in cleaned_text.split() if word]
     
-    logging.debug(f"Diagnostic word list: {word_list}")
+    if trace:
+        logging.debug(f"Diagnostic word list: {word_list}")
 
     return word_list
 
-class Text:
+def an_context(doc):
     '''
-    Container for text and metadata during macronization.
-    Firstly, it stores the odyCy tokenization metadata so it can be used with the nominal_forms method.
-    Secondly, it stores the list of words to be macronized, together with their odyCy tokenization metadata.
-    Thirdly, it stores the macronized text.
+    The two features of a sentence that decide the length of ἂν: (has a subjunctive verb, has no εἰ).
+    Computed once per doc rather than once per ἂν.
+    '''
+    trace = trace_enabled() # see logs.py
+
+    subjunctive_verb = False
+    no_ei = True
+    for token in doc:
+        if 'Sub' in token.morph.get('Mood'):
+            subjunctive_verb = True
+        if token.text == 'εἰ' or token.text == 'εἴ':
+            no_ei = False
+            if trace:
+                logging.debug(f"\t\tEi found: {token.text}")
+    return subjunctive_verb, no_ei
+
+# Ano teleia, middle dot, comma and colon: where we prefer to cut sentences that are too long for the transformer
+WINDOW_BREAKS = ("\u0387", "\u00b7", ",", ":")
+
+def sentence_windows(sentence, max_tokens, overlap=8):
+    '''
+    Splits a sentence of more than max_tokens (whitespace-separated) words into windows of at most max_tokens words,
+    cut right after an ano teleia or comma in the second half of the window if there is one, else at whitespace.
+    Each window overlaps the previous one by `overlap` words, so that the tagger sees some context on both sides of a cut;
+    the tokens in an overlap are owned by the window in whose middle they lie.
 
-    Essentially, this means that we trust odyCy to create the tokens list, instead of creating it ourselves in the Macronizer class as before.
-    This is a necessary step towards a more modular design, where the Text class is responsible for the text and its metadata, and the Macronizer class is responsible for the macronization.
+    Returns a list of (window start, window end, owned start, owned end) character offsets into the sentence.
+    The owned ranges partition the sentence.
+    '''
+    words = list(re.finditer(r'\S+', sentence))
+    if not max_tokens or len(words) <= max_tokens:
+        return [(0, len(sentence), 0, len(sentence))]
+
+    overlap = min(overlap, max_tokens // 2)
+    windows = [] # word index ranges [start, end)
+    start = 0
+    while True:
+        end = start + max_tokens
+        if end >= len(words):
+            windows.append((start, len(words)))
+            break
+        for cut in range(end - 1, start + max_tokens // 2 - 1, -1):
+            if words[cut].group().endswith(WINDOW_BREAKS):
+                end = cut + 1
+                break
+        windows.append((start, end))
+        start = max(end - overlap, start + 1)
+
+    result = []
+    owned_start = 0
+    for i, (start, end) in enumerate(windows):
+        if i + 1 < len(windows):
+            next_start = windows[i + 1][0]
+            boundary = max(end - overlap // 2, next_start) # word index where the next window takes over
+            owned_end = words[boundary].start() if boundary < len(words) else len(sentence)
+        else:
+            owned_end = len(sentence)
+        result.append((words[start].start(), words[end - 1].end(), owned_start, owned_end))
+        owned_start = owned_end
+    return result
 
-    NB: The user shouldn't have to deal with this class; it is to be used *internally* by the interfacing Macronizer class.
+def tag_sentences(nlp, sentences, batch_size=None, sort_by_length=False, max_sentence_tokens=None, window_overlap=8):
     '''
+    Runs odyCy over the sentences and returns (TaggedDocs in the order of the sentences, number of tokens, seconds).
 
-    def __init__(self, text, genre='prose', doc_from_file=True, custom_doc="", debug=False, lowercase=False):
-        
-        # -- Prepare the text for odyCy --
+    sort_by_length batches sentences of similar length together, which wastes less padding in the transformer;
+    the docs are put back in the original order afterwards.
+
+    Sentences longer than max_sentence_tokens words are tagged in overlapping windows (see sentence_windows),
+    whose analyses are stitched back into one doc per sentence, so the rest of the pipeline sees the same token stream.
+    '''
+    windows = [] # (sentence index, window start, owned start, owned end)
+    window_texts = []
+    for i, sentence in enumerate(sentences):
+        for start, end, owned_start, owned_end in sentence_windows(sentence, max_sentence_tokens, window_overlap):
+            windows.append((i, start, owned_start, owned_end))
+            window_texts.append(sentence[start:end])
+    if len(windows) > len(sentences):
+        logging.info(f"Split {len(sentences)} sentences into {len(windows)} windows of at most {max_sentence_tokens} words")
+
+    order = sorted(range(len(window_texts)), key=lambda i: len(window_texts[i])) if sort_by_length else range(len(window_texts))
+    window_docs = [None] * len(window_texts)
+
+    start = perf_counter()
+    tagged = nlp.pipe((window_texts[i] for i in order), batch_size=batch_size)
+    for i, doc in zip(order, tqdm(tagged, total=len(window_texts), leave=False, desc="odyCy pipeline")):
+        window_docs[i] = as_tagged(doc)
+    seconds = perf_counter() - start
+
+    docs = [None] * len(sentences)
+    split_tokens = {} # sentence index => stitched tokens, for sentences tagged in more than one window
+    for (i, window_start, owned_start, owned_end), doc in zip(windows, window_docs):
+        if (window_start, owned_start, owned_end) == (0, 0, len(sentences[i])) and doc.text == sentences[i]:
+            docs[i] = doc
+            continue
+        tokens = split_tokens.setdefault(i, [])
+        for token in doc:
+            idx = window_start + token.idx
+            if owned_start <= idx < owned_end:
+                tokens.append(TaggedToken(token.text, idx, token.lemma_, token.pos_, token.morph))
+    for i, tokens in split_tokens.items():
+        docs[i] = TaggedDoc.from_tokens(sentences[i], tokens)
+
+    tokens = sum(len(doc) for doc in docs)
+    logging.info(f"odyCy tagged {len(sentences)} sentences, {tokens} tokens in {seconds:.2f}s ({tokens / seconds if seconds else 0:.0f} tokens/s, batch_size={batch_size}, sort_by_length={sort_by_length})")
+    return docs, tokens, seconds
+
+def clean_text(text, lowercase=False):
+    '''
+    Prepares text for odyCy: strips non-Greek characters and editorial markup, normalizes, optionally lowercases
+    and turns every kind of elision mark into an apostrophe. Used for whole texts and for the forms of pre-annotated tokens alike.
+    '''
 
-        ### Clean non-Greek characters and punctuation
+    ### Clean non-Greek characters and punctuation
 
-        chars_to_clean = r'[\^_()\[\]{}<>⟨⟩⎡⎤\"«»\-—…|⏑⏓†×]'
-        oga = r'[#$%&*+/=@~£¦§¨ª¬¯°±²³¶¸¹½¿ÁÄÆÈÉÌÍÒÓÖÚÜßàáâäæçèéëìíïòóôö÷ùúüýÿĀāćĎďĹŒœŕźƑǁȳɛʰʳ˘˙˝ˡˢˣ̠̣͎̀́̄̅̆̇̈̊̔͂͞ͅ΅ЗСҀҁҏӄӔӕֹלݲតហឲាិេᵃᵅᵇᵈᵉᵊᵍᵏᵐᵒᵖᵗᵘᵛᵝᶜᶠᶦᶹḍḿṃẂẃẉạụỳ‐‒–―‖✶❮❯⟦⟧⥼⥽⦵⨆⩚⩹⫯⸕⸢⸣⸤⸥⸨〈〉ﬀﬁ＊－｢�𐅵𝒢𝒮𝔮𝕷‹›※‾⁄⁎⁑⁰ⁱ⁴⁵⁶⁷⁸⁹ⁿ€™ℵ∗√∠∴∼∾⊏⊔⊙⊢⊣⊤⊻⋃⋆⋇⋖⌈⌉⌊⌋⌞⌟⏒⏔⏕─═║△○◻★☼☾☿♀♂♃♄]' # OCR errors in OGA; rarely found in edited digital edition
+    chars_to_clean = r'[\^_()\[\]{}<>⟨⟩⎡⎤\"«»\-—…|⏑⏓†×]'
+    oga = r'[#$%&*+/=@~£¦§¨ª¬¯°±²³¶¸¹½¿ÁÄÆÈÉÌÍÒÓÖÚÜßàáâäæçèéëìíïòóôö÷ùúüýÿĀāćĎďĹŒœŕźƑǁȳɛʰʳ˘˙˝ˡˢˣ̠̣͎̀́̄̅̆̇̈̊̔͂͞ͅ΅ЗСҀҁҏӄӔӕֹלݲតហឲាិេᵃᵅᵇᵈᵉᵊᵍᵏᵐᵒᵖᵗᵘᵛᵝᶜᶠᶦᶹḍḿṃẂẃẉạụỳ‐‒–―‖✶❮❯⟦⟧⥼⥽⦵⨆⩚⩹⫯⸕⸢⸣⸤⸥⸨〈〉ﬀﬁ＊－｢�𐅵𝒢𝒮𝔮𝕷‹›※‾⁄⁎⁑⁰ⁱ⁴⁵⁶⁷⁸⁹ⁿ€™ℵ∗√∠∴∼∾⊏⊔⊙⊢⊣⊤⊻⋃⋆⋇⋖⌈⌉⌊⌋⌞⌟⏒⏔⏕─═║△○◻★☼☾☿♀♂♃♄]' # OCR errors in OGA; rarely found in edited digital edition
 
-        before_odycy = text
-        before_odycy = re.sub(chars_to_clean, '', before_odycy)
-        before_odycy = re.sub(oga, '', before_odycy)
+    before_odycy = text
+    before_odycy = re.sub(chars_to_clean, '', before_odycy)
+    before_odycy = re.sub(oga, '', before_odycy)
 
-        ### Normalize
+    ### Normalize
 
-        before_odycy = normalize_word(before_odycy)
+    before_odycy = normalize_word(before_odycy)
 
-        ### Lower the case
+    ### Lower the case
 
-        if lowercase:
-            before_odycy = lower_grc(before_odycy)
+    if lowercase:
+        before_odycy = lower_grc(before_odycy)
 
-        ### Normalize elisions
+    ### Normalize elisions
 
-        before_odycy = before_odycy.replace('’', "'") # odyCy only understands apostrophe \u0027. Right single quote \u2019 => apostrophe \u0027
-        before_odycy = before_odycy.replace('‘', "'") # "Left single quotation mark"
-        before_odycy = before_odycy.replace('\u02bc', "'") # "Modifier letter apostrophe" (ʼ)
-        before_odycy = before_odycy.replace('´', "'") # "Acute accent"
-        before_odycy = before_odycy.replace('΄', "'") # "Greek tonos"
-        before_odycy = before_odycy.replace('᾿', "'") # "Greek psili", absurdly used a ton for elision in OGA, e.g. "λέγει παρ᾿ ἱστορίαν", probably an OCR error (psili should never occur alone, it is a diacritic)
+    before_odycy = before_odycy.replace('’', "'") # odyCy only understands apostrophe \u0027. Right single quote \u2019 => apostrophe \u0027
+    before_odycy = before_odycy.replace('‘', "'") # "Left single quotation mark"
+    before_odycy = before_odycy.replace('\u02bc', "'") # "Modifier letter apostrophe" (ʼ)
+    before_odycy = before_odycy.replace('´', "'") # "Acute accent"
+    before_odycy = before_odycy.replace('΄', "'") # "Greek tonos"
+    before_odycy = before_odycy.replace('᾿', "'") # "Greek psili", absurdly used a ton for elision in OGA, e.g. "λέγει παρ᾿ ἱστορίαν", probably an OCR error (psili should never occur alone, it is a diacritic)
+
+    return before_odycy
+
+class Text:
+    '''
+    Container for text and metadata during macronization.
+    Firstly, it stores the odyCy tokenization metadata so it can be used with the nominal_forms method.
+    Secondly, it stores the list of words to be macronized, together with their odyCy tokenization metadata.
+    Thirdly, it stores the macronized text.
+
+    Essentially, this means that we trust odyCy to create the tokens list, instead of creating it ourselves in the Macronizer class as before.
+    This is a necessary step towards a more modular design, where the Text class is responsible for the text and its metadata, and the Macronizer class is responsible for the macronization.
+
+    NB: The user shouldn't have to deal with this class; it is to be used *internally* by the interfacing Macronizer class.
+    '''
+
+    def __init__(self, text, genre='prose', doc_from_file=True, custom_doc="", debug=False, lowercase=False, nlp=None, doc_cache=None, load_nlp=None, batch_size=None, sort_by_length=False, tagger_variant="", max_sentence_tokens=None, window_overlap=8, docs_dir=None, all_sentences=False):
         
+        before_odycy = clean_text(text, lowercase)
+
         ### Preëmptive macronization of a few straightforward words that odyCy doesn't handle well
 
         before_odycy = re.sub(r'\sτἄλλα\s', 'τἄλλα^', before_odycy)
@@ -86,151 +211,292 @@ class Text:
             logging.debug(f"Text before odyCy but after clean-up: {before_odycy}")
 
         diagnostic_word_list = word_list(before_odycy) # this list serves as a standard for what constitutes a word in the present text
+        diagnostic_words = set(diagnostic_word_list) # for constant-time membership tests when filtering the tokens
 
         ### Create sentence list
 
-        sentence_list = [sentence for sentence in re.findall(r'[^.\n;\u037e]+[.\n;\u037e]?', before_odycy) if sentence and count_dichrona_in_open_syllables(sentence) > 0] # then split the input into sentences, to enable using spaCy pipe batch processing and tqdm
+        # then split the input into sentences, to enable using spaCy pipe batch processing and tqdm. Sentences with nothing to macronize
+        # are not even tagged, unless all_sentences is set, as for token-aligned output (Macronizer.write_macronized)
+        sentence_matches = [match for match in re.finditer(r'[^.\n;\u037e]+[.\n;\u037e]?', before_odycy) if match.group().strip() and (all_sentences or count_dichrona_in_open_syllables(match.group()) > 0)]
+        sentence_list = [match.group() for match in sentence_matches]
+        sentence_starts = [match.start() for match in sentence_matches] # character offsets of the sentences in the cleaned text, for integrate
         
-        logging.debug(f'Split input into {len(sentence_list)} sentences.')
-        for i, sentence in enumerate(sentence_list):
-            logging.debug(f"{i}: {sentence}")
+        logging.debug('Split input into %d sentences.', len(sentence_list))
+        if trace_enabled(): # see logs.py
+            for i, sentence in enumerate(sentence_list):
+                logging.debug(f"{i}: {sentence}")
 
         # -- odyCy tokenization and docbin saving --
 
-        hash_value = xxhash.xxh3_64_hexdigest(before_odycy)
-        if debug:
-            logging.debug(f"Hash value: {hash_value}")
-        
-        project_root = Path(__file__).resolve().parents[2] # NOTE to self: pathlib for writing outside the src directory, importlib for reading inside (e.g. checking a pickled db)
-        odycy_docs_dir = project_root / "odycy_docs"
-        odycy_docs_dir.mkdir(parents=True, exist_ok=True)
+        self.tagging_stats = {"sentences": 0, "tokens": 0, "seconds": 0.0}
+
+        def tag(sentences): # only called if something actually needs tagging, so that cached texts never load odyCy
+            nonlocal nlp
+            if nlp is None: # the Macronizer normally hands us its own long-lived pipeline (load_nlp); loading here is only for standalone use
+                if load_nlp is not None:
+                    nlp = load_nlp()
+                else:
+                    import grc_odycy_joint_trf
+                    nlp = grc_odycy_joint_trf.load()
+            docs, tokens, seconds = tag_sentences(nlp, sentences, batch_size=batch_size, sort_by_length=sort_by_length, max_sentence_tokens=max_sentence_tokens, window_overlap=window_overlap)
+            self.tagging_stats["sentences"] += len(sentences)
+            self.tagging_stats["tokens"] += tokens
+            self.tagging_stats["seconds"] += seconds
+            return docs
 
-        # Handle empty sentence_list case
-        if not sentence_list:
-            filename = f"empty-text-{hash_value}.spacy"
-        elif len(sentence_list[0].split()) > 1:
-            filename = f"{'-'.join(sentence_list[0].split()[i] for i in (0, 1))}-{hash_value}.spacy"
+        if custom_doc != "":
+            docs = [as_tagged(doc) for doc in DocBin().from_disk(custom_doc).get_docs(Vocab())] # a DocBin carries its own strings, so a blank vocab reads it
+        elif doc_cache is not None:
+            docs = self.docs_from_cache(sentence_list, tag, doc_cache, doc_from_file)
         else:
-            filename = f"{sentence_list[0].split()[0]}-{hash_value}.spacy"
+            docs = self.docs_from_file(sentence_list, before_odycy, tag, doc_from_file, debug, tagger_variant + ("/all_sentences" if all_sentences else ""), docs_dir)
+        self.extract_tokens(docs, sentence_list, sentence_starts, before_odycy, diagnostic_words, genre, debug)
 
-        output_file_name = odycy_docs_dir / filename
+    def extract_tokens(self, docs, sentence_list, sentence_starts, before_odycy, diagnostic_words, genre='prose', debug=False):
+        '''
+        Filters the tokens of the docs into the master list of words to be macronized, token_lemma_pos_morph, and fills in the other attributes.
+        Shared by the odyCy path (__init__) and pre-annotated input (from_annotations), so that both macronize exactly the same kind of tokens.
+        '''
+        trace = trace_enabled() # see logs.py
 
-        docs = []
-        if custom_doc != "":
-            doc_bin = DocBin().from_disk(custom_doc)
-            nlp = grc_odycy_joint_trf.load()
-            docs = list(doc_bin.get_docs(nlp.vocab))
-        elif doc_from_file and output_file_name.exists():  # pathlib-style check
-            doc_bin = DocBin().from_disk(output_file_name)
-            nlp = grc_odycy_joint_trf.load()
-            docs = list(doc_bin.get_docs(nlp.vocab))
-        else:
-            nlp = grc_odycy_joint_trf.load()
-            if sentence_list:  # Only process if we have sentences
-                docs = list(tqdm(nlp.pipe(sentence_list), total=len(sentence_list), leave=False, desc="odyCy pipeline"))
-                doc_bin = DocBin()
-                for doc in docs:
-                    doc_bin.add(doc)
-                logging.info(f"Saving odyCy doc bin to disc as {output_file_name}")
-                doc_bin.to_disk(output_file_name)
-            else:
-                docs = []  # Empty docs list for empty input
-        
         #
         # -- Preparing the master list of words to be macronized (and handling ἄν) -- (NOTE often THE key step in analyzing nonplussing bugs)
         #
 
-        an_list = []
+        # Docs loaded from a custom or stale file need not line up with our sentences; then integrate falls back to searching for each word
+        docs_match_sentences = len(docs) == len(sentence_list) and all(doc.text == sentence for doc, sentence in zip(docs, sentence_list))
+        if not docs_match_sentences:
+            logging.info("The odyCy docs do not match the sentences of the text; integration will search for each word instead of using offsets")
+
+        an_list = deque()
         fail_counter = 0
         buggy_words_in_input = 0
         token_lemma_pos_morph = []
-        for doc in tqdm(docs, desc="Extracting words to macronize from the odyCy docs", leave=False): # don't worry, pipe() returns docs in the right order
-            for token in doc:
-                logging.debug(f"Considering token: {token.text}\tLemma: {token.lemma_}\tPOS: {token.pos_}\tMorph: {token.morph}")
+        token_offsets = [] # parallel to token_lemma_pos_morph: (start, end) of the token in before_odycy, or None
+        token_positions = [] # parallel to token_lemma_pos_morph: (index of the doc, index of the token in the doc)
+        for doc_index, doc in enumerate(tqdm(docs, desc="Extracting words to macronize from the odyCy docs", leave=False)): # don't worry, pipe() returns docs in the right order
+            doc_an_context = None
+            for token_index, token in enumerate(doc):
+                if trace:
+                    logging.debug(f"Considering token: {token.text}\tLemma: {token.lemma_}\tPOS: {token.pos_}\tMorph: {token.morph}")
                 if token.text == 'ἂν' or token.text == 'ἄν':
                     an = token.text
-                    subjunctive_verb = False
-                    no_ei = True
-                    logging.debug(f"\t\tPROCESSING ἂν/ἄν: {token.text}")
-                    for inner_token in doc:
-                        if 'Sub' in inner_token.morph.get('Mood'):
-                            subjunctive_verb = True
-                        if inner_token.text == 'εἰ' or inner_token.text == 'εἴ':
-                            no_ei = False
-                            logging.debug(f"\t\tEi found: {inner_token.text}")
+                    if trace:
+                        logging.debug(f"\t\tPROCESSING ἂν/ἄν: {token.text}")
+                    if doc_an_context is None:
+                        doc_an_context = an_context(doc)
+                    subjunctive_verb, no_ei = doc_an_context
                     if subjunctive_verb and no_ei:
                         an_list.append(an[0] + '_' + an[1])
-                        logging.debug(f"\t\tLong ἂν macronized")
+                        if trace:
+                            logging.debug(f"\t\tLong ἂν macronized")
                     else: 
                         an_list.append(an[0] + '^' + an[1])
-                        logging.debug(f"\t\tShort ἂν macronized")
+                        if trace:
+                            logging.debug(f"\t\tShort ἂν macronized")
 
                 if token.text and token.pos_: # NOTE: .morph is empty for some tokens, such as prepositions like ἀπό, whence it is imperative not to filter out empty morphs. Some words have empty lemma too.
                     orth = token.text.replace('\u0387', '').replace('\u037e', '') # remove ano teleia and Greek question mark
-                    logging.debug(f"\t'Token text: {orth}")
+                    if trace:
+                        logging.debug(f"\t'Token text: {orth}")
                     
                     # MAJOR FILTER FOR TOKENS NOT TO MACRONIZE
 
                     # 1 Numerals
                     if is_greek_numeral(orth):
-                        logging.debug(f"\033Word '{orth}' is a Greek numeral. Skipping with 'continue'.")
+                        if trace:
+                            logging.debug(f"\033Word '{orth}' is a Greek numeral. Skipping with 'continue'.")
                         continue
 
                     # 2 Stop words
                     if orth in stop_list:
-                        logging.info(f"\033General stop word '{orth}' found. Skipping with 'continue'.")
+                        if trace:
+                            logging.debug(f"\033General stop word '{orth}' found. Skipping with 'continue'.")
                         continue
                     if genre == 'epic' and orth in epic_stop_words:
-                        logging.info(f"\033Epic stop word '{orth}' found. Skipping with 'continue'.")
+                        if trace:
+                            logging.debug(f"\033Epic stop word '{orth}' found. Skipping with 'continue'.")
                         continue
                     
                     # 3 Formatting/OCR errors
-                    if 'ς' in list(orth[:-1]):
-                        logging.debug(f"\033Word '{orth}' contains a final sigma mid-word. Skipping with 'continue'.")
+                    if 'ς' in orth[:-1]:
+                        if trace:
+                            logging.debug(f"\033Word '{orth}' contains a final sigma mid-word. Skipping with 'continue'.")
                         buggy_words_in_input += 1
                         continue
                     if sum(char in GRAVES for char in orth) > 1 or (any(char in GRAVES for char in orth) and any(char in ACUTES for char in orth)) or sum(char in ACCENTS for char in orth) > 2 or sum(char in ROUGHS for char in orth) > 2:
-                        logging.debug(f"Pathological word '{orth}' contains more than one grave accent or both acute and grave or more than two accents or more than one spiritus. Skipping with 'continue'.")
+                        if trace:
+                            logging.debug(f"Pathological word '{orth}' contains more than one grave accent or both acute and grave or more than two accents or more than one spiritus. Skipping with 'continue'.")
                         buggy_words_in_input += 1
                         continue
-                    if orth not in diagnostic_word_list and orth != 'ἂν' and orth != 'ἄν':
+                    if orth not in diagnostic_words and orth != 'ἂν' and orth != 'ἄν':
                         fail_counter += 1
-                        logging.debug(f"\033Word '{orth}' not in diagnostic word list. odyCy messed up here. Skipping with 'continue'.")
+                        if trace:
+                            logging.debug(f"\033Word '{orth}' not in diagnostic word list. odyCy messed up here. Skipping with 'continue'.")
                         continue
 
                     # For speed, let's not bother even sending words without dichrona to the macronizer
                     if count_dichrona_in_open_syllables(orth) == 0 and orth not in ['ἂν_', 'ἂν^', 'ἄν_', 'ἄν^']:
-                        logging.debug(f"\033Word '{orth}' has no dichrona. Skipping with 'continue'.")
+                        if trace:
+                            logging.debug(f"\033Word '{orth}' has no dichrona. Skipping with 'continue'.")
                         continue
                     if token.text == 'ἂν' or token.text == 'ἄν':
-                        macronized_an = an_list.pop(0)
+                        macronized_an = an_list.popleft()
                         token_lemma_pos_morph.append([macronized_an, token.lemma_, token.pos_, token.morph])
-                        logging.debug(f"\033Popping an {macronized_an}! {len(an_list)} left to pop")
+                        if trace:
+                            logging.debug(f"\033Popping an {macronized_an}! {len(an_list)} left to pop")
                     else:
                         token_lemma_pos_morph.append([orth, token.lemma_, token.pos_, token.morph])
-                    logging.debug(f"\tAppended: \tToken: {token.text}\tLemma: {token.lemma_}\tPOS: {token.pos_}\tMorph: {token.morph}")
 
-        assert an_list == [], f"An list is not empty: {an_list}. This means that the ἂν macronization step failed. Please check the code."
-        logging.debug(f'Len of token_lemma_pos_morph: {len(token_lemma_pos_morph)}')
+                    offset = None
+                    if docs_match_sentences:
+                        start = sentence_starts[doc_index] + token.idx
+                        if before_odycy[start:start + len(orth)] == orth:
+                            offset = (start, start + len(orth))
+                    token_offsets.append(offset)
+                    token_positions.append((doc_index, token_index))
+                    if trace:
+                        logging.debug(f"\tAppended: \tToken: {token.text}\tLemma: {token.lemma_}\tPOS: {token.pos_}\tMorph: {token.morph}")
+
+        assert not an_list, f"An list is not empty: {list(an_list)}. This means that the ἂν macronization step failed. Please check the code."
+        if trace:
+            logging.debug(f'Len of token_lemma_pos_morph: {len(token_lemma_pos_morph)}')
         if len(token_lemma_pos_morph) == 1:
-            logging.debug(f'Only element of token_lemma_pos_morph: {token_lemma_pos_morph[0]}')
+            if trace:
+                logging.debug(f'Only element of token_lemma_pos_morph: {token_lemma_pos_morph[0]}')
         if len(token_lemma_pos_morph) > 1:
-            logging.debug(f'First elements of token_lemma_pos_morph: {token_lemma_pos_morph[0]}, {token_lemma_pos_morph[1]}...')
+            if trace:
+                logging.debug(f'First elements of token_lemma_pos_morph: {token_lemma_pos_morph[0]}, {token_lemma_pos_morph[1]}...')
         logging.info(f'odyCy fail count: {fail_counter}')
 
         self.text = before_odycy # important: this is the cleaned text, without [, ], etc. If we try to integrate into the original text, we will get a lot of silent bugs or errors.
         self.genre = genre
         self.docs = docs
         self.token_lemma_pos_morph = token_lemma_pos_morph
+        self.token_offsets = token_offsets
+        self.token_positions = token_positions
         self.macronized_words = [] # populated by class_macronizer
         self.macronized_text = ''
         self.debug = debug
 
-    def integrate(self):
+    @classmethod
+    def from_annotations(cls, sentences, genre='prose', debug=False, lowercase=False):
+        '''
+        A Text from sentences of AnnotatedTokens (see annotated.py) instead of raw text: the forms are cleaned as a text would be,
+        joined into one sentence per line (respecting SpaceAfter=No), and their annotation is used as is. odyCy is never loaded.
+        '''
+        self = cls.__new__(cls)
+        self.tagging_stats = {"sentences": 0, "tokens": 0, "seconds": 0.0}
+
+        sentence_list = []
+        docs = []
+        for sentence in sentences:
+            sentence_text = ''
+            tokens = []
+            for token in sentence:
+                form = clean_text(token.form, lowercase).strip()
+                if not form:
+                    continue
+                tokens.append(TaggedToken(form, len(sentence_text), token.lemma, token.upos, token.feats))
+                sentence_text += form + ' ' if token.space_after else form
+            sentence_text = sentence_text.rstrip(' ')
+            if tokens:
+                sentence_list.append(sentence_text)
+                docs.append(TaggedDoc.from_tokens(sentence_text, tokens))
+
+        before_odycy = '\n'.join(sentence_list)
+        sentence_starts = []
+        position = 0
+        for sentence_text in sentence_list:
+            sentence_starts.append(position)
+            position += len(sentence_text) + 1
+
+        logging.debug(f'Read {len(sentence_list)} pre-annotated sentences.')
+        diagnostic_words = set(word_list(before_odycy))
+        self.extract_tokens(docs, sentence_list, sentence_starts, before_odycy, diagnostic_words, genre, debug)
+        return self
+
+    @staticmethod
+    def docs_from_file(sentence_list, before_odycy, tag, doc_from_file, debug=False, tagger_variant="", docs_dir=None):
+        '''
+        One file of TaggedDocs (see tagged.py) per whole input, keyed by the hash of the cleaned text
+        (and of the pipeline components, if not the default), in docs_dir, by default odycy_docs/ in the user cache dir (see doc_cache.default_cache_dir).
+        DocBins saved there by earlier versions (.spacy) are still read.
+        '''
+        hash_value = xxhash.xxh3_64_hexdigest(before_odycy + tagger_variant)
+        if debug:
+            logging.debug(f"Hash value: {hash_value}")
+        
+        odycy_docs_dir = Path(docs_dir).expanduser() if docs_dir else default_cache_dir() / "odycy_docs"
+        odycy_docs_dir.mkdir(parents=True, exist_ok=True)
+
+        # Handle empty sentence_list case
+        if not sentence_list:
+            stem = f"empty-text-{hash_value}"
+        elif len(sentence_list[0].split()) > 1:
+            stem = f"{'-'.join(sentence_list[0].split()[i] for i in (0, 1))}-{hash_value}"
+        else:
+            stem = f"{sentence_list[0].split()[0]}-{hash_value}"
+
+        output_file_name = odycy_docs_dir / f"{stem}.tagged"
+        legacy_file_name = odycy_docs_dir / f"{stem}.spacy"
+
+        docs = []
+        if doc_from_file and output_file_name.exists():  # pathlib-style check
+            docs = unpack_docs(output_file_name.read_bytes())
+        elif doc_from_file and legacy_file_name.exists():
+            docs = [as_tagged(doc) for doc in DocBin().from_disk(legacy_file_name).get_docs(Vocab())]
+        else:
+            if sentence_list:  # Only process if we have sentences
+                docs = tag(sentence_list)
+                logging.info(f"Saving odyCy docs to disc as {output_file_name}")
+                output_file_name.write_bytes(pack_docs(docs))
+            else:
+                docs = []  # Empty docs list for empty input
+
+        return docs
+
+    @staticmethod
+    def docs_from_cache(sentence_list, tag, doc_cache, doc_from_file=True):
+        '''
+        Docs from the sentence-level DocCache, tagging only the sentences it does not have yet.
+        With doc_from_file=False every sentence is tagged again (and the cache refreshed).
+        '''
+        docs = doc_cache.get_many(sentence_list) if doc_from_file else [None] * len(sentence_list)
+        missing = [i for i, doc in enumerate(docs) if doc is None]
+        if missing:
+            missing_sentences = [sentence_list[i] for i in missing]
+            tagged = tag(missing_sentences)
+            for i, doc in zip(missing, tagged):
+                docs[i] = doc
+            doc_cache.put_many(missing_sentences, tagged)
+        logging.info(f"Doc cache: {len(sentence_list) - len(missing)} of {len(sentence_list)} sentences cached. {doc_cache}")
+        return docs
+
+    def replacements_by_offset(self):
         """
-        Integrates the macronized words back into the original text.
+        Triples (start position, end position, macronized word) from the tokens' character offsets in the cleaned text.
+        """
+        trace = trace_enabled() # see logs.py
+
+        replacements = []
+        for macronized_word, (start_pos, end_pos) in zip(self.macronized_words, self.token_offsets):
+            if macronized_word is None or not any(macron in macronized_word for macron in ['_', '^']):
+                continue
+            if normalize_word(macronized_word.replace('_', '').replace('^', '')) != self.text[start_pos:end_pos]:
+                if trace:
+                    logging.debug(f"Macronized word {macronized_word} does not match the text at {start_pos}:{end_pos} ({self.text[start_pos:end_pos]}). Skipping.")
+                continue
+            replacements.append((start_pos, end_pos, macronized_word))
+
+        return sorted(replacements, key=lambda x: x[0])
+
+    def replacements_by_search(self):
+        """
+        Triples (start position, end position, macronized word), found by searching the text for the n:th occurrence of each word.
         """
-        result_text = self.text # making a working copy
+        trace = trace_enabled() # see logs.py
+
         macronized_words = [word for word in self.macronized_words if word is not None and any(macron in word for macron in ['_', '^'])]
         
         word_counts = {}
@@ -256,7 +522,8 @@ class Text:
             matches = [m for m in matches if (m.group() != "ἂν" or m.group() != "ἄν" or m.group() != "ἀν")] # remove ἂν and ἄν from the list of matches, since they are already macronized
 
             if current_count >= len(matches):
-                logging.debug(f"Current count: {current_count}, Matches: {matches}")
+                if trace:
+                    logging.debug(f"Current count: {current_count}, Matches: {matches}")
                 print(f"Could not find occurrence {current_count + 1} of word '{normalized_word}'")
                 continue
                 #raise ValueError(f"Could not find occurrence {current_count + 1} of word '{normalized_word}'")
@@ -271,12 +538,35 @@ class Text:
             
             word_counts[normalized_word] = current_count + 1
         
-        # NOTE USEFUL NLP TRICK: Reversing the replacements list. This is because when a ^ or _ is added to a word, the positions of all subsequent words change, but those of all previous words remain the same.
-        replacements.sort(reverse=True, key=lambda x: x[0]) # the lambda means sorting by start_pos *only*: ties are left in their original order. I don't think this is necessary, because there shouldn't be two words with the identical start_pos.
-        
+        replacements.sort(key=lambda x: x[0]) # the lambda means sorting by start_pos *only*: ties are left in their original order. I don't think this is necessary, because there shouldn't be two words with the identical start_pos.
+
+        return replacements
+
+    def integrate(self):
+        """
+        Integrates the macronized words back into the original text.
+
+        If we know where odyCy found every token in the cleaned text (self.token_offsets), this is a single linear pass.
+        Otherwise (e.g. with a custom doc) we search the text for each word, see replacements_by_search.
+        """
+        if self.token_offsets and len(self.token_offsets) == len(self.macronized_words) and all(offset is not None for offset in self.token_offsets):
+            replacements = self.replacements_by_offset()
+        else:
+            replacements = self.replacements_by_search()
+
+        # The replacements are sorted by start position and never overlap, so the output can be built from pieces in one pass
+        pieces = []
+        cursor = 0
         for start_pos, end_pos, replacement in tqdm(replacements, desc="Applying replacements", leave=False):
-            result_text = result_text[:start_pos] + replacement + result_text[end_pos:] # remember, slicing (:) means "from and including" the start index and "up to but not including" the end index, so this line only works because .end() is exclusive, as noted above!
-        
+            if start_pos < cursor:
+                logging.debug(f"Skipping overlapping replacement {replacement} at {start_pos}")
+                continue
+            pieces.append(self.text[cursor:start_pos]) # remember, slicing (:) means "from and including" the start index and "up to but not including" the end index, so this only works because .end() is exclusive
+            pieces.append(replacement)
+            cursor = end_pos
+        pieces.append(self.text[cursor:])
+        result_text = ''.join(pieces)
+
         self.macronized_text = result_text
         
         # Verify that only macrons have been changed
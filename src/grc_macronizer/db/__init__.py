@@ -0,0 +1,69 @@
+'''
+Registry of the big databases. Nothing is loaded until it is first accessed.
+
+    >>> from grc_macronizer.db import LazyDB
+    >>> hypotactic = LazyDB("hypotactic")  # nothing loaded yet
+    >>> hypotactic.get("ἀγαθῆς")           # loads the compiled lexicon (or the pickle) now
+    'ἀ^γα^θῆς'
+
+So a Macronizer(no_hypotactic=True) never unpickles hypotactic.pkl, and proper_names is only
+loaded if macronization_ratio(count_proper_names=False) actually needs it.
+
+The names are those of lexicon.SOURCES. Note that the proxies must not be bound to attributes of this
+package named like its submodules (lsj, ionic, ...), since importing the submodule would overwrite them.
+'''
+
+import logging
+from time import perf_counter
+
+_databases = {}
+
+def load(name):
+    '''
+    Returns the database called name, loading it on the first call.
+    '''
+    database = _databases.get(name)
+    if database is None:
+        from ..lexicon import load_lexicon # lexicon.py itself imports this package
+
+        start = perf_counter()
+        database = load_lexicon(name)
+        _databases[name] = database
+        logging.debug(f"Loaded database {name} in {perf_counter() - start:.2f}s")
+    return database
+
+def is_loaded(name):
+    return name in _databases
+
+def loaded():
+    return list(_databases)
+
+class LazyDB:
+    '''
+    Stand-in for a database that loads it on first use. Supports the dict/set operations the modules use.
+    '''
+
+    def __init__(self, name):
+        self.name = name
+
+    @property
+    def db(self):
+        return load(self.name)
+
+    def get(self, key, default=None):
+        return self.db.get(key, default)
+
+    def __getitem__(self, key):
+        return self.db[key]
+
+    def __contains__(self, key):
+        return key in self.db
+
+    def __iter__(self):
+        return iter(self.db)
+
+    def __len__(self):
+        return len(self.db)
+
+    def __repr__(self):
+        return f"LazyDB({self.name!r}, loaded={is_loaded(self.name)})"
@@ -620,6 +620,19 @@ custom_macron_map = {
     "Κύριε": "Κύ_ρι^ε",
 }
 
+def _build_folded_map(macron_map):
+    '''
+    Lowercased and capitalized variants of every key, in key order, with the lowercased variant of a key first.
+    Keeping the first variant seen gives the same answer as scanning the map for the first matching key.
+    '''
+    folded = {}
+    for key, value in macron_map.items():
+        folded.setdefault(lower_grc(key), lower_grc(value))
+        folded.setdefault(upper_grc(key[0]) + key[1:], upper_grc(value[0]) + value[1:])
+    return folded
+
+folded_custom_macron_map = _build_folded_map(custom_macron_map)
+
 def custom_macronizer(word):
     word = word.replace('^', '').replace('_', '')
     word = normalize_word(word)
@@ -627,15 +640,4 @@ def custom_macronizer(word):
     if word in custom_macron_map:
         return custom_macron_map[word]
 
-    for key in custom_macron_map:
-
-        if lower_grc(key) == word:
-            return lower_grc(custom_macron_map[key])
-        
-        capitalized_key = upper_grc(key[0]) + key[1:] 
-        capitalized_value = upper_grc(custom_macron_map[key][0]) + custom_macron_map[key][1:]
-
-        if capitalized_key == word:
-            return capitalized_value
-    
-    return word
\ No newline at end of file
+    return folded_custom_macron_map.get(word, word)
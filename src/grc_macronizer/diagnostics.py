@@ -0,0 +1,161 @@
+'''
+Diagnostics of a Macronizer, accumulated in memory over all its calls.
+
+How often each module helped, which words are still ambiguous after all the modules and which tokens the modules failed on
+are collected per Macronizer, not dumped to new files after every call, and written to one consolidated JSON file,
+which is rewritten in place (atomically) with the running totals whenever it is flushed:
+
+    {
+      "version": 2, "pid": 4242, "started": "2025-06-01T12:00:00", "updated": "2025-06-01T14:31:07",
+      "calls": 18250, "failures": 1,
+      "modules": {"wiktionary": 1033145, "lsj": 209847, ...},
+      "still_ambiguous": [[5812, "ἀ^νθρώπων", "ἄνθρωπος", "NOUN", "Case=Gen|Gender=Masc|Number=Plur"], ...],
+      "errors": [{"token": "...", "lemma": "...", "pos": "...", "morph": "...", "error": "RecursionError", "message": "...", "policy": "skip-token", "sentence": "..."}]
+    }
+
+modules counts the tokens each module made progress on; still_ambiguous counts every (token, lemma, pos, morph)
+that still has ambiguous dichrona, most frequent first; errors is the structured error report (see Macronizer.report_failure).
+
+The mode decides when the file is written:
+
+- "periodic" (the default): at most every `interval` seconds, at the end of a call, and when the process exits or the Diagnostics is collected
+- "manual": only when flush() (or Macronizer.flush_diagnostics) is called
+- "off": nothing is counted or written
+
+See scripts/diagnostics/sum_still_ambiguous.py for summing the files of several runs.
+'''
+
+import atexit
+from collections import Counter
+from datetime import datetime
+import json
+import logging
+import os
+from pathlib import Path
+import time
+import weakref
+
+DIAGNOSTICS_VERSION = 2
+DIAGNOSTICS_MODES = ("periodic", "manual", "off")
+
+_periodic = weakref.WeakSet() # the periodic Diagnostics still alive, flushed by a single exit hook that keeps none of them alive
+
+@atexit.register
+def _flush_all():
+    for diagnostics in list(_periodic):
+        diagnostics.flush()
+
+def default_path():
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return Path("diagnostics") / f"diagnostics_{timestamp}_{os.getpid()}.json" # relative to working directory!
+
+class Diagnostics:
+    def __init__(self, mode="periodic", path=None, interval=300):
+        if mode not in DIAGNOSTICS_MODES:
+            raise ValueError(f"diagnostics must be one of {', '.join(DIAGNOSTICS_MODES)}, not {mode!r}")
+        self.mode = mode
+        self.path = Path(path) if path else None # chosen on the first flush, so that an unused Macronizer leaves no file
+        self.interval = interval
+
+        self.started = datetime.now().isoformat(timespec="seconds")
+        self.calls = 0
+        self.failures = 0
+        self.modules = Counter() # module name => tokens it helped with
+        self.still_ambiguous = Counter() # (token, lemma, pos, morph) => occurrences
+        self.errors = [] # one dict per token the modules failed on
+        self._last_flush = time.monotonic()
+        self._dirty = False
+
+        if mode == "periodic":
+            _periodic.add(self)
+
+    @property
+    def enabled(self):
+        return self.mode != "off"
+
+    def record(self, results_dict, still_ambiguous, failures=None):
+        '''
+        Adds the module events (lists of tokens per "{module}_results"), the still-ambiguous (token, lemma, pos, morph)
+        and the failures (error report entries) of one call, and in periodic mode flushes if the last flush is more than interval seconds ago.
+        '''
+        if not self.enabled:
+            return
+        self.calls += 1
+        self.failures += len(failures or [])
+        self.errors += failures or []
+        for name, result_list in results_dict.items():
+            if result_list:
+                self.modules[name.removesuffix("_results")] += len(result_list)
+        self.still_ambiguous.update((token, lemma, pos, str(morph)) for token, lemma, pos, morph in still_ambiguous)
+        self._dirty = True
+
+        if self.mode == "periodic" and time.monotonic() - self._last_flush >= self.interval:
+            self.flush()
+
+    def pop(self):
+        '''
+        The counts recorded since the last pop, as a plain dict, resetting them. Used to send a worker's counts to the parent (see parallel.py).
+        '''
+        counts = {"calls": self.calls, "failures": self.failures, "modules": dict(self.modules), "still_ambiguous": list(self.still_ambiguous.items()), "errors": self.errors}
+        self.calls = 0
+        self.failures = 0
+        self.modules = Counter()
+        self.still_ambiguous = Counter()
+        self.errors = []
+        self._dirty = False
+        return counts
+
+    def merge(self, counts):
+        '''
+        Adds the counts popped from another Diagnostics.
+        '''
+        if not self.enabled or not counts["calls"]:
+            return
+        self.calls += counts["calls"]
+        self.failures += counts["failures"]
+        self.modules.update(counts["modules"])
+        self.still_ambiguous.update({tuple(key): count for key, count in counts["still_ambiguous"]})
+        self.errors += counts["errors"]
+        self._dirty = True
+
+        if self.mode == "periodic" and time.monotonic() - self._last_flush >= self.interval:
+            self.flush()
+
+    def as_dict(self):
+        return {
+            "version": DIAGNOSTICS_VERSION,
+            "pid": os.getpid(),
+            "started": self.started,
+            "updated": datetime.now().isoformat(timespec="seconds"),
+            "calls": self.calls,
+            "failures": self.failures,
+            "modules": dict(self.modules.most_common()),
+            "still_ambiguous": [[count, *key] for key, count in sorted(self.still_ambiguous.items(), key=lambda item: (-item[1], item[0]))],
+            "errors": self.errors,
+        }
+
+    def flush(self):
+        '''
+        Writes the totals so far to the consolidated file, replacing what an earlier flush wrote. Returns its path, or None if there was nothing new.
+        '''
+        self._last_flush = time.monotonic()
+        if not self.enabled or not self._dirty:
+            return None
+        if self.path is None:
+            self.path = default_path()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.as_dict(), f, ensure_ascii=False, indent=1)
+        tmp_path.replace(self.path)
+        self._dirty = False
+        logging.info(f"Diagnostics of {self.calls} calls written to {self.path}")
+        return self.path
+
+    def __del__(self):
+        if getattr(self, "mode", None) == "periodic" and self._dirty: # collected before the exit hook ran
+            self.flush()
+
+    def __repr__(self):
+        return f"Diagnostics(mode={self.mode!r}, calls={self.calls}, module hits={sum(self.modules.values())}, still ambiguous={sum(self.still_ambiguous.values())})"
@@ -0,0 +1,184 @@
+'''
+Sentence-level, content-addressed cache of odyCy analyses.
+
+Text used to cache the odyCy output as one DocBin per input, so changing a single line or re-chunking a corpus
+(another CHUNK_SIZE, another --start-line) meant tagging everything again. Here every sentence is cached on its own,
+under a hash of its text and of the pipeline that tagged it, so overlapping and re-chunked runs reuse every sentence
+that has ever been tagged.
+
+- SQLite in WAL mode, so any number of worker processes can share one cache dir (cf. token_store.py).
+- A size budget in bytes: when it is exceeded, the least recently used sentences are evicted. The total size is kept as a running
+  count, summed over the table only when the connection is opened and every RECOUNT_PUTS puts (to take in what other processes wrote).
+- hits and misses are counted per DocCache.
+- Sentences are stored as TaggedDocs (see tagged.py), so reading the cache never needs odyCy or its vocab.
+'''
+
+from importlib.metadata import PackageNotFoundError, version
+import logging
+import os
+from pathlib import Path
+import sqlite3
+import time
+
+import xxhash
+
+from .tagged import FORMAT_VERSION, pack_docs, unpack_docs
+
+_pipeline_id = None
+
+RECOUNT_PUTS = 1000
+
+def default_cache_dir():
+    '''
+    The per-user cache directory, $XDG_CACHE_HOME/grc_macronizer (by default ~/.cache/grc_macronizer).
+    '''
+    return Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "grc_macronizer"
+
+def pipeline_id():
+    '''
+    Identifies the tagger and storage format a doc was made with, e.g. 'grc_odycy_joint_trf-0.7.0/tagged-1'.
+    Read from the installed package metadata, so that it never requires loading the pipeline.
+    '''
+    global _pipeline_id
+    if _pipeline_id is None:
+        try:
+            tagger_version = version("grc_odycy_joint_trf")
+        except PackageNotFoundError:
+            tagger_version = "unknown"
+        _pipeline_id = f"grc_odycy_joint_trf-{tagger_version}/tagged-{FORMAT_VERSION}"
+    return _pipeline_id
+
+class DocCache:
+    '''
+    >>> cache = DocCache("~/.cache/grc_macronizer", max_bytes=2 * 1024**3)
+    >>> docs = cache.get_many(sentences)  # None for every sentence not yet cached
+    >>> cache.put_many(sentences, docs)
+    >>> cache
+    DocCache(path='/home/user/.cache/grc_macronizer/odycy_docs.sqlite3', hits=0, misses=2, hit_rate=0.00%)
+    '''
+
+    def __init__(self, cache_dir, max_bytes=2 * 1024**3, timeout=60, variant=""):
+        self.path = Path(cache_dir).expanduser() / "odycy_docs.sqlite3"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.variant = variant # e.g. the disabled pipeline components, which change what the docs contain
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+
+        self._conn = None
+        self._pid = None
+        self._total = None # bytes in the table, as far as this process knows
+        self._puts = 0
+
+    def _connection(self):
+        if self._conn is None or self._pid != os.getpid(): # never reuse a connection inherited through fork
+            self._conn = sqlite3.connect(self.path, timeout=self.timeout)
+            self._pid = os.getpid()
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS docs ("
+                "key TEXT PRIMARY KEY, data BLOB NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS docs_last_used ON docs (last_used)")
+            self._total = None
+        return self._conn
+
+    @staticmethod
+    def key(sentence, pipeline):
+        return xxhash.xxh3_128_hexdigest(f"{pipeline}\x00{sentence}")
+
+    def get_many(self, sentences):
+        '''
+        Cached TaggedDocs for the sentences, in order, with None for the sentences not in the cache.
+        '''
+        pipeline = pipeline_id() + self.variant
+        conn = self._connection()
+        docs = []
+        found = []
+        for sentence in sentences:
+            key = self.key(sentence, pipeline)
+            row = conn.execute("SELECT data FROM docs WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                docs.append(None)
+                continue
+            doc = unpack_docs(row[0])[0]
+            if doc.text != sentence: # hash collision, or a doc that was written by something else
+                self.misses += 1
+                docs.append(None)
+                continue
+            self.hits += 1
+            docs.append(doc)
+            found.append(key)
+
+        if found:
+            now = time.time()
+            with conn:
+                conn.executemany("UPDATE docs SET last_used = ? WHERE key = ?", [(now, key) for key in found])
+        return docs
+
+    def put_many(self, sentences, docs):
+        '''
+        Store TaggedDocs (or spaCy Docs) for the sentences.
+        '''
+        pipeline = pipeline_id() + self.variant
+        now = time.time()
+        rows = []
+        for sentence, doc in zip(sentences, docs):
+            data = pack_docs([doc])
+            rows.append((self.key(sentence, pipeline), data, len(data), now))
+        if not rows:
+            return
+        conn = self._connection()
+        with conn:
+            replaced = 0
+            for key, _, _, _ in rows:
+                row = conn.execute("SELECT size FROM docs WHERE key = ?", (key,)).fetchone()
+                replaced += row[0] if row else 0
+            conn.executemany("INSERT OR REPLACE INTO docs VALUES (?, ?, ?, ?)", rows)
+        if self._total is not None:
+            self._total += sum(size for _, _, size, _ in rows) - replaced
+        self._puts += 1
+        self.evict()
+
+    def evict(self):
+        '''
+        Delete the least recently used sentences until the cache fits in max_bytes.
+        '''
+        if self.max_bytes is None:
+            return
+        conn = self._connection()
+        if self._total is None or self._puts % RECOUNT_PUTS == 0:
+            self._total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM docs").fetchone()[0]
+        total = self._total
+        if total <= self.max_bytes:
+            return
+
+        to_delete = []
+        for key, size in conn.execute("SELECT key, size FROM docs ORDER BY last_used"):
+            if total <= self.max_bytes:
+                break
+            to_delete.append((key,))
+            total -= size
+        with conn:
+            conn.executemany("DELETE FROM docs WHERE key = ?", to_delete)
+        self._total = total
+        logging.info(f"Doc cache: evicted {len(to_delete)} sentences from {self.path}")
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def close(self):
+        if self._conn is not None and self._pid == os.getpid():
+            self._conn.close()
+        self._conn = None
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def __repr__(self):
+        return f"DocCache(path={str(self.path)!r}, hits={self.hits}, misses={self.misses}, hit_rate={self.hit_rate:.2%})"
@@ -2,6 +2,7 @@
 Tread carefully. This is a minefield of Unicode normalization and combining characters.
 '''
 
+from functools import lru_cache
 import logging
 import unicodedata
 
@@ -157,6 +158,67 @@ def macron_integrate_markup(word, macrons):
     return normalize_word(result)
 
 
+###########################
+# Array-backed markup     #
+###########################
+
+# A macronized word is its base string (no ^ or _) plus one byte per base character: 0 for no markup, 1 for ^ and 2 for _,
+# and merging is elementwise. macronization_modules carries words in this form from module to module (as WordAnalyses,
+# see word_analysis.py), so a module's ^/_ string is parsed once and the result is rendered once, by macronize_token;
+# merge_or_overwrite_markup is the same merge for callers that have strings.
+
+NO_MARK = 0
+SHORT_MARK = 1
+LONG_MARK = 2
+
+MARKUP_CHARS = ('', '^', '_')
+MARK_OF = {'^': SHORT_MARK, '_': LONG_MARK}
+
+@lru_cache(maxsize=2**16)
+def split_markup(word):
+    '''
+    >>> split_markup('νεα_νί^α_ς')
+    ('νεανίας', b'\\x00\\x00\\x02\\x00\\x01\\x02\\x00')
+
+    Markup belongs to the preceding character.
+    '''
+    if '^' not in word and '_' not in word:
+        return word, bytes(len(word))
+
+    base = []
+    marks = bytearray()
+    leading_mark = NO_MARK
+    for char in word:
+        mark = MARK_OF.get(char)
+        if mark is None:
+            base.append(char)
+            marks.append(NO_MARK)
+        elif base:
+            marks[-1] = mark
+        else:
+            leading_mark = mark # markup before the first character has always ended up on the last one
+    if leading_mark and marks and not marks[-1]:
+        marks[-1] = leading_mark
+    return ''.join(base), bytes(marks)
+
+def join_markup(base, marks):
+    '''
+    Inverse of split_markup: renders the ^/_ string.
+    '''
+    if not any(marks):
+        return base
+    return ''.join(char + MARKUP_CHARS[mark] for char, mark in zip(base, marks))
+
+def merge_marks(new_marks, old_marks, precedence='new'):
+    '''
+    Elementwise merge of two mark vectors: the mark of the version with precedence if it has one, else the other's.
+    The result has the length of new_marks.
+    '''
+    old_marks = old_marks[:len(new_marks)].ljust(len(new_marks), b'\x00')
+    if precedence == 'new':
+        return bytes(new or old for new, old in zip(new_marks, old_marks))
+    return bytes(old or new for new, old in zip(new_marks, old_marks))
+
 def merge_or_overwrite_markup(new_version, old_version, precedence='new'):
     '''
     Merges two versions of a string with markup (^ and _), following these rules:
@@ -170,6 +232,8 @@ def merge_or_overwrite_markup(new_version, old_version, precedence='new'):
     
     >>> merge_or_overwrite_markup('st_ring^', 's_t^ring^')
     's_t_ring^'
+
+    The string version of WordAnalysis.merge (see word_analysis.py).
     '''
 
     if not new_version:
@@ -178,59 +242,15 @@ def merge_or_overwrite_markup(new_version, old_version, precedence='new'):
     if not old_version:
         logging.debug('No old version, returning new version')
         return new_version
-    
-    # assert normalize_word(new_version.replace('^', '').replace('_', '')) == normalize_word(old_version.replace('^', '').replace('_', '')), \
-    #     f'Cannot merge markup on different words: {new_version} vs {old_version}'
 
-    if normalize_word(new_version.replace('^', '').replace('_', '')) != normalize_word(old_version.replace('^', '').replace('_', '')):
+    new_base, new_marks = split_markup(new_version)
+    old_base, old_marks = split_markup(old_version)
+
+    if new_base != old_base and normalize_word(new_base) != normalize_word(old_base):
         logging.debug('Words do not match, returning old version to be on the safe side')
         return old_version
 
-    
-    # First, get base string without markup
-    base = ''.join(c for c in new_version if c not in '^_')
-    
-    # Create lists to track markup positions
-    new_markup = [''] * len(base)
-    old_markup = [''] * len(base)
-    
-    # Fill markup positions for new version
-    pos = 0
-    for i, c in enumerate(new_version):
-        if c in '^_':
-            new_markup[pos-1] = c
-        else:
-            pos += 1
-            
-    # Fill markup positions for old version
-    pos = 0
-    for i, c in enumerate(old_version):
-        if c in '^_':
-            old_markup[pos-1] = c
-        else:
-            pos += 1
-    
-    # Merge according to rules
-    result = []
-    pos = 0
-    for i, c in enumerate(base):
-        result.append(c)
-        if precedence == 'new': 
-            # If new has markup, use it
-            if new_markup[i]:
-                result.append(new_markup[i])
-            # If only old has markup, use it
-            elif old_markup[i]:
-                result.append(old_markup[i])
-        else:
-            # If old has markup, use it
-            if old_markup[i]:
-                result.append(old_markup[i])
-            # If only new has markup, use it
-            elif new_markup[i]:
-                result.append(new_markup[i])
-            
-    return ''.join(result)
+    return join_markup(new_base, merge_marks(new_marks, old_marks, precedence))
 
 if __name__ == '__main__':
 
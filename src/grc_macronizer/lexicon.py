@@ -0,0 +1,260 @@
+'''
+Compact, memory-mappable lexicon format for the big databases.
+
+The Python dict modules in grc_macronizer.db (lsj.py, proper_names.py, wiktionary_ambiguous.py, ionic.py, ...)
+and the pickles (lsj_keys.pkl, hypotactic.pkl) are slow to import and every worker process holds its own copy.
+The build step below compiles each of them into a single .lex file:
+
+    header      magic b"GRCLEX", format version (u16), flags (u16), entry count (u32), reserved (u32)
+    key index   count + 1 little-endian u32 offsets into the key blob
+    value index count + 1 little-endian u32 offsets into the value blob (only if the lexicon has values)
+    key blob    UTF-8 keys, sorted bytewise
+    value blob  UTF-8 values (JSON-encoded if the source values are not strings)
+
+Lookups are a binary search over the key index, i.e. O(log n), directly on the mmap.
+A lexicon is only opened on its first lookup, and since the mmap is read-only the OS shares its pages between processes.
+
+Build with:
+    python -m grc_macronizer.lexicon build
+'''
+
+import argparse
+from importlib import import_module
+from importlib.resources import files
+import json
+import logging
+import mmap
+from pathlib import Path
+import pickle
+import struct
+
+from grc_utils import only_bases
+
+MAGIC = b"GRCLEX"
+FORMAT_VERSION = 1
+
+HAS_VALUES = 1
+JSON_VALUES = 2
+
+HEADER = struct.Struct("<6sHHII")
+OFFSET = struct.Struct("<I")
+
+COMPILED_DIR = files("grc_macronizer.db").joinpath("compiled")
+
+###########################
+# Sources of the lexicons #
+###########################
+
+def _from_module(module, attribute):
+    return lambda: getattr(import_module(f"grc_macronizer.db.{module}"), attribute)
+
+def _from_pickle(filename):
+    def load():
+        with files("grc_macronizer.db").joinpath(filename).open("rb") as f:
+            return pickle.load(f)
+    return load
+
+def _lsj_keys():
+    return {only_bases(key) for key in _from_pickle("lsj_keys.pkl")()} # the only form in which the keys are ever looked up
+
+SOURCES = {
+    "lsj": _from_module("lsj", "lsj"),
+    "lsj_keys": _lsj_keys,
+    "proper_names": _from_module("proper_names", "proper_names"),
+    "wiktionary_ambiguous": _from_module("wiktionary_ambiguous", "wiktionary_ambiguous_map"),
+    "wiktionary_singletons": _from_module("wiktionary_singletons", "wiktionary_singletons_map"),
+    "ionic": _from_module("ionic", "ionic"),
+    "hypotactic": _from_pickle("hypotactic.pkl"),
+}
+
+SOURCE_FILES = {
+    "lsj": "lsj.py",
+    "lsj_keys": "lsj_keys.pkl",
+    "proper_names": "proper_names.py",
+    "wiktionary_ambiguous": "wiktionary_ambiguous.py",
+    "wiktionary_singletons": "wiktionary_singletons.py",
+    "ionic": "ionic.py",
+    "hypotactic": "hypotactic.pkl",
+}
+
+#############
+# Reading   #
+#############
+
+class Lexicon:
+    '''
+    Read-only, dict- or set-like view of a compiled .lex file.
+
+    >>> lsj = Lexicon("db/compiled/lsj.lex")
+    >>> lsj.get("ἐρυγμός")
+    'ἐρυ^γμός'
+    >>> "ἐρυγμός" in lsj
+    True
+    '''
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._mm = None
+
+    def _open(self):
+        with open(self.path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, flags, count, _ = HEADER.unpack_from(mm, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            mm.close()
+            raise ValueError(f"{self.path} is not a version {FORMAT_VERSION} lexicon; rebuild with `python -m grc_macronizer.lexicon build`")
+
+        self._flags = flags
+        self._count = count
+        self._key_index = HEADER.size
+        position = self._key_index + (count + 1) * OFFSET.size
+        if flags & HAS_VALUES:
+            self._value_index = position
+            position += (count + 1) * OFFSET.size
+        self._key_blob = position
+        self._value_blob = position + OFFSET.unpack_from(mm, self._key_index + count * OFFSET.size)[0]
+        self._mm = mm
+
+    @property
+    def mm(self):
+        if self._mm is None:
+            self._open()
+        return self._mm
+
+    def _key_bytes(self, mm, i):
+        start, end = struct.unpack_from("<II", mm, self._key_index + i * OFFSET.size)
+        return mm[self._key_blob + start:self._key_blob + end]
+
+    def _value(self, i):
+        start, end = struct.unpack_from("<II", self._mm, self._value_index + i * OFFSET.size)
+        value = self._mm[self._value_blob + start:self._value_blob + end].decode("utf-8")
+        return json.loads(value) if self._flags & JSON_VALUES else value
+
+    def _find(self, key):
+        target = key.encode("utf-8")
+        mm = self.mm
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key_bytes(mm, middle) < target:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self._count and self._key_bytes(mm, low) == target:
+            return low
+        return -1
+
+    def get(self, key, default=None):
+        i = self._find(key)
+        if i < 0:
+            return default
+        return self._value(i) if self._flags & HAS_VALUES else key
+
+    def __getitem__(self, key):
+        i = self._find(key)
+        if i < 0:
+            raise KeyError(key)
+        return self._value(i) if self._flags & HAS_VALUES else key
+
+    def __contains__(self, key):
+        return isinstance(key, str) and self._find(key) >= 0
+
+    def __iter__(self):
+        mm = self.mm
+        for i in range(self._count):
+            yield self._key_bytes(mm, i).decode("utf-8")
+
+    def __len__(self):
+        self.mm
+        return self._count
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+
+    def __repr__(self):
+        return f"Lexicon({str(self.path)!r})"
+
+def compiled_path(name, directory=None):
+    return Path(directory or COMPILED_DIR) / f"{name}.lex"
+
+def load_lexicon(name, directory=None):
+    '''
+    Returns the compiled Lexicon for name if it has been built, and the original Python object otherwise.
+    A compiled lexicon older than its source file is considered stale and ignored.
+    '''
+    path = compiled_path(name, directory)
+    if path.exists():
+        source_path = Path(str(files("grc_macronizer.db").joinpath(SOURCE_FILES[name])))
+        if source_path.exists() and source_path.stat().st_mtime > path.stat().st_mtime:
+            logging.warning(f"Compiled lexicon {path} is older than {source_path}; loading {name} from source. Rebuild with `python -m grc_macronizer.lexicon build`")
+        else:
+            return Lexicon(path)
+    logging.debug(f"No compiled lexicon at {path}; loading {name} from source")
+    return SOURCES[name]()
+
+#############
+# Writing   #
+#############
+
+def build_lexicon(source, path):
+    '''
+    Compiles a dict (str => str or JSON-serializable) or a set of str into a .lex file at path.
+    '''
+    has_values = isinstance(source, dict)
+    keys = sorted((key.encode("utf-8") for key in source), key=bytes)
+    json_values = has_values and not all(isinstance(value, str) for value in source.values())
+
+    flags = (HAS_VALUES if has_values else 0) | (JSON_VALUES if json_values else 0)
+
+    key_offsets = [0]
+    for key in keys:
+        key_offsets.append(key_offsets[-1] + len(key))
+
+    values = []
+    value_offsets = [0]
+    if has_values:
+        for key in keys:
+            value = source[key.decode("utf-8")]
+            value = json.dumps(value, ensure_ascii=False) if json_values else value
+            values.append(value.encode("utf-8"))
+            value_offsets.append(value_offsets[-1] + len(values[-1]))
+
+    if max(key_offsets[-1], value_offsets[-1]) >= 2**32:
+        raise ValueError(f"Lexicon too large for format version {FORMAT_VERSION}")
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".lex.tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, flags, len(keys), 0))
+        f.write(struct.pack(f"<{len(key_offsets)}I", *key_offsets))
+        if has_values:
+            f.write(struct.pack(f"<{len(value_offsets)}I", *value_offsets))
+        f.write(b"".join(keys))
+        f.write(b"".join(values))
+    tmp_path.replace(path) # never leave a half-written lexicon for a running process to mmap
+
+    return path
+
+def build_all(names=None, directory=None):
+    for name in names or SOURCES:
+        try:
+            source = SOURCES[name]()
+        except ImportError as e:
+            print(f"Skipping {name}: {e}")
+            continue
+        path = build_lexicon(source, compiled_path(name, directory))
+        print(f"Built {path} ({len(source)} entries, {path.stat().st_size / 1e6:.1f} MB)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compile the macronizer databases into memory-mappable lexicons")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build_parser = subparsers.add_parser("build")
+    build_parser.add_argument("names", nargs="*", help=f"Lexicons to build (default: all of {', '.join(SOURCES)})")
+    build_parser.add_argument("--out", default=None, help="Output directory (default: grc_macronizer/db/compiled)")
+    args = parser.parse_args()
+
+    build_all(args.names, args.out)
@@ -0,0 +1,57 @@
+'''
+Logging for the macronizer.
+
+Importing grc_macronizer configures nothing: like any library, it only emits records on the standard logging module,
+and where they go is up to the caller. To get the old behaviour, a DEBUG log in a new timestamped file under diagnostics/logs:
+
+    >>> from grc_macronizer import configure_logging
+    >>> configure_logging()
+
+Or anything else, e.g. only warnings, to stderr:
+
+    >>> configure_logging("WARNING", filename=None, stream=sys.stderr)
+
+The per-token trace of the modules (several messages per token, some with syllable counts in them) is only built
+when DEBUG is enabled on the root logger: every trace message sits behind `if trace:`, with trace = trace_enabled()
+checked once per call, so at INFO and above its f-strings are never formatted and the counts in them never computed.
+'''
+
+from datetime import datetime
+import logging
+from pathlib import Path
+
+from .ascii import ascii_macronizer
+
+FORMAT = "%(asctime)s - %(message)s"
+
+def trace_enabled():
+    '''
+    Whether the per-token debug trace is wanted, i.e. whether the root logger lets DEBUG records through.
+    '''
+    return logging.root.isEnabledFor(logging.DEBUG)
+
+def configure_logging(level=logging.DEBUG, filename="", log_dir="diagnostics/logs", stream=None, fmt=FORMAT):
+    '''
+    Sends the log to a file (by default a new timestamped one in log_dir, relative to the working directory)
+    and/or a stream, replacing any handlers the root logger already has. filename=None means no file.
+    Returns the path of the log file, if any.
+    '''
+    handlers = []
+    path = None
+    if filename is not None:
+        if filename == "":
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            path = Path(log_dir) / f"macronizer_{timestamp}.log"
+        else:
+            path = Path(filename)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        handlers.append(logging.FileHandler(path, encoding="utf-8"))
+    if stream is not None:
+        handlers.append(logging.StreamHandler(stream))
+
+    logging.basicConfig(level=level, format=fmt, handlers=handlers or [logging.NullHandler()], force=True)
+
+    logging.info("Starting new log...")
+    for line in ascii_macronizer:
+        logging.info(line)
+    return path
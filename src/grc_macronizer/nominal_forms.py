@@ -49,7 +49,30 @@ import logging
 
 from grc_utils import only_bases
 
-from .db.ionic import ionic
+from .db import LazyDB
+
+ionic = LazyDB("ionic")
+
+_ionic_stems = None
+
+def ionic_stems():
+    '''
+    Index of the ionic db by stem, i.e. word minus its final letter, mapping to the bases of the final letters found:
+    'κιθάρη' => {'κιθάρ': {'η'}}. Built on first use.
+    '''
+    global _ionic_stems
+    if _ionic_stems is None:
+        _ionic_stems = {}
+        for ionic_word in ionic:
+            if ionic_word:
+                _ionic_stems.setdefault(ionic_word[:-1], set()).add(only_bases(ionic_word[-1]))
+    return _ionic_stems
+
+def has_ionic_counterpart(etacist_word):
+    '''
+    Whether the ionic db has a word with the same stem as etacist_word and the same final letter up to diacritics.
+    '''
+    return etacist_word[-1] in ionic_stems().get(etacist_word[:-1], ())
 
 ### THE 3 ALGORITHMS RE NOMINAL FORMS
 # long_fem_alpha(token, tag, lemma)
@@ -94,7 +117,7 @@ def macronize_nominal_forms(word, lemma, pos, morph, debug=True):
         # -α_ for 1D nouns in nominative/vocative singular feminine
         if only_bases(word)[-1:] == "α" and word == lemma and ('Nom' in morph.get("Case") or 'Voc' in morph.get("Case")) and 'Sing' in morph.get("Number") and 'Fem' in morph.get("Gender"):
             etacist_version = word[:-1] + "η"
-            if any(etacist_version[:-1] == ionic_word[:-1] and etacist_version[-1] == only_bases(ionic_word[-1]) for ionic_word in ionic):
+            if has_ionic_counterpart(etacist_version):
                 if debug:
                     logging.debug(f'\033[1;32m{word}: 1D case 1\033[0m')
                 return word + "_"
@@ -107,7 +130,7 @@ def macronize_nominal_forms(word, lemma, pos, morph, debug=True):
                 etacist_lemma = lemma[:-1] + "η"
                 if debug:
                     logging.debug(f'Etacist lemma: {etacist_lemma}')
-                if any(etacist_lemma[:-1] == ionic_word[:-1] and etacist_lemma[-1] == only_bases(ionic_word[-1]) for ionic_word in ionic):
+                if has_ionic_counterpart(etacist_lemma):
                     if debug:
                         logging.debug(f'\033[1;32m{word}: 1D case 2\033[0m')
                     return word[:-1] + "_" + word[-1]
@@ -0,0 +1,244 @@
+'''
+Process-pool macronization, for Macronizer.macronize_parallel.
+
+The input is cut into modest chunks of lines that go through a work queue, so that fast and slow chunks balance out over the workers,
+and the results are yielded in input order from a sliding window of at most `workers * prefetch` chunks in flight,
+so that memory stays bounded however long the input is.
+
+Every worker builds its own Macronizer from the parent's constructor arguments once, in the pool initializer, and keeps it
+(with its odyCy pipeline, token cache and stores) for all the chunks it is given. Before the pool is started the parent loads
+the databases, so that with the fork start method the workers inherit them copy-on-write instead of loading them again
+(with forkserver, the server process imports grc_macronizer once and forks the workers from there). Fork is only the default on Linux:
+elsewhere the platform's default is kept (spawn on macOS and Windows), since forking a process that has initialised torch or the
+Objective-C runtime is unsafe there.
+Compiled lexicons (see lexicon.py) are memory-mapped, so their pages are shared between the processes in any case.
+Each worker runs torch and the BLAS libraries on a bounded number of threads, so that the workers do not oversubscribe the cores.
+
+macronize_pipelined splits the work of each chunk over two pools instead, since its two expensive stages have opposite profiles:
+tagging (odyCy, matrix math on several threads) and the macronization modules (pure Python, one core each):
+
+    tagging pool  --tokens-->  bounded window  -->  rule pool  --results-->  this process: integration, in order
+
+A tagging worker cleans, splits, tags and filters a chunk and returns the Text without its docs, with the tokens as plain tuples;
+a rule worker runs the modules over those tokens; and the parent integrates the results into the text and yields the lines.
+
+Either way the diagnostics (see diagnostics.py) and the error report of every chunk end up in the parent's as soon as the chunk is done,
+so that a run writes one diagnostics file, not one per worker, and nothing is lost if the consumer stops early.
+'''
+
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+import logging
+import multiprocessing
+import os
+import sys
+
+from .tagged import intern_morph
+from .word_analysis import open_dichrona
+
+_worker_macronizer = None
+
+def default_start_method():
+    '''
+    "fork" on Linux, so that the workers inherit the databases; the platform's default everywhere else.
+    '''
+    if sys.platform.startswith("linux") and "fork" in multiprocessing.get_all_start_methods():
+        return "fork"
+    return multiprocessing.get_start_method()
+
+def limit_threads(threads):
+    '''
+    Caps the threads torch and the BLAS libraries may use in this process.
+
+    The environment variables only reach libraries that are loaded after this call (e.g. in a spawned worker); a forked worker
+    has inherited torch and BLAS already initialised, so their thread pools are resized directly, through torch and threadpoolctl.
+    '''
+    for variable in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[variable] = str(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(threads)
+    except ImportError:
+        pass
+
+def _init_worker(init_kwargs, torch_threads):
+    global _worker_macronizer
+    limit_threads(torch_threads)
+
+    from .class_macronizer import Macronizer
+
+    _worker_macronizer = Macronizer(**init_kwargs).warmup()
+    limit_threads(torch_threads) # again, for the BLAS libraries that only loading odyCy brought in
+    logging.info(f"Worker {os.getpid()} ready with {torch_threads} torch threads")
+
+def _init_rule_worker(init_kwargs):
+    global _worker_macronizer
+    limit_threads(1)
+
+    from .class_macronizer import Macronizer
+
+    _worker_macronizer = Macronizer(**init_kwargs).preload() # never needs odyCy
+    logging.info(f"Rule worker {os.getpid()} ready")
+
+def _macronize_chunk(chunk, genre):
+    macronized = _worker_macronizer.macronize_chunk(chunk, genre)
+    failures, _worker_macronizer.error_report = _worker_macronizer.error_report, []
+    return macronized, _worker_macronizer.diagnostics.pop(), failures # the parent keeps the one diagnostics file and the error report
+
+def _tag_chunk(chunk, genre):
+    text_object = _worker_macronizer.make_text('\n'.join(chunk), genre)
+    text_object.docs = None # the parent only needs the text, the tokens, their offsets and sentences
+    text_object.token_lemma_pos_morph = [(orth, lemma, pos, str(morph)) for orth, lemma, pos, morph in text_object.token_lemma_pos_morph]
+    return text_object
+
+def _apply_rules(tokens, genre):
+    tokens = [(orth, lemma, pos, intern_morph(morph)) for orth, lemma, pos, morph in tokens]
+    failed = []
+    results = _worker_macronizer.macronize_tokens(tokens, genre, failed=failed)
+    return results, failed
+
+def regroup_lines(items, output):
+    '''
+    Splits the macronization of '\n'.join(items) back into one string per item, or returns None if the line counts do not match.
+    '''
+    output_lines = output.split('\n')
+    line_counts = [item.count('\n') + 1 for item in items]
+    if len(output_lines) != sum(line_counts):
+        return None
+
+    regrouped = []
+    position = 0
+    for count in line_counts:
+        regrouped.append('\n'.join(output_lines[position:position + count]))
+        position += count
+    return regrouped
+
+def macronize_parallel(macronizer, lines, workers=None, genre='prose', chunk_lines=200, prefetch=2, start_method=None, torch_threads=None):
+    '''
+    Yields one macronized string per item of lines, in order, macronizing chunks of chunk_lines items in a pool of workers
+    that are configured like macronizer.
+    '''
+    workers = workers or os.cpu_count() or 1
+    torch_threads = torch_threads or max(1, (os.cpu_count() or 1) // workers)
+    start_method = start_method or default_start_method()
+
+    context = multiprocessing.get_context(start_method)
+    if start_method == "forkserver":
+        context.set_forkserver_preload(["grc_macronizer"])
+    if start_method in ("fork", "forkserver"):
+        macronizer.preload() # for fork; harmless for forkserver
+
+    init_kwargs = dict(macronizer.init_kwargs, make_prints=False, diagnostics="manual" if macronizer.diagnostics.enabled else "off")
+    logging.info(f"Macronizing with {workers} {start_method} workers, {torch_threads} torch threads each, in chunks of {chunk_lines} lines")
+
+    iterator = (item.rstrip('\n') for item in lines)
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker, initargs=(init_kwargs, torch_threads))
+    try:
+        in_flight = deque()
+
+        def submit_next():
+            chunk = list(islice(iterator, chunk_lines))
+            if chunk:
+                in_flight.append(executor.submit(_macronize_chunk, chunk, genre))
+            return bool(chunk)
+
+        for _ in range(workers * prefetch):
+            if not submit_next():
+                break
+        while in_flight:
+            results, counts, failures = in_flight.popleft().result()
+            macronizer.diagnostics.merge(counts)
+            macronizer.error_report += failures
+            submit_next()
+            yield from results
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+def macronize_pipelined(macronizer, lines, tag_workers=None, rule_workers=None, genre='prose', chunk_lines=200, prefetch=2, start_method=None, torch_threads=2):
+    '''
+    Yields one macronized string per item of lines, in order, with tagging and the macronization modules in separate pools of workers
+    configured like macronizer. At most `workers * prefetch` chunks wait in or for each pool.
+    '''
+    cores = os.cpu_count() or 1
+    tag_workers = tag_workers or max(1, cores // 4)
+    rule_workers = rule_workers or max(1, cores - tag_workers * torch_threads)
+    start_method = start_method or default_start_method()
+
+    context = multiprocessing.get_context(start_method)
+    if start_method == "forkserver":
+        context.set_forkserver_preload(["grc_macronizer"])
+    if start_method in ("fork", "forkserver"):
+        macronizer.preload()
+
+    init_kwargs = dict(macronizer.init_kwargs, make_prints=False, diagnostics="off") # the parent counts the diagnostics
+    logging.info(f"Macronizing with {tag_workers} tagging workers ({torch_threads} torch threads each) and {rule_workers} rule workers, {start_method}, in chunks of {chunk_lines} lines")
+
+    from .class_macronizer import MODULES
+
+    iterator = (item.rstrip('\n') for item in lines)
+    taggers = ProcessPoolExecutor(max_workers=tag_workers, mp_context=context, initializer=_init_worker, initargs=(init_kwargs, torch_threads))
+    rules = ProcessPoolExecutor(max_workers=rule_workers, mp_context=context, initializer=_init_rule_worker, initargs=(init_kwargs,))
+    try:
+        tagging = deque() # (chunk, future of its Text), in input order
+        applying = deque() # (chunk, Text, future of its (result, events) pairs), in input order
+        exhausted = False
+
+        while True:
+            while not exhausted and len(tagging) < tag_workers * prefetch:
+                chunk = list(islice(iterator, chunk_lines))
+                if not chunk:
+                    exhausted = True
+                    break
+                tagging.append((chunk, taggers.submit(_tag_chunk, chunk, genre)))
+
+            if applying and applying[0][2].done():
+                chunk, text_object, future = applying.popleft()
+                results, failed = future.result()
+                failures, passthrough = macronizer.contain_failures(text_object, failed)
+                results_dict = {f"{module}_results": [] for module in MODULES}
+                still_ambiguous = []
+                macronized_words = []
+                for i, ((orth, lemma, pos, morph), (result, events)) in enumerate(zip(text_object.token_lemma_pos_morph, results)):
+                    if i in passthrough:
+                        macronized_words.append(None)
+                        continue
+                    for module, module_token in events:
+                        results_dict[f"{module}_results"].append(module_token)
+                    if open_dichrona(result) > 0:
+                        still_ambiguous.append((result, lemma, pos, morph))
+                    macronized_words.append(result)
+                text_object.macronized_words = macronized_words
+                text_object.integrate()
+                macronizer.write_diagnostics(results_dict, still_ambiguous, failures) # per chunk, so that nothing is lost if the consumer stops early
+
+                regrouped = regroup_lines(chunk, text_object.macronized_text)
+                if regrouped is None:
+                    logging.warning(f"Macronizing {len(chunk)} items gave the wrong number of lines; macronizing them one by one in this process")
+                    regrouped = [macronizer.macronize(item, genre) if item.strip() else item for item in chunk]
+                yield from regrouped
+                continue
+
+            if tagging and len(applying) < rule_workers * prefetch and tagging[0][1].done():
+                chunk, future = tagging.popleft()
+                text_object = future.result()
+                applying.append((chunk, text_object, rules.submit(_apply_rules, text_object.token_lemma_pos_morph, genre)))
+                continue
+
+            if not tagging and not applying:
+                break
+
+            waiting_for = []
+            if applying:
+                waiting_for.append(applying[0][2])
+            if tagging and len(applying) < rule_workers * prefetch:
+                waiting_for.append(tagging[0][1])
+            wait(waiting_for, return_when=FIRST_COMPLETED)
+    finally:
+        taggers.shutdown(wait=True, cancel_futures=True)
+        rules.shutdown(wait=True, cancel_futures=True)
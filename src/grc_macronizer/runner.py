@@ -0,0 +1,292 @@
+'''
+Resumable macronization of a corpus file, line by line, with a checkpoint manifest.
+
+The input is macronized in chunks of chunk_lines lines, and the output is appended one chunk at a time.
+A manifest of JSON lines next to the output starts with the settings of the run, and after every chunk one line is appended
+with the chunk's id, the byte range it was read from, the byte range it was written to and the sha256 of what was written:
+
+    {"version": 2, "input": "opera_graeca_batch_0.txt", "input_size": 98765432, "chunk_lines": 1000, "tsv": true}
+    {"id": 0, "input_start": 0, "input_end": 81234, "lines": 1000, "output_start": 0, "output_end": 170021, "sha256": "9f86d0...", "failed_lines": []}
+    ...
+
+A chunk's line is appended (and fsynced) only after its output is on disk, so writing the manifest costs the same for every chunk
+however long the run. On restart, a last line left half-written by a crash is dropped, the output is checked against the manifest
+and cut back to the end of the last intact chunk, and the manifest is rewritten atomically (to a temporary file, fsynced and renamed)
+with the intact chunks; then the run continues with the next chunk, from its byte offset in the input.
+An output without a manifest is never overwritten unless the run is started with restart=True (--restart).
+
+If a chunk fails, it is macronized again one line at a time, and a line that fails on its own one sentence at a time,
+so that only the sentences that fail on their own are lost: they are written unmacronized, to keep the output aligned with the input,
+and their lines are listed in the chunk's failed_lines.
+
+    python -m grc_macronizer.runner opera_graeca_batch_0.txt macronized/oga_0.tsv --tsv
+'''
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+import re
+import time
+
+MANIFEST_VERSION = 2
+
+SENTENCE_END = re.compile(r'(?<=[.;\u037e])') # where Text splits sentences, within a line
+
+class CorpusRunner:
+    '''
+    >>> runner = CorpusRunner(Macronizer(make_prints=False), "corpus.txt", "corpus.macronized.txt")
+    >>> runner.run()   # after a crash, just run it again
+    '''
+
+    def __init__(self, macronizer, input_path, output_path, manifest_path=None, chunk_lines=1000, tsv=False, genre='prose', restart=False):
+        self.macronizer = macronizer
+        self.input_path = Path(input_path)
+        self.output_path = Path(output_path)
+        self.manifest_path = Path(manifest_path) if manifest_path else self.output_path.with_name(self.output_path.name + ".manifest.jsonl")
+        self.chunk_lines = chunk_lines
+        self.tsv = tsv # write "original<TAB>macronized" lines instead of just the macronized ones
+        self.genre = genre
+        self.restart = restart # start over, overwriting the output and the manifest, whatever they contain
+
+        self.manifest = None
+
+    ############
+    # Manifest #
+    ############
+
+    def new_manifest(self):
+        return {
+            "version": MANIFEST_VERSION,
+            "input": str(self.input_path),
+            "input_size": self.input_path.stat().st_size,
+            "chunk_lines": self.chunk_lines,
+            "tsv": self.tsv,
+            "chunks": [],
+        }
+
+    def load_manifest(self):
+        '''
+        The manifest of an earlier run on the same input with the same settings, or a new one.
+        '''
+        manifest = self.new_manifest()
+        if self.restart:
+            return manifest
+        if not self.manifest_path.exists():
+            if self.output_path.exists() and self.output_path.stat().st_size > 0:
+                raise FileExistsError(f"{self.output_path} exists but has no manifest ({self.manifest_path}), so it cannot be resumed; pass restart=True (--restart) to overwrite it")
+            return manifest
+
+        with open(self.manifest_path, encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        try:
+            previous = json.loads(lines[0]) if lines else {}
+        except json.JSONDecodeError:
+            previous = {}
+        settings = ("version", "input_size", "chunk_lines", "tsv")
+        if any(previous.get(key) != manifest[key] for key in settings):
+            raise ValueError(f"{self.manifest_path} was written for another input or other settings ({', '.join(settings)}); pass restart=True (--restart) to start over")
+
+        for line in lines[1:]:
+            try:
+                manifest["chunks"].append(json.loads(line))
+            except json.JSONDecodeError: # the last line, if a crash cut it short
+                break
+        return manifest
+
+    def save_manifest(self):
+        '''
+        Replaces the manifest with self.manifest, atomically.
+        '''
+        header = {key: value for key, value in self.manifest.items() if key != "chunks"}
+        tmp_path = self.manifest_path.with_name(self.manifest_path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for record in (header, *self.manifest["chunks"]):
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        tmp_path.replace(self.manifest_path)
+
+    def append_chunk(self, chunk):
+        '''
+        Adds a chunk to the manifest, appending one line to its file.
+        '''
+        self.manifest["chunks"].append(chunk)
+        with open(self.manifest_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(chunk, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def verify_output(self):
+        '''
+        Drops the chunks whose output is missing or does not match its hash (and all chunks after them),
+        and truncates the output to the end of the last intact chunk.
+        '''
+        chunks = self.manifest["chunks"]
+        intact = 0
+        end = 0
+        if self.output_path.exists():
+            with open(self.output_path, "rb") as f:
+                for chunk in chunks:
+                    if chunk["output_start"] != end:
+                        break
+                    data = f.read(chunk["output_end"] - chunk["output_start"])
+                    if len(data) != chunk["output_end"] - chunk["output_start"] or hashlib.sha256(data).hexdigest() != chunk["sha256"]:
+                        break
+                    intact += 1
+                    end = chunk["output_end"]
+
+        if intact < len(chunks):
+            logging.warning(f"Runner: output of chunk {chunks[intact]['id']} is missing or corrupt; redoing it and the {len(chunks) - intact - 1} chunks after it")
+            del chunks[intact:]
+        with open(self.output_path, "ab") as f:
+            if f.tell() != end:
+                logging.info(f"Runner: truncating {self.output_path} from {f.tell()} to {end} bytes")
+                f.truncate(end)
+
+    ###########
+    # Running #
+    ###########
+
+    def read_chunks(self, start):
+        '''
+        Yields (input start, input end, lines) for chunks of chunk_lines lines from byte offset start of the input.
+        '''
+        with open(self.input_path, "rb") as f:
+            f.seek(start)
+            while True:
+                chunk_start = f.tell()
+                lines = []
+                for _ in range(self.chunk_lines):
+                    line = f.readline()
+                    if not line:
+                        break
+                    lines.append(line.decode("utf-8").rstrip("\r\n"))
+                if not lines:
+                    return
+                yield chunk_start, f.tell(), lines
+
+    def macronize_lines(self, lines):
+        '''
+        Macronized lines for lines, and the indices of the lines that could not be (entirely) macronized.
+        '''
+        try:
+            return self.macronizer.macronize_chunk(lines, self.genre), []
+        except Exception as e:
+            logging.warning(f"Runner: chunk failed ({e!r}); retrying it line by line")
+
+        macronized = []
+        failed = []
+        for i, line in enumerate(lines):
+            try:
+                macronized.append(self.macronizer.macronize(line, self.genre) if line.strip() else line)
+            except Exception as e:
+                logging.warning(f"Runner: line {i} of the chunk failed ({e!r}); retrying it sentence by sentence")
+                macronized_line, line_failed = self.macronize_sentences(line)
+                macronized.append(macronized_line)
+                if line_failed:
+                    failed.append(i)
+        return macronized, failed
+
+    def macronize_sentences(self, line):
+        '''
+        A line macronized one sentence at a time, with the sentences that fail left as they are, and whether any did.
+        '''
+        pieces = []
+        failed = False
+        for sentence in SENTENCE_END.split(line):
+            stripped = sentence.strip()
+            if not stripped:
+                pieces.append(sentence)
+                continue
+            start = sentence.index(stripped)
+            try:
+                macronized = self.macronizer.macronize(stripped, self.genre)
+            except Exception as e:
+                logging.error(f"Runner: sentence {stripped[:40]!r} failed ({e!r}); writing it unmacronized")
+                macronized = stripped
+                failed = True
+            pieces.append(sentence[:start] + macronized + sentence[start + len(stripped):])
+        return "".join(pieces), failed
+
+    def run(self):
+        '''
+        Macronizes what is left of the input. Returns the manifest.
+        '''
+        self.manifest = self.load_manifest()
+        self.verify_output()
+        self.save_manifest() # without the chunks verify_output dropped
+
+        chunks = self.manifest["chunks"]
+        start = chunks[-1]["input_end"] if chunks else 0
+        if chunks:
+            logging.info(f"Runner: resuming after chunk {chunks[-1]['id']}, at byte {start} of {self.input_path}")
+
+        with open(self.output_path, "ab") as out:
+            for input_start, input_end, lines in self.read_chunks(start):
+                chunk_id = len(chunks)
+                begin = time.perf_counter()
+                macronized, failed = self.macronize_lines(lines)
+                if self.tsv:
+                    macronized = [f"{line}\t{macronized_line}" for line, macronized_line in zip(lines, macronized)]
+                data = "".join(f"{line}\n" for line in macronized).encode("utf-8")
+
+                output_start = out.tell()
+                out.write(data)
+                out.flush()
+                os.fsync(out.fileno())
+
+                self.append_chunk({
+                    "id": chunk_id,
+                    "input_start": input_start,
+                    "input_end": input_end,
+                    "lines": len(lines),
+                    "output_start": output_start,
+                    "output_end": output_start + len(data),
+                    "sha256": hashlib.sha256(data).hexdigest(),
+                    "failed_lines": failed,
+                })
+                logging.info(f"Runner: chunk {chunk_id} ({len(lines)} lines, {len(failed)} failed) done in {time.perf_counter() - begin:.1f}s")
+
+        return self.manifest
+
+    @property
+    def failed_lines(self):
+        '''
+        Line numbers (0-based, in the input) of all the lines that were written unmacronized.
+        '''
+        line_numbers = []
+        first_line = 0
+        for chunk in (self.manifest or self.load_manifest())["chunks"]:
+            line_numbers += [first_line + i for i in chunk["failed_lines"]]
+            first_line += chunk["lines"]
+        return line_numbers
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Macronize a corpus file line by line, resuming where an earlier run stopped")
+    parser.add_argument("input_file")
+    parser.add_argument("output_file")
+    parser.add_argument("--manifest", default=None, help="Checkpoint manifest (default: <output_file>.manifest.jsonl)")
+    parser.add_argument("--restart", action="store_true", help="Start over, overwriting the output and the manifest")
+    parser.add_argument("--chunk-lines", type=int, default=1000)
+    parser.add_argument("--tsv", action="store_true", help="Write 'original<TAB>macronized' lines")
+    parser.add_argument("--genre", default="prose")
+    parser.add_argument("--no-hypotactic", action="store_true")
+    parser.add_argument("--lowercase", action="store_true")
+    parser.add_argument("--cache-dir", default=None)
+    parser.add_argument("--log-level", default="INFO", help="Level of the log in diagnostics/logs; DEBUG adds the per-token trace (default: INFO)")
+    parser.add_argument("--diagnostics", default="periodic", choices=["periodic", "manual", "off"], help="When to write the module hits and still-ambiguous words to diagnostics/ (default: periodic)")
+    parser.add_argument("--errors", default="skip-token", choices=["raise", "skip-token", "passthrough-sentence"], help="What to do with a token the modules fail on (default: skip-token)")
+    args = parser.parse_args()
+
+    from .class_macronizer import Macronizer
+    from .logs import configure_logging
+
+    configure_logging(args.log_level.upper())
+    macronizer = Macronizer(make_prints=False, doc_from_file=False, no_hypotactic=args.no_hypotactic, lowercase=args.lowercase, cache_dir=args.cache_dir, errors=args.errors, diagnostics=args.diagnostics)
+    runner = CorpusRunner(macronizer, args.input_file, args.output_file, manifest_path=args.manifest, chunk_lines=args.chunk_lines, tsv=args.tsv, genre=args.genre, restart=args.restart)
+    manifest = runner.run()
+    macronizer.flush_diagnostics()
+    print(f"Done: {len(manifest['chunks'])} chunks in {runner.output_path}, {len(runner.failed_lines)} lines left unmacronized")
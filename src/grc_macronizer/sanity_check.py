@@ -5,7 +5,9 @@ Here we define what the output should never be, without exception:
 
 import re
 
-from grc_utils import patterns, syllabifier, vowel, is_open_syllable_in_word_in_synapheia
+from grc_utils import patterns, vowel, is_open_syllable_in_word_in_synapheia
+
+from .word_analysis import analyze, WordAnalysis
 
 diphth_i = patterns['diphth_i']
 diphth_y = patterns['diphth_y']
@@ -21,10 +23,10 @@ diphthong_plus_markup = re.compile(fr'(?:{diphth_y}|{diphth_i}|{adscr_i})[_^]')
 def closed_syllable(syll: str) -> bool:
     return not vowel(syll[-1])
 
-def macronized_diphthong(word: str) -> bool:
+def macronized_diphthong(word) -> bool:
     '''
     Makes sure diphthongs are never in any way macronzied.
-    Part of the sanity check.
+    Part of the sanity check. word is a string with markup or a WordAnalysis.
 
         >>> macronized_diphthong("χίλι^οι)
         False
@@ -38,22 +40,22 @@ def macronized_diphthong(word: str) -> bool:
         >>> macronized_diphthong("δα^ϊμων")
         False
     '''
-    syllable_list = syllabifier(word)
+    syllable_list = analyze(word).syllables
 
     for syllable in syllable_list:
         if re.search(diphthong_plus_markup, syllable) or re.search(subscr_i, syllable) or re.search(split_diphth_i, syllable) or re.search(split_diphth_y, syllable):
             return True
     return False
 
-def demacronize_diphthong(word: str) -> str:
-    syllable_list = syllabifier(word)
-    
-    for idx, syllable in enumerate(syllable_list):
-        if macronized_diphthong(syllable):
-            syllable = syllable.replace("^", "").replace("_", "")
-            syllable_list[idx] = syllable
+def demacronize_diphthong(word):
+    '''
+    Strips the markup of the syllables with a macronized diphthong.
+    Returns a WordAnalysis for a WordAnalysis, and a string for a string.
+    '''
+    analysis = analyze(word)
+    demacronized = analysis.unmark_syllables([idx for idx, syllable in enumerate(analysis.syllables) if macronized_diphthong(syllable)])
 
-    return ''.join(syllable_list)
+    return demacronized if isinstance(word, WordAnalysis) else demacronized.word
 
 if __name__ == "__main__":
     print(macronized_diphthong("χίλιοι^"))  # Should return True
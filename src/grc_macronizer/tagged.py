@@ -0,0 +1,236 @@
+'''
+Lean, columnar storage of the tagger output.
+
+Of everything odyCy produces, the macronizer only ever reads each token's text, offset, lemma, POS and morphology.
+A TaggedDoc keeps exactly that: one table of interned strings plus integer columns pointing into it,
+and it iterates over TaggedTokens with the same attribute names as spaCy tokens (text, idx, lemma_, pos_, morph),
+so Text can treat it like a spaCy Doc. Reading it back needs neither odyCy nor a spaCy vocab.
+
+Binary format (pack_docs/unpack_docs): a header, magic b"GRCTAG" and format version (u16),
+followed by the zlib-compressed body, all of whose integers are little-endian u32:
+
+    counts      string count, doc count
+    strings     string count + 1 offsets into the string blob, then the UTF-8 string blob
+    docs        per doc: string id of its text, token count
+    columns     per doc: idx, text, lemma, pos and morph columns, one u32 per token each
+
+Morphology is stored as the interned UD FEATS string of each token, not as feature IDs. Reading a token turns it back
+into a Morph through intern_morph, which parses each distinct string once per process, so cache hits cost a dict lookup.
+'''
+
+from array import array
+from collections import namedtuple
+from functools import lru_cache
+import struct
+import sys
+import zlib
+
+MAGIC = b"GRCTAG"
+FORMAT_VERSION = 1
+
+HEADER = struct.Struct("<6sH")
+COUNTS = struct.Struct("<II")
+
+COLUMNS = ("idx", "orth", "lemma", "pos", "morph")
+
+TaggedToken = namedtuple("TaggedToken", ["text", "idx", "lemma_", "pos_", "morph"])
+
+class Morph:
+    '''
+    Read-only stand-in for spaCy's MorphAnalysis, built from its UD FEATS string.
+
+    >>> morph = Morph("Case=Acc,Nom|Number=Sing")
+    >>> morph.get("Case")
+    ['Acc', 'Nom']
+    >>> morph.get("Gender")
+    []
+    >>> str(morph)
+    'Case=Acc,Nom|Number=Sing'
+    '''
+    __slots__ = ("_string", "_fields")
+
+    def __init__(self, string=""):
+        self._string = string
+        self._fields = {}
+        if string:
+            for feature in string.split("|"):
+                field, _, values = feature.partition("=")
+                self._fields[field] = tuple(values.split(","))
+
+    def get(self, field, default=None):
+        values = self._fields.get(field)
+        if not values:
+            return [] if default is None else default
+        return list(values)
+
+    def to_dict(self):
+        return {field: ",".join(values) for field, values in self._fields.items()}
+
+    def __contains__(self, feature):
+        field, _, value = feature.partition("=")
+        return value in self._fields.get(field, ())
+
+    def __iter__(self):
+        for field, values in self._fields.items():
+            for value in values:
+                yield f"{field}={value}"
+
+    def __len__(self):
+        return sum(len(values) for values in self._fields.values())
+
+    def __hash__(self):
+        return hash(self._string)
+
+    def __eq__(self, other):
+        if isinstance(other, Morph):
+            return self._string == other._string
+        return NotImplemented
+
+    def __str__(self):
+        return self._string
+
+    def __repr__(self):
+        return self._string
+
+@lru_cache(maxsize=None)
+def intern_morph(string):
+    '''
+    One shared Morph per distinct FEATS string; there are only a few thousand in any corpus.
+    '''
+    return Morph(string)
+
+class TaggedDoc:
+    '''
+    The parts of a tagged sentence the macronizer uses. strings is shared with the other docs unpacked from the same file.
+    '''
+
+    def __init__(self, text, strings, idx, orth, lemma, pos, morph):
+        self.text = text
+        self.strings = strings
+        self.idx = idx
+        self.orth = orth
+        self.lemma = lemma
+        self.pos = pos
+        self.morph = morph
+
+    @classmethod
+    def from_tokens(cls, text, tokens):
+        '''
+        Builds a doc from anything with spaCy's token attributes (spaCy tokens, TaggedTokens).
+        '''
+        table = {}
+        strings = []
+
+        def intern(string):
+            i = table.get(string)
+            if i is None:
+                i = table[string] = len(strings)
+                strings.append(string)
+            return i
+
+        columns = {name: array("I") for name in COLUMNS}
+        for token in tokens:
+            columns["idx"].append(token.idx)
+            columns["orth"].append(intern(token.text))
+            columns["lemma"].append(intern(token.lemma_))
+            columns["pos"].append(intern(token.pos_))
+            columns["morph"].append(intern(str(token.morph)))
+        return cls(text, strings, **columns)
+
+    @classmethod
+    def from_spacy(cls, doc):
+        return cls.from_tokens(doc.text, doc)
+
+    def __iter__(self):
+        strings = self.strings
+        for i in range(len(self.idx)):
+            yield TaggedToken(strings[self.orth[i]], self.idx[i], strings[self.lemma[i]], strings[self.pos[i]], intern_morph(strings[self.morph[i]]))
+
+    def __len__(self):
+        return len(self.idx)
+
+    def __repr__(self):
+        return f"TaggedDoc({self.text!r})"
+
+def as_tagged(doc):
+    return doc if isinstance(doc, TaggedDoc) else TaggedDoc.from_spacy(doc)
+
+def _u32(values):
+    column = array("I", values)
+    if sys.byteorder == "big":
+        column.byteswap()
+    return column.tobytes()
+
+def _from_u32(data):
+    column = array("I")
+    column.frombytes(data)
+    if sys.byteorder == "big":
+        column.byteswap()
+    return column
+
+def pack_docs(docs):
+    '''
+    Serializes TaggedDocs (or spaCy Docs) into one blob with a single string table.
+    '''
+    docs = [as_tagged(doc) for doc in docs]
+    table = {}
+    strings = []
+
+    def intern(string):
+        i = table.get(string)
+        if i is None:
+            i = table[string] = len(strings)
+            strings.append(string)
+        return i
+
+    doc_table = []
+    columns = []
+    for doc in docs:
+        doc_table += [intern(doc.text), len(doc)]
+        remap = {} # doc.strings may be a table shared by many docs, so only intern the ids this doc uses
+        for i in set().union(*(getattr(doc, name) for name in COLUMNS[1:])):
+            remap[i] = intern(doc.strings[i])
+        columns.append(_u32(doc.idx))
+        for name in COLUMNS[1:]:
+            columns.append(_u32(remap[i] for i in getattr(doc, name)))
+
+    encoded = [string.encode("utf-8") for string in strings]
+    offsets = [0]
+    for string in encoded:
+        offsets.append(offsets[-1] + len(string))
+
+    body = b"".join([
+        COUNTS.pack(len(strings), len(docs)),
+        _u32(offsets),
+        b"".join(encoded),
+        _u32(doc_table),
+        *columns,
+    ])
+    return HEADER.pack(MAGIC, FORMAT_VERSION) + zlib.compress(body)
+
+def unpack_docs(data):
+    magic, version = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError(f"Not a version {FORMAT_VERSION} tagged-docs blob")
+
+    data = memoryview(zlib.decompress(data[HEADER.size:]))
+    string_count, doc_count = COUNTS.unpack_from(data, 0)
+    position = COUNTS.size
+    offsets = _from_u32(data[position:position + 4 * (string_count + 1)])
+    position += 4 * (string_count + 1)
+    blob = bytes(data[position:position + offsets[-1]])
+    strings = [blob[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(string_count)]
+    position += offsets[-1]
+
+    doc_table = _from_u32(data[position:position + 8 * doc_count])
+    position += 8 * doc_count
+
+    docs = []
+    for d in range(doc_count):
+        text_id, token_count = doc_table[2 * d], doc_table[2 * d + 1]
+        columns = {}
+        for name in COLUMNS:
+            columns[name] = _from_u32(data[position:position + 4 * token_count])
+            position += 4 * token_count
+        docs.append(TaggedDoc(strings[text_id], strings, **columns))
+    return docs
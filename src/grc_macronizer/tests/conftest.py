@@ -0,0 +1,52 @@
+import re
+
+import pytest
+
+from grc_macronizer import Macronizer
+from grc_macronizer.tagged import Morph, TaggedDoc, TaggedToken
+
+class FakeTagger:
+    '''
+    Stands in for odyCy: every word (with its elision mark) and every punctuation mark is a token,
+    annotated from annotations (form => (lemma, upos, feats)), else as a noun that is its own lemma.
+    '''
+
+    def __init__(self, annotations=None):
+        self.annotations = annotations or {}
+        self.texts = []
+
+    def pipe(self, texts, batch_size=None):
+        for text in texts:
+            self.texts.append(text)
+            tokens = []
+            for match in re.finditer(r"\w+'?|[^\w\s]", text):
+                form = match.group()
+                default = (form, "NOUN", "") if form[0].isalpha() else (form, "PUNCT", "")
+                lemma, pos, feats = self.annotations.get(form, default)
+                tokens.append(TaggedToken(form, match.start(), lemma, pos, Morph(feats)))
+            yield TaggedDoc.from_tokens(text, tokens)
+
+def accent_rules_only(self, token, lemma, pos, morph, results=None, **kwargs):
+    '''
+    Stands in for Macronizer.macronization_modules: only the accent rules, which need none of the databases.
+    '''
+    macronized = self.apply_accentuation_rules(token)
+    if results is not None and macronized.word != token:
+        results.append(('accent_rules', macronized))
+    return macronized
+
+@pytest.fixture
+def make_macronizer(tmp_path, monkeypatch):
+    '''
+    Builds Macronizers with a FakeTagger for a pipeline and only the accent rules for modules, writing nothing outside tmp_path.
+    '''
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(Macronizer, "macronization_modules", accent_rules_only)
+
+    def make_macronizer(**kwargs):
+        kwargs = {"make_prints": False, "diagnostics": "off", "docs_dir": tmp_path / "odycy_docs", **kwargs}
+        macronizer = Macronizer(**kwargs)
+        macronizer._nlp = FakeTagger()
+        return macronizer
+
+    return make_macronizer
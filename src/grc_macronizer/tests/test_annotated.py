@@ -0,0 +1,60 @@
+import pytest
+
+from grc_macronizer.annotated import AnnotatedToken, read_annotated, read_conllu
+
+CONLLU = """# sent_id = 1
+# text = ἡ χώρα καλή.
+1	ἡ	ὁ	DET	_	Case=Nom|Gender=Fem|Number=Sing	2	det	_	_
+2	χώρα	χώρα	NOUN	_	Case=Nom|Gender=Fem|Number=Sing	0	root	_	_
+3	καλή	καλός	ADJ	_	Case=Nom|Gender=Fem|Number=Sing	2	amod	_	SpaceAfter=No
+4	.	.	PUNCT	_	_	2	punct	_	_
+
+# sent_id = 2
+1-2	ἀλλ'	_	_	_	_	_	_	_	_
+1	ἀλλ'	ἀλλά	CCONJ	_	_	2	cc	_	_
+2	ἔλαβε	λαμβάνω	VERB	_	Mood=Ind|Number=Sing|Person=3|Tense=Past|VerbForm=Fin|Voice=Act	0	root	_	_
+"""
+
+def test_read_conllu(tmp_path):
+    path = tmp_path / "test.conllu"
+    path.write_text(CONLLU, encoding="utf-8")
+    for source in (CONLLU, path, str(path), CONLLU.splitlines(keepends=True)):
+        sentences = list(read_annotated(source))
+        assert [[token.form for token in sentence] for sentence in sentences] == [["ἡ", "χώρα", "καλή", "."], ["ἀλλ'", "ἔλαβε"]]
+        assert sentences[0][2] == AnnotatedToken("καλή", "καλός", "ADJ", "Case=Nom|Gender=Fem|Number=Sing", False)
+        assert sentences[1][0].feats == ""
+
+def test_read_conllu_is_lazy(tmp_path):
+    path = tmp_path / "test.conllu"
+    path.write_text(CONLLU + "\nnot a word line\n", encoding="utf-8")
+
+    sentences = read_conllu(path)
+    assert len(next(sentences)) == 4 # nothing after the first sentence has been read yet
+    assert len(next(sentences)) == 2
+    with pytest.raises(ValueError):
+        next(sentences)
+
+def test_read_tuples():
+    tokens = [("ἡ", "ὁ", "DET", "_"), ("χώρα", "χώρα", "NOUN", None), (".", ".", "PUNCT", ""), ("καλή", "καλός", "ADJ", "", False), None, None]
+    sentences = list(read_annotated(iter(tokens)))
+    assert [[token.form for token in sentence] for sentence in sentences] == [["ἡ", "χώρα", "."], ["καλή"]]
+    assert sentences[1][0].space_after is False
+    assert list(read_annotated([])) == []
+
+def test_macronize_annotated(make_macronizer, monkeypatch):
+    from grc_macronizer import Macronizer
+    from grc_macronizer.tests.conftest import accent_rules_only
+
+    seen = []
+
+    def modules(self, token, lemma, pos, morph, **kwargs):
+        seen.append((token, lemma, pos, str(morph)))
+        return accent_rules_only(self, token, lemma, pos, morph, **kwargs)
+
+    monkeypatch.setattr(Macronizer, "macronization_modules", modules)
+    macronizer = make_macronizer()
+    conllu = CONLLU + "\n# sent_id = 3\n1\tθάλαττα\tθάλαττα\tNOUN\t_\tCase=Nom|Gender=Fem|Number=Sing\t0\troot\t_\t_\n"
+
+    assert macronizer.macronize_annotated(conllu) == "ἡ χώρα_ καλή.\nἀλλ' ἔλαβε\nθάλαττα^"
+    assert ("χώρα", "χώρα", "NOUN", "Case=Nom|Gender=Fem|Number=Sing") in seen # with the given annotation
+    assert macronizer._nlp.texts == [] # never tagged
@@ -0,0 +1,67 @@
+import json
+
+from grc_macronizer.diagnostics import Diagnostics
+
+FAILURE = {"token": "ἀγαθῆς", "lemma": "ἀγαθός", "pos": "ADJ", "morph": "", "error": "RecursionError", "message": "too deep", "policy": "skip-token", "sentence": "ἀγαθῆς"}
+
+def test_errors_in_the_consolidated_file(tmp_path):
+    diagnostics = Diagnostics("manual", path=tmp_path / "diagnostics.json")
+    diagnostics.record({"lsj_results": ["ἀ^γα^θῆς"]}, [], [FAILURE])
+    diagnostics.record({}, [], [FAILURE, FAILURE])
+
+    written = json.loads(diagnostics.flush().read_text(encoding="utf-8"))
+    assert written["failures"] == 3
+    assert written["errors"] == [FAILURE] * 3
+    assert list(tmp_path.iterdir()) == [tmp_path / "diagnostics.json"] # and no other file
+
+    parent = Diagnostics("manual", path=tmp_path / "parent.json")
+    parent.merge(diagnostics.pop())
+    assert parent.errors == [FAILURE] * 3 and diagnostics.errors == []
+
+def test_off_records_no_errors(tmp_path):
+    diagnostics = Diagnostics("off", path=tmp_path / "diagnostics.json")
+    diagnostics.record({}, [], [FAILURE])
+    assert diagnostics.errors == []
+    assert diagnostics.flush() is None
+    assert not (tmp_path / "diagnostics.json").exists()
+
+def test_manual(tmp_path):
+    diagnostics = Diagnostics("manual", path=tmp_path / "diagnostics.json")
+    for _ in range(3):
+        diagnostics.record({"lsj_results": ["ἀ^γα^θῆς"], "hypotactic_results": []}, [("ἀνθρώπων", "ἄνθρωπος", "NOUN", "Case=Gen")])
+    assert not diagnostics.path.exists()
+
+    written = json.loads(diagnostics.flush().read_text(encoding="utf-8"))
+    assert (written["version"], written["calls"], written["modules"]) == (2, 3, {"lsj": 3})
+    assert written["still_ambiguous"] == [[3, "ἀνθρώπων", "ἄνθρωπος", "NOUN", "Case=Gen"]]
+    assert diagnostics.flush() is None # nothing new
+
+    diagnostics.record({"lsj_results": ["ἀ^γα^θῆς"]}, [])
+    diagnostics.flush()
+    assert json.loads(diagnostics.path.read_text(encoding="utf-8"))["calls"] == 4 # the same file, rewritten with the totals
+
+def test_periodic(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    diagnostics = Diagnostics("periodic", interval=3600)
+    diagnostics.record({"lsj_results": ["ἀ^γα^θῆς"]}, [])
+    assert not (tmp_path / "diagnostics").exists() # not yet due
+
+    diagnostics.interval = 0
+    diagnostics.record({"lsj_results": ["ἀ^γα^θῆς"]}, [])
+    [path] = (tmp_path / "diagnostics").iterdir() # one consolidated file under the working directory
+    assert path == tmp_path / diagnostics.path and json.loads(path.read_text(encoding="utf-8"))["calls"] == 2
+
+def test_periodic_flushed_at_exit_or_when_collected(tmp_path):
+    from grc_macronizer import diagnostics as module
+
+    alive = Diagnostics("periodic", path=tmp_path / "alive.json")
+    alive.record({"lsj_results": ["ἀ^γα^θῆς"]}, [])
+    module._flush_all() # what the exit hook does
+    assert json.loads(alive.path.read_text(encoding="utf-8"))["calls"] == 1
+
+    collected = Diagnostics("periodic", path=tmp_path / "collected.json")
+    collected.record({"lsj_results": ["ἀ^γα^θῆς"]}, [])
+    tracked = len(module._periodic)
+    del collected # the exit hook does not keep it alive, and its counts are not lost
+    assert json.loads((tmp_path / "collected.json").read_text(encoding="utf-8"))["calls"] == 1
+    assert len(module._periodic) == tracked - 1 and alive in module._periodic
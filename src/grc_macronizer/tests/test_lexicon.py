@@ -0,0 +1,37 @@
+import pytest
+
+from grc_macronizer.lexicon import build_lexicon, HEADER, Lexicon
+
+# keys whose bytewise order differs from their code point order, plus ASCII and an empty value
+STRINGS = {"ἐρυγμός": "ἐρυ^γμός", "ἀγαθός": "ἀ^γα^θός", "αβ": "α^β", "ᾅδης": "ᾅ_δης", "a": "", "ω": "ω"}
+LISTS = {"ἀνήρ": ["ἀ^νήρ", "ἀ_νήρ"], "ἄν": [1, 2]}
+MISSES = ["", "ἐρυγμό", "ἐρυγμόςς", "β", "zzz", "\U0010ffff"]
+
+@pytest.mark.parametrize("source", [STRINGS, LISTS, set(STRINGS), set()])
+def test_same_lookups_as_source(tmp_path, source):
+    lexicon = Lexicon(build_lexicon(source, tmp_path / "test.lex"))
+
+    assert len(lexicon) == len(source)
+    assert sorted(lexicon) == sorted(source)
+    for key in source:
+        assert key in lexicon
+        expected = source[key] if isinstance(source, dict) else key
+        assert lexicon.get(key) == expected
+        assert lexicon[key] == expected
+    for key in MISSES:
+        assert key not in lexicon
+        assert lexicon.get(key, "default") == "default"
+        with pytest.raises(KeyError):
+            lexicon[key]
+    assert 42 not in lexicon
+    lexicon.close()
+
+def test_wrong_version(tmp_path):
+    path = build_lexicon(STRINGS, tmp_path / "test.lex")
+    data = bytearray(path.read_bytes())
+    magic, version, flags, count, reserved = HEADER.unpack_from(data, 0)
+    HEADER.pack_into(data, 0, magic, version + 1, flags, count, reserved)
+    path.write_bytes(bytes(data))
+
+    with pytest.raises(ValueError):
+        Lexicon(path).get("αβ")
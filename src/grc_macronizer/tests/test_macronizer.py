@@ -0,0 +1,84 @@
+import pytest
+
+from grc_macronizer import Macronizer
+from grc_macronizer.tagged import Morph
+from grc_macronizer.tests.conftest import accent_rules_only
+
+# θάλαττα and χώρα come back macronized by the accent rules, and each of them twice, in different sentences
+TEXT = "ἡ θάλαττα καλή. ἡ χώρα κακόν. ἡ θάλαττα καὶ ἡ χώρα."
+
+def fail_on(monkeypatch, failing):
+    '''
+    Makes the modules raise on the token failing, and counts the tokens they are run on.
+    '''
+    calls = []
+
+    def modules(self, token, lemma, pos, morph, **kwargs):
+        calls.append(token)
+        if token == failing:
+            raise ValueError(f"no rule for {token}")
+        return accent_rules_only(self, token, lemma, pos, morph, **kwargs)
+
+    monkeypatch.setattr(Macronizer, "macronization_modules", modules)
+    return calls
+
+def test_deduplicated_tokens_match(make_macronizer, monkeypatch):
+    calls = fail_on(monkeypatch, "κακόν")
+    tokens = [(token, token, "NOUN", Morph("")) for token in ["θάλαττα", "χώρα", "κακόν", "θάλαττα", "κακόν", "χώρα"]]
+
+    outputs = []
+    for deduplicate in (False, True):
+        macronizer = make_macronizer(deduplicate=deduplicate, errors="skip-token", token_cache_size=0)
+        failed = []
+        outputs.append((macronizer.macronize_tokens(tokens, failed=failed), failed))
+    assert outputs[0] == outputs[1]
+    assert len(calls) == 6 + 3 # once per token, then once per signature
+
+    results, failed = outputs[1]
+    assert [result for result, _ in results] == ["θάλαττα^", "χώρα_", "κακόν", "θάλαττα^", "κακόν", "χώρα_"]
+    assert results[2] == ("κακόν", ()) # returned as it is, without events
+    assert [(i, error_type) for i, error_type, _ in failed] == [(2, "ValueError"), (4, "ValueError")]
+
+def test_deduplicated_text_matches(make_macronizer, monkeypatch):
+    fail_on(monkeypatch, "κακόν")
+    outputs = [make_macronizer(deduplicate=deduplicate, errors="skip-token", token_cache_size=0).macronize(TEXT) for deduplicate in (False, True)]
+    assert outputs[0] == outputs[1] == "ἡ θάλαττα^ καλή. ἡ χώρα_ κακόν. ἡ θάλαττα^ καὶ ἡ χώρα_."
+
+@pytest.mark.parametrize("offsets", ["all", "one missing"])
+def test_integration_by_offset_or_search(make_macronizer, monkeypatch, offsets):
+    from grc_macronizer.class_text import Text
+
+    searches = []
+    search = Text.replacements_by_search
+    monkeypatch.setattr(Text, "replacements_by_search", lambda self: searches.append(self) or search(self))
+
+    text_object = make_macronizer().make_text("ἡ θάλαττα καὶ ἡ θάλαττα. Θάλαττα καὶ θάλαττ' ἔφη.")
+    assert [text_object.text[start:end] for start, end in text_object.token_offsets] == ["θάλαττα", "θάλαττα", "Θάλαττα", "θάλαττ'"]
+    if offsets == "one missing": # e.g. a token odyCy changed, which then has to be searched for
+        text_object.token_offsets[3] = None
+
+    # the repeated tokens are told apart by position, so give them different macronizations
+    text_object.macronized_words = ["θά^λαττα", "θάλαττα^", "Θάλαττα^", "θά^λαττ'"]
+    assert text_object.integrate() == "ἡ θά^λαττα καὶ ἡ θάλαττα^. Θάλαττα^ καὶ θά^λαττ' ἔφη."
+    assert len(searches) == (offsets == "one missing")
+
+def test_errors_raise(make_macronizer, monkeypatch):
+    fail_on(monkeypatch, "κακόν")
+    with pytest.raises(ValueError, match="no rule for κακόν"):
+        make_macronizer(errors="raise").macronize(TEXT)
+
+@pytest.mark.parametrize("errors, expected", [
+    ("skip-token", "ἡ θάλαττα^ καλή. ἡ χώρα_ κακόν. ἡ θάλαττα^ καὶ ἡ χώρα_."),
+    ("passthrough-sentence", "ἡ θάλαττα^ καλή. ἡ χώρα κακόν. ἡ θάλαττα^ καὶ ἡ χώρα_."), # χώρα is left as it is in the failed sentence only
+])
+def test_errors_contained(make_macronizer, monkeypatch, errors, expected):
+    fail_on(monkeypatch, "κακόν")
+    macronizer = make_macronizer(errors=errors, diagnostics="manual")
+    assert macronizer.macronize(TEXT) == expected
+
+    [failure] = macronizer.error_report
+    assert failure == {
+        "token": "κακόν", "lemma": "κακόν", "pos": "NOUN", "morph": "", "error": "ValueError", "message": "no rule for κακόν",
+        "policy": errors, "sentence": " ἡ χώρα κακόν.", # the sentence as it was split, with its leading space
+    }
+    assert macronizer.diagnostics.errors == [failure] and macronizer.diagnostics.failures == 1
@@ -0,0 +1,26 @@
+import multiprocessing
+import os
+
+import pytest
+
+from grc_macronizer import parallel
+
+@pytest.mark.parametrize("platform", ["darwin", "win32"])
+def test_default_start_method_elsewhere_is_the_platforms(monkeypatch, platform):
+    monkeypatch.setattr(parallel.sys, "platform", platform)
+    assert parallel.default_start_method() == multiprocessing.get_start_method()
+
+def test_default_start_method_on_linux(monkeypatch):
+    monkeypatch.setattr(parallel.sys, "platform", "linux")
+    monkeypatch.setattr(parallel.multiprocessing, "get_all_start_methods", lambda: ["fork", "spawn", "forkserver"])
+    assert parallel.default_start_method() == "fork"
+
+def test_limit_threads_sets_the_environment(monkeypatch):
+    for variable in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        monkeypatch.delenv(variable, raising=False)
+    parallel.limit_threads(3)
+    assert os.environ["OMP_NUM_THREADS"] == os.environ["MKL_NUM_THREADS"] == os.environ["OPENBLAS_NUM_THREADS"] == "3"
+
+def test_regroup_lines():
+    assert parallel.regroup_lines(["a", "b\nc", "d"], "A\nB\nC\nD") == ["A", "B\nC", "D"]
+    assert parallel.regroup_lines(["a", "b"], "A") is None
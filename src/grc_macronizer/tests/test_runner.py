@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+from grc_macronizer.runner import CorpusRunner
+
+class UpperMacronizer:
+    '''
+    Stands in for a Macronizer: "macronizes" by upper-casing, and fails on any text containing one of fail_on.
+    '''
+
+    def __init__(self, fail_on=()):
+        self.fail_on = fail_on
+        self.chunks = 0
+
+    def macronize(self, text, genre='prose'):
+        if any(word in text for word in self.fail_on):
+            raise RuntimeError(f"cannot macronize {text!r}")
+        return text.upper()
+
+    def macronize_chunk(self, chunk, genre='prose'):
+        self.chunks += 1
+        return [self.macronize(line) for line in chunk]
+
+def write_input(tmp_path, lines):
+    input_path = tmp_path / "input.txt"
+    input_path.write_text("".join(f"{line}\n" for line in lines), encoding="utf-8")
+    return input_path
+
+LINES = [f"line {i}. more of line {i}" for i in range(10)]
+
+def test_run_and_resume(tmp_path):
+    input_path = write_input(tmp_path, LINES)
+    output_path = tmp_path / "output.txt"
+
+    runner = CorpusRunner(UpperMacronizer(), input_path, output_path, chunk_lines=3)
+    manifest = runner.run()
+    assert len(manifest["chunks"]) == 4
+    assert output_path.read_text(encoding="utf-8").splitlines() == [line.upper() for line in LINES]
+
+    # a crash in the middle of writing chunk 3: half of its output and a torn manifest line
+    chunks = manifest["chunks"]
+    with open(output_path, "r+b") as f:
+        f.truncate(chunks[2]["output_end"] + 5)
+    manifest_lines = runner.manifest_path.read_text(encoding="utf-8").splitlines()
+    runner.manifest_path.write_text("\n".join(manifest_lines[:-1]) + "\n" + manifest_lines[-1][:20], encoding="utf-8")
+
+    macronizer = UpperMacronizer()
+    manifest = CorpusRunner(macronizer, input_path, output_path, chunk_lines=3).run()
+    assert macronizer.chunks == 1 # only the last chunk again
+    assert [chunk["id"] for chunk in manifest["chunks"]] == [0, 1, 2, 3]
+    assert output_path.read_text(encoding="utf-8").splitlines() == [line.upper() for line in LINES]
+    assert len(runner.manifest_path.read_text(encoding="utf-8").splitlines()) == 5 # the settings and one line per chunk
+
+def test_existing_output_without_manifest(tmp_path):
+    input_path = write_input(tmp_path, LINES)
+    output_path = tmp_path / "output.txt"
+    output_path.write_text("output of an earlier run\n", encoding="utf-8")
+
+    with pytest.raises(FileExistsError):
+        CorpusRunner(UpperMacronizer(), input_path, output_path).run()
+    assert output_path.read_text(encoding="utf-8") == "output of an earlier run\n"
+
+    CorpusRunner(UpperMacronizer(), input_path, output_path, restart=True).run()
+    assert output_path.read_text(encoding="utf-8").splitlines() == [line.upper() for line in LINES]
+
+def test_other_settings(tmp_path):
+    input_path = write_input(tmp_path, LINES)
+    output_path = tmp_path / "output.txt"
+    CorpusRunner(UpperMacronizer(), input_path, output_path, chunk_lines=3).run()
+
+    with pytest.raises(ValueError):
+        CorpusRunner(UpperMacronizer(), input_path, output_path, chunk_lines=4).run()
+
+def test_failed_sentences(tmp_path):
+    input_path = write_input(tmp_path, LINES)
+    output_path = tmp_path / "output.txt"
+
+    runner = CorpusRunner(UpperMacronizer(fail_on=["line 4."]), input_path, output_path, chunk_lines=3, tsv=True)
+    runner.run()
+    assert runner.failed_lines == [4]
+
+    output = output_path.read_text(encoding="utf-8").splitlines()
+    assert output[4] == "line 4. more of line 4\tline 4. MORE OF LINE 4" # only the failing sentence is left as it is
+    assert output[5] == "line 5. more of line 5\tLINE 5. MORE OF LINE 5"
+
+    header = json.loads(runner.manifest_path.read_text(encoding="utf-8").splitlines()[0])
+    assert header["tsv"] is True
@@ -0,0 +1,58 @@
+import re
+
+import pytest
+
+from grc_macronizer.class_text import sentence_windows, tag_sentences
+from grc_macronizer.tagged import Morph, TaggedDoc, TaggedToken
+
+class WhitespaceTagger:
+    '''
+    Stands in for odyCy: one token per whitespace-separated word, lemmatized by upper-casing.
+    '''
+
+    def __init__(self):
+        self.texts = []
+
+    def pipe(self, texts, batch_size=None):
+        for text in texts:
+            self.texts.append(text)
+            tokens = [TaggedToken(match.group(), match.start(), match.group().upper(), "X", Morph()) for match in re.finditer(r'\S+', text)]
+            yield TaggedDoc.from_tokens(text, tokens)
+
+SENTENCE = " ".join(f"λόγος{i}," if i % 7 == 6 else f"λόγος{i}" for i in range(50)) + "."
+
+@pytest.mark.parametrize("max_tokens, overlap", [(10, 0), (10, 4), (12, 8), (49, 8), (3, 8)])
+def test_windows_partition_the_sentence(max_tokens, overlap):
+    windows = sentence_windows(SENTENCE, max_tokens, overlap)
+    assert windows[0][2] == 0 and windows[-1][3] == len(SENTENCE)
+    for (_, _, _, owned_end), (_, _, owned_start, _) in zip(windows, windows[1:]):
+        assert owned_end == owned_start
+    for start, end, owned_start, owned_end in windows:
+        assert len(SENTENCE[start:end].split()) <= max_tokens
+        for word in re.finditer(r'\S+', SENTENCE):
+            if owned_start <= word.start() < owned_end: # every word is tagged inside the window that owns it
+                assert start <= word.start() and word.end() <= end
+
+def test_short_sentence_is_one_window():
+    assert sentence_windows("ἡ χώρα καλή.", 10) == [(0, 12, 0, 12)]
+    assert sentence_windows(SENTENCE, None) == [(0, len(SENTENCE), 0, len(SENTENCE))]
+
+def test_windows_cut_after_commas():
+    for start, end, _, _ in sentence_windows(SENTENCE, 10, 2)[:-1]:
+        assert SENTENCE[:end].endswith(",")
+
+@pytest.mark.parametrize("sort_by_length", [False, True])
+def test_stitched_docs_match_whole_sentences(sort_by_length):
+    sentences = ["ἡ χώρα καλή.", SENTENCE, "καλὴ ἡ θάλαττα"]
+    whole, _, _ = tag_sentences(WhitespaceTagger(), sentences)
+
+    tagger = WhitespaceTagger()
+    stitched, tokens, _ = tag_sentences(tagger, sentences, sort_by_length=sort_by_length, max_sentence_tokens=10, window_overlap=4)
+    assert len(tagger.texts) > len(sentences)
+    assert max(len(text.split()) for text in tagger.texts) <= 10
+
+    def columns(doc):
+        return [(token.text, token.idx, token.lemma_) for token in doc]
+    assert [doc.text for doc in stitched] == sentences
+    assert [columns(doc) for doc in stitched] == [columns(doc) for doc in whole]
+    assert tokens == sum(len(sentence.split()) for sentence in sentences)
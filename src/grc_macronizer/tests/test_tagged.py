@@ -0,0 +1,101 @@
+from grc_macronizer.doc_cache import DocCache
+from grc_macronizer.tagged import Morph, pack_docs, TaggedDoc, TaggedToken, unpack_docs
+
+def make_doc(text, lemmas, pos, morphs):
+    tokens = []
+    idx = 0
+    for word, lemma, tag, morph in zip(text.split(), lemmas, pos, morphs):
+        idx = text.index(word, idx)
+        tokens.append(TaggedToken(word, idx, lemma, tag, Morph(morph)))
+        idx += len(word)
+    return TaggedDoc.from_tokens(text, tokens)
+
+DOCS = [
+    make_doc("ἡ χώρα καλή.", ["ὁ", "χώρα", "καλός", "."], ["DET", "NOUN", "ADJ", "PUNCT"],
+             ["Case=Nom|Gender=Fem|Number=Sing", "Case=Nom|Gender=Fem|Number=Sing", "Case=Nom|Gender=Fem|Number=Sing", ""]),
+    make_doc("καλὴ ἡ θάλαττα", ["καλός", "ὁ", "θάλαττα"], ["ADJ", "DET", "NOUN"], ["Case=Nom,Voc|Number=Sing", "", ""]),
+    make_doc("", [], [], []),
+]
+
+def tokens(doc):
+    return [(token.text, token.idx, token.lemma_, token.pos_, str(token.morph)) for token in doc]
+
+def test_pack_round_trip():
+    docs = unpack_docs(pack_docs(DOCS))
+    assert [doc.text for doc in docs] == [doc.text for doc in DOCS]
+    assert [tokens(doc) for doc in docs] == [tokens(doc) for doc in DOCS]
+    assert docs[0].strings is docs[1].strings # one string table per blob
+
+    morph = list(docs[1])[0].morph
+    assert morph.get("Case") == ["Nom", "Voc"]
+    assert "Number=Sing" in morph
+    first, second = list(docs[0])[:2]
+    assert first.morph is second.morph # one Morph per distinct FEATS string
+
+def test_repack_unpacked_docs():
+    docs = unpack_docs(pack_docs(DOCS))
+    assert [tokens(doc) for doc in unpack_docs(pack_docs(docs[1:2]))] == [tokens(DOCS[1])]
+
+def test_doc_cache(tmp_path):
+    sentences = [doc.text for doc in DOCS[:2]]
+    cache = DocCache(tmp_path)
+    assert cache.get_many(sentences) == [None, None]
+    cache.put_many(sentences, DOCS[:2])
+
+    cache = DocCache(tmp_path)
+    docs = cache.get_many(sentences + ["ἄλλο τι"])
+    assert [tokens(doc) for doc in docs[:2]] == [tokens(doc) for doc in DOCS[:2]]
+    assert docs[2] is None
+    assert (cache.hits, cache.misses) == (2, 1)
+
+    assert DocCache(tmp_path, variant="-noparser").get_many(sentences) == [None, None] # another pipeline
+    cache.close()
+
+def test_doc_cache_evicts_least_recently_used(tmp_path):
+    cache = DocCache(tmp_path)
+    cache.put_many([DOCS[0].text], [DOCS[0]])
+    cache.max_bytes = len(pack_docs([DOCS[0]])) + len(pack_docs([DOCS[1]])) - 1
+    cache.put_many([DOCS[1].text], [DOCS[1]])
+    assert cache.get_many([DOCS[0].text, DOCS[1].text])[0] is None
+    assert len(cache) == 1
+    cache.close()
+
+def test_doc_cache_keeps_a_running_total(tmp_path):
+    cache = DocCache(tmp_path)
+    statements = []
+    cache._connection().set_trace_callback(statements.append)
+
+    def summed():
+        return cache._connection().execute("SELECT SUM(size) FROM docs").fetchone()[0]
+
+    for doc in DOCS[:2]:
+        cache.put_many([doc.text], [doc])
+    cache.put_many([DOCS[0].text], [DOCS[0]]) # replaces a row
+    assert sum("SUM(size)" in statement for statement in statements) == 1 # only on the first put
+    assert cache._total == summed()
+
+    cache.max_bytes = len(pack_docs([DOCS[1]]))
+    cache.put_many([DOCS[1].text], [DOCS[1]]) # evicts the other sentence
+    assert len(cache) == 1 and cache._total == summed()
+    cache.close()
+
+def test_docs_file_in_user_cache_dir(tmp_path, monkeypatch):
+    from grc_macronizer.class_text import Text
+
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    monkeypatch.chdir(tmp_path)
+    tagged = []
+
+    def tag(sentences):
+        tagged.append(sentences)
+        return DOCS[:2]
+
+    sentences = [doc.text for doc in DOCS[:2]]
+    for _ in range(2):
+        docs = Text.docs_from_file(sentences, "\n".join(sentences), tag, doc_from_file=True)
+        assert [tokens(doc) for doc in docs] == [tokens(doc) for doc in DOCS[:2]]
+    assert len(tagged) == 1 # the second time from the file
+    assert [path.parent for path in tmp_path.rglob("*.tagged")] == [tmp_path / "cache" / "grc_macronizer" / "odycy_docs"]
+
+    Text.docs_from_file(sentences, "\n".join(sentences), tag, doc_from_file=True, docs_dir=tmp_path / "docs")
+    assert len(list((tmp_path / "docs").glob("*.tagged"))) == 1
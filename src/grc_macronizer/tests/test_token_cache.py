@@ -0,0 +1,33 @@
+from grc_macronizer.token_cache import TokenCache, token_key
+
+def test_evicts_least_recently_used():
+    cache = TokenCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1 # now b is the least recently used
+    cache.put("c", 3)
+    assert "b" not in cache and "a" in cache and "c" in cache
+    assert cache.get("b") is None
+    assert (len(cache), cache.hits, cache.misses) == (2, 1, 1)
+
+def test_maxsize_zero_disables_caching():
+    cache = TokenCache(maxsize=0)
+    cache.put("a", 1)
+    assert cache.get("a") is None and len(cache) == 0
+
+def test_maxsize_none_is_unbounded():
+    cache = TokenCache(maxsize=None)
+    for i in range(1000):
+        cache.put(i, i)
+    assert len(cache) == 1000 and cache.get(0) == 0
+
+def test_token_key_normalizes_the_token():
+    assert token_key("ἀγαθ\u1f71", "ἀγαθός", "ADJ", None) == token_key("ἀγαθ\u03ac", "ἀγαθός", "ADJ", "") # oxia and tonos
+
+def test_same_results_with_the_cache_on_or_off(make_macronizer):
+    text = "ἡ θάλαττα καλή. ἡ χώρα καὶ ἡ θάλαττα. ἡ χώρα."
+    cached = make_macronizer(token_cache_size=100_000)
+    uncached = make_macronizer(token_cache_size=0)
+    assert cached.macronize(text) == uncached.macronize(text) == "ἡ θάλαττα^ καλή. ἡ χώρα_ καὶ ἡ θάλαττα^. ἡ χώρα_."
+    assert cached.token_cache.hits > 0 and len(uncached.token_cache) == 0
+    assert cached.macronize(text) == uncached.macronize(text) # the second time from the cache
@@ -0,0 +1,34 @@
+from grc_macronizer.token_store import TokenStore
+
+KEY = ["ἀγαθῆς", "ἀγαθός", "ADJ", "Case=Gen|Gender=Fem|Number=Sing", "prose", False, False]
+
+def test_put_and_get(tmp_path):
+    store = TokenStore(tmp_path)
+    assert store.get(KEY) is None
+    store.put(KEY, "ἀ^γα^θῆς", [("hypotactic", "ἀ^γα^θῆς")])
+    store.flush()
+    assert store.get(KEY) == ("ἀ^γα^θῆς", [("hypotactic", "ἀ^γα^θῆς")])
+    assert len(store) == 1
+    store.close()
+
+def test_versions_share_a_store(tmp_path):
+    old = TokenStore(tmp_path)
+    old.fingerprint = "old"
+    old.put(KEY, "ἀ^γα^θῆς", [])
+    old.close()
+
+    new = TokenStore(tmp_path)
+    new.fingerprint = "new"
+    assert new.get(KEY) is None # never the result of another version
+    new.put(KEY, "ἀ^γα^θῆς", [("lsj", "ἀ^γα^θῆς")])
+    new.flush()
+
+    old = TokenStore(tmp_path)
+    old.fingerprint = "old"
+    assert old.get(KEY) == ("ἀ^γα^θῆς", []) # opening the store with another fingerprint deletes nothing
+
+    assert new.prune() == 1
+    assert old.get(KEY) is None
+    assert new.get(KEY) == ("ἀ^γα^θῆς", [("lsj", "ἀ^γα^θῆς")])
+    old.close()
+    new.close()
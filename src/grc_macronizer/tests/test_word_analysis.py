@@ -0,0 +1,45 @@
+import random
+import re
+
+from grc_utils import count_dichrona_in_open_syllables, normalize_word, syllabifier, vowel
+
+from grc_macronizer.format_macrons import join_markup, merge_or_overwrite_markup
+from grc_macronizer.sanity_check import demacronize_diphthong
+from grc_macronizer.tests.anabasis import anabasis_medium
+from grc_macronizer.tests.hiketides import hiketides
+from grc_macronizer.word_analysis import analyze
+
+WORDS = sorted(set(re.findall(r"\S+", normalize_word(anabasis_medium[:20000] + hiketides[:20000]))))
+
+def random_markings(word, rng):
+    return join_markup(word, bytes(rng.choice([0, 0, 1, 2]) if vowel(char) else 0 for char in word))
+
+def test_counts_from_the_marks_match_the_rendered_word():
+    rng = random.Random(1)
+    for word in rng.sample(WORDS, 1000):
+        for _ in range(3):
+            marked = random_markings(word, rng)
+            analysis = analyze(word).merge(marked) # as in the cascade, not parsed from marked
+            assert analysis.word == marked
+            assert analysis.open_dichrona == count_dichrona_in_open_syllables(marked), marked
+            assert analysis.syllables == tuple(syllabifier(marked)), marked
+
+def test_merge_matches_merge_or_overwrite_markup():
+    rng = random.Random(2)
+    for word in WORDS[:500]:
+        old, new = random_markings(word, rng), random_markings(word, rng)
+        for precedence in ("new", "old"):
+            assert analyze(old).merge(new, precedence).word == merge_or_overwrite_markup(new, old, precedence)
+    assert analyze('ἀγαθῆς').merge('κακῆς') == analyze('ἀγαθῆς') # another word
+    assert analyze('ἀγαθῆς').merge(None) is analyze('ἀγαθῆς')
+
+def test_merging_shares_the_base_analysis():
+    word = analyze('ἀγαθῆς')
+    merged = word.merge('ἀ^γαθῆς').merge('ἀγα^θῆς')
+    assert merged.word == 'ἀ^γα^θῆς' and merged.open_dichrona == 0
+    assert merged.analysis is word.analysis
+    assert word.word == 'ἀγαθῆς' and word.open_dichrona == 2 # unchanged by the merges
+
+def test_demacronize_diphthong():
+    assert demacronize_diphthong("χίλιοι^") == "χίλιοι"
+    assert demacronize_diphthong(analyze("χίλι^οι^")).word == "χίλι^οι"
@@ -0,0 +1,83 @@
+import io
+import json
+
+import pytest
+
+from grc_macronizer.annotated import read_conllu
+from grc_macronizer.writers import length_sources, MacronizedSentence, MacronizedToken, open_writer
+
+# As macronized_sentences yields the first sentence of 'ἡ χώρα καλή\nκαλὴ ἡ θάλαττα': no final punctuation, so the line break
+# stays in the sentence text and spaCy makes a SPACE token of it
+SENTENCE = MacronizedSentence(1, "ἡ χώρα καλή\n", "ἡ χώρα_ κα_λή\n", [
+    MacronizedToken("ἡ", "ὁ", "DET", "Case=Nom|Gender=Fem|Number=Sing", True, None, []),
+    MacronizedToken("χώρα", "χώρα", "NOUN", "Case=Nom|Gender=Fem|Number=Sing", True, "χώρα_", ["accent_rules"]),
+    MacronizedToken("καλή", "καλός", "ADJ", "Case=Nom|Gender=Fem|Number=Sing", True, "κα_λή", ["hypotactic"]),
+    MacronizedToken("\n", "\n", "SPACE", "", True, None, []),
+])
+NEXT_SENTENCE = MacronizedSentence(2, "καλὴ ἡ θάλαττα", "κα_λὴ ἡ θά^λα^ττα^", [
+    MacronizedToken("καλὴ", "καλός", "ADJ", "", True, "κα_λὴ", ["hypotactic"]),
+    MacronizedToken("ἡ", "ὁ", "DET", "", True, None, []),
+    MacronizedToken("θάλαττα", "θάλαττα", "NOUN", "", True, "θά^λα^ττα^", ["lsj", "lsj", "lsj"]),
+])
+
+def write(sentences, format):
+    out = io.StringIO()
+    with open_writer(out, format) as writer:
+        for sentence in sentences:
+            writer.write(sentence)
+    return out.getvalue()
+
+def test_conllu_round_trip():
+    conllu = write([SENTENCE, NEXT_SENTENCE], "conllu")
+
+    blocks = conllu.strip("\n").split("\n\n")
+    assert len(blocks) == 2
+    assert blocks[0].splitlines()[:3] == ["# sent_id = 1", "# text = ἡ χώρα καλή", "# macronized_text = ἡ χώρα_ κα_λή"]
+
+    sentences = read_conllu(conllu)
+    assert [[token.form for token in sentence] for sentence in sentences] == [["ἡ", "χώρα", "καλή"], ["καλὴ", "ἡ", "θάλαττα"]]
+    assert [line.split("\t")[0] for line in blocks[0].splitlines()[3:]] == ["1", "2", "3"]
+    assert "Macronized=θά^λα^ττα^|LengthSource=lsj,lsj,lsj" in blocks[1]
+
+def test_jsonl_skips_whitespace_tokens():
+    records = [json.loads(line) for line in write([SENTENCE, NEXT_SENTENCE], "jsonl").splitlines()]
+    assert [record["sent_id"] for record in records] == [1, 2]
+    assert records[0]["text"] == "ἡ χώρα καλή"
+    assert [token["form"] for token in records[0]["tokens"]] == ["ἡ", "χώρα", "καλή"]
+
+def test_unknown_format():
+    with pytest.raises(ValueError):
+        open_writer(io.StringIO(), "xml")
+
+def test_length_sources():
+    assert length_sources("χωρα", "χώρα_", [("accent_rules", "χώρα_")]) == ["accent_rules"]
+    assert length_sources("ἂ_ν", "ἂ_ν", []) == ["preprocessing"]
+    assert length_sources("ἄλλα", "ἄλλα_", []) == ["other"]
+
+def test_write_macronized_lines_without_final_punctuation(tmp_path, monkeypatch):
+    pytest.importorskip("grc_odycy_joint_trf")
+    from grc_macronizer import Macronizer
+
+    monkeypatch.chdir(tmp_path)
+    macronizer = Macronizer(make_prints=False, doc_from_file=False, diagnostics="off")
+    out = tmp_path / "out.conllu"
+    macronizer.write_macronized("ἡ χώρα καλή\nκαλὴ ἡ θάλαττα", out)
+
+    sentences = read_conllu(out)
+    assert [[token.form for token in sentence] for sentence in sentences] == [["ἡ", "χώρα", "καλή"], ["καλὴ", "ἡ", "θάλαττα"]]
+
+@pytest.mark.parametrize("format", ["conllu", "jsonl"])
+def test_write_macronized_keeps_sentences_without_dichrona(make_macronizer, tmp_path, format):
+    text = "ἡ χώρα καλή.\nὁ δὲ ἦλθεν.\nκαλὴ ἡ θάλαττα."
+    out = tmp_path / f"out.{format}"
+    assert make_macronizer().write_macronized(text, out, format=format) == 3
+
+    if format == "conllu":
+        sentences = read_conllu(out)
+        assert [" ".join(token.form for token in sentence) for sentence in sentences] == ["ἡ χώρα καλή .", "ὁ δὲ ἦλθεν .", "καλὴ ἡ θάλαττα ."]
+        assert "# macronized_text = ὁ δὲ ἦλθεν." in out.read_text(encoding="utf-8")
+    else:
+        records = [json.loads(line) for line in out.read_text(encoding="utf-8").splitlines()]
+        assert [record["text"] for record in records] == ["ἡ χώρα καλή.", "ὁ δὲ ἦλθεν.", "καλὴ ἡ θάλαττα."]
+        assert records[1]["macronized_text"] == "ὁ δὲ ἦλθεν."
+        assert all(token["macronized"] is None for token in records[1]["tokens"])
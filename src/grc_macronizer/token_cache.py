@@ -0,0 +1,76 @@
+'''
+In-memory memoization of the macronization cascade.
+
+Greek corpora repeat the same forms constantly (καὶ, δὲ, τὰ, πόλιν...), and the result of
+Macronizer.macronization_modules depends on nothing but the token, its lemma, POS and morphology
+(and the configuration of the Macronizer, which is fixed per instance). Hence one bounded LRU cache
+per Macronizer, shared across all calls to macronize.
+'''
+
+from collections import OrderedDict
+
+from grc_utils import normalize_word
+
+def morph_key(morph):
+    '''
+    Canonical string for a morphology, e.g. 'Case=Nom|Gender=Fem|Number=Sing'.
+    spaCy's MorphAnalysis already stringifies with sorted features, so str() is canonical.
+    '''
+    if morph is None:
+        return ''
+    return str(morph)
+
+def token_key(token, lemma, pos, morph):
+    '''
+    >>> token_key('πόλιν', 'πόλις', 'NOUN', 'Case=Acc|Gender=Fem|Number=Sing')
+    ('πόλιν', 'πόλις', 'NOUN', 'Case=Acc|Gender=Fem|Number=Sing')
+    '''
+    return (normalize_word(token), lemma or '', pos or '', morph_key(morph))
+
+class TokenCache:
+    '''
+    Bounded LRU cache mapping token_key(...) to whatever the Macronizer stores for it.
+    maxsize=0 disables caching (every lookup is then a miss), maxsize=None means unbounded.
+    '''
+
+    def __init__(self, maxsize=100_000):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def get(self, key):
+        value = self._data.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        if self.maxsize == 0:
+            return
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if self.maxsize is not None and len(self._data) > self.maxsize:
+            self._data.popitem(last=False) # evict the least recently used entry
+
+    def clear(self):
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __repr__(self):
+        return f"TokenCache(size={len(self._data)}, maxsize={self.maxsize}, hits={self.hits}, misses={self.misses}, hit_rate={self.hit_rate:.2%})"
@@ -0,0 +1,165 @@
+'''
+Persistent, on-disk counterpart to the in-memory TokenCache.
+
+We macronize the same corpora over and over as the databases improve, so the final macronized form of every
+(token, lemma, pos, morph, genre, config flags) signature is kept in a small SQLite database in a cache dir of the user's choosing.
+
+- Every key is prefixed by a fingerprint of the shipped databases, the rule modules and grc_utils,
+  so that entries computed with an older db or older rules are never returned. Several versions (e.g. two installs
+  sharing a cache dir) can use the same store side by side; entries of other versions are only deleted by an explicit prune:
+
+    python -m grc_macronizer.token_store prune ~/.cache/grc_macronizer
+- SQLite in WAL mode with a generous busy timeout means that any number of worker processes can read and write at once.
+- Connections are never shared across a fork: each process opens its own on first use.
+'''
+
+import argparse
+from importlib.metadata import PackageNotFoundError, version
+from importlib.resources import files
+import json
+import logging
+import os
+from pathlib import Path
+import sqlite3
+
+import xxhash
+
+# Files whose contents decide what macronization_modules returns. Changing any of them invalidates the store.
+FINGERPRINTED_MODULES = [
+    "barytone.py",
+    "class_macronizer.py",
+    "format_macrons.py",
+    "lexicon.py",
+    "morph_disambiguator.py",
+    "nominal_forms.py",
+    "sanity_check.py",
+    "verbal_forms.py",
+    "word_analysis.py",
+]
+
+_fingerprint = None
+
+def db_fingerprint():
+    '''
+    xxhash of every file in grc_macronizer.db (lsj.py, custom.py, hypotactic.pkl, ...), the rule modules above,
+    and the version and modules of grc_utils (syllabification, accent classes and the dichrona counts come from there).
+    Computed once per process.
+    '''
+    global _fingerprint
+    if _fingerprint is None:
+        hasher = xxhash.xxh3_64()
+        try:
+            hasher.update(f"grc_utils-{version('grc_utils')}".encode("utf-8"))
+        except PackageNotFoundError: # e.g. the submodule on sys.path; its files are hashed below in any case
+            pass
+        db_dir = files("grc_macronizer.db")
+        resources = sorted((entry for entry in db_dir.iterdir() if entry.name.endswith((".py", ".pkl"))), key=lambda entry: entry.name)
+        resources += [files("grc_macronizer").joinpath(name) for name in FINGERPRINTED_MODULES]
+        resources += sorted((entry for entry in files("grc_utils").iterdir() if entry.name.endswith(".py")), key=lambda entry: entry.name)
+        for resource in resources:
+            hasher.update(resource.name.encode("utf-8"))
+            hasher.update(resource.read_bytes())
+        _fingerprint = hasher.hexdigest()
+    return _fingerprint
+
+class TokenStore:
+    '''
+    >>> store = TokenStore("~/.cache/grc_macronizer")
+    >>> store.put(key, "ἀ^γα^θῆς", [("hypotactic", "ἀ^γα^θῆς")])
+    >>> store.flush()
+    >>> store.get(key)
+    ('ἀ^γα^θῆς', [('hypotactic', 'ἀ^γα^θῆς')])
+    '''
+
+    def __init__(self, cache_dir, flush_every=1000, timeout=60):
+        self.path = Path(cache_dir).expanduser() / "token_store.sqlite3"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.fingerprint = db_fingerprint()
+        self.flush_every = flush_every
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+
+        self._conn = None
+        self._pid = None
+        self._pending = []
+
+    def _connection(self):
+        if self._conn is None or self._pid != os.getpid(): # never reuse a connection inherited through fork
+            self._conn = sqlite3.connect(self.path, timeout=self.timeout)
+            self._pid = os.getpid()
+            self._pending = []
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS tokens ("
+                "fingerprint TEXT NOT NULL, key TEXT NOT NULL, result TEXT NOT NULL, events TEXT NOT NULL, "
+                "PRIMARY KEY (fingerprint, key)) WITHOUT ROWID"
+            )
+        return self._conn
+
+    def prune(self):
+        '''
+        Deletes the entries of every other fingerprint, i.e. of other versions of the databases or rules. Returns how many.
+        Only run it when no other version is using the same store.
+        '''
+        self.flush()
+        with self._connection() as conn:
+            pruned = conn.execute("DELETE FROM tokens WHERE fingerprint != ?", (self.fingerprint,)).rowcount
+        logging.info(f"Token store: pruned {pruned} stale entries from {self.path}")
+        return pruned
+
+    @staticmethod
+    def encode_key(key):
+        return json.dumps(key, ensure_ascii=False, separators=(",", ":"))
+
+    def get(self, key):
+        row = self._connection().execute(
+            "SELECT result, events FROM tokens WHERE fingerprint = ? AND key = ?",
+            (self.fingerprint, self.encode_key(key)),
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        result, events = row
+        return result, [tuple(event) for event in json.loads(events)]
+
+    def put(self, key, result, events):
+        self._connection()
+        self._pending.append((self.fingerprint, self.encode_key(key), result, json.dumps(events, ensure_ascii=False)))
+        if len(self._pending) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        '''
+        Write buffered entries in one transaction. Concurrent writers of the same key simply keep the first row.
+        '''
+        if not self._pending or self._conn is None or self._pid != os.getpid():
+            return
+        with self._conn:
+            self._conn.executemany("INSERT OR IGNORE INTO tokens VALUES (?, ?, ?, ?)", self._pending)
+        self._pending = []
+
+    def close(self):
+        self.flush()
+        if self._conn is not None and self._pid == os.getpid():
+            self._conn.close()
+        self._conn = None
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM tokens WHERE fingerprint = ?", (self.fingerprint,)).fetchone()[0]
+
+    def __repr__(self):
+        return f"TokenStore(path={str(self.path)!r}, hits={self.hits}, misses={self.misses})"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the on-disk token store")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    prune_parser = subparsers.add_parser("prune", help="Delete the entries of other versions of the databases and rules")
+    prune_parser.add_argument("cache_dir")
+    args = parser.parse_args()
+
+    store = TokenStore(args.cache_dir)
+    print(f"Pruned {store.prune()} stale entries from {store.path}")
+    store.close()
@@ -0,0 +1,231 @@
+'''
+Immutable analyses of (partially) macronized word forms, passed from module to module by Macronizer.macronization_modules.
+
+A WordAnalysis is a word as its base string (without ^ and _) plus one mark per base character (see format_macrons.py).
+Merging the markup of a module into it gives a new WordAnalysis with the same base, so everything that depends on the base alone
+(its syllables, which of them are open syllables with a real dichronon, its accent class) is computed once per distinct base and shared
+by all its markings; after a merge only the marks are looked at again. The cascade, apply_accentuation_rules and the sanity check all
+read from it, and macronize_token renders the ^/_ string (word) once, when the modules are done:
+
+    >>> a = analyze('ἀγαθῆς')
+    >>> a.open_dichrona
+    2
+    >>> b = a.merge('ἀ^γαθῆς')
+    >>> b.word, b.syllables, b.open_dichrona
+    ('ἀ^γαθῆς', ('ἀ^', 'γα', 'θῆς'), 1)
+
+Open dichrona are counted from the marks whenever the base is a single word whose syllables tile it (syllabification does not
+depend on the markup); anything else (punctuation, several words in synapheia) is counted on the rendered string, as before.
+'''
+
+from functools import cached_property, lru_cache
+import re
+import unicodedata
+
+from grc_utils import (count_dichrona_in_open_syllables, normalize_word, open_syllable_in_word, oxia_to_tonos, paroxytone,
+                       proparoxytone, properispomenon, syllabifier, vowel, word_with_real_dichrona)
+
+from .format_macrons import join_markup, merge_marks, split_markup
+
+class BaseAnalysis:
+    '''
+    What holds for every marking of a base string.
+    '''
+
+    def __init__(self, base):
+        self.base = base
+
+    @cached_property
+    def spans(self):
+        '''
+        (start, end) of every syllable in the base, or None if the syllables do not add up to the base.
+        '''
+        syllables = syllabifier(self.base) or []
+        if ''.join(syllables) != self.base:
+            return None
+        spans = []
+        start = 0
+        for syllable in syllables:
+            spans.append((start, start + len(syllable)))
+            start += len(syllable)
+        return tuple(spans)
+
+    @cached_property
+    def open_dichrona_spans(self):
+        '''
+        The spans of the open syllables with a real dichronon, i.e. the syllables count_dichrona_in_open_syllables counts as long as
+        they have no markup; None where the count has to be made on the rendered string.
+        '''
+        normalized = unicodedata.normalize('NFC', oxia_to_tonos(self.base))
+        if len(normalized) != len(self.base):
+            return None
+        words = [match for match in re.finditer(r'\w+', normalized) if any(vowel(char) for char in match.group())]
+        if not words:
+            return ()
+        if len(words) > 1: # in synapheia, a syllable is open or not depending on the next word
+            return None
+
+        word = words[0].group()
+        syllables = syllabifier(word)
+        if ''.join(syllables) != word:
+            return None
+        spans = []
+        start = words[0].start()
+        for syllable in syllables:
+            if word_with_real_dichrona(syllable) and open_syllable_in_word(syllable, syllables):
+                spans.append((start, start + len(syllable)))
+            start += len(syllable)
+        return tuple(spans)
+
+    @cached_property
+    def normalized(self):
+        return normalize_word(self.base)
+
+    # Accent class. A word can be in more than one class (e.g. with two accents)
+
+    @cached_property
+    def paroxytone(self):
+        return paroxytone(self.base)
+
+    @cached_property
+    def proparoxytone(self):
+        return proparoxytone(self.base)
+
+    @cached_property
+    def properispomenon(self):
+        return properispomenon(self.base)
+
+@lru_cache(maxsize=2**16)
+def base_analysis(base):
+    return BaseAnalysis(base)
+
+class WordAnalysis:
+    '''
+    A word form as its base string and its marks (bytes, one per base character). Never changed once made: merge and the other
+    methods return new WordAnalyses.
+    '''
+
+    def __init__(self, base, marks, word=None):
+        self.base = base
+        self.marks = marks
+        self.analysis = base_analysis(base)
+        if word is not None: # the string this was parsed from, so that rendering gives back exactly what was read
+            self.word = word
+
+    @cached_property
+    def word(self):
+        '''
+        The word with ^ and _ markup.
+        '''
+        return join_markup(self.base, self.marks)
+
+    @cached_property
+    def syllables(self):
+        '''
+        The syllables of the word, with their markup.
+        '''
+        spans = self.analysis.spans
+        if spans is None:
+            return tuple(syllabifier(self.word))
+        return tuple(join_markup(self.base[start:end], self.marks[start:end]) for start, end in spans)
+
+    @cached_property
+    def open_dichrona(self):
+        '''
+        Number of unmarked dichrona in open syllables, i.e. what is left to macronize.
+        '''
+        spans = self.analysis.open_dichrona_spans
+        if spans is None:
+            return count_dichrona_in_open_syllables(self.word)
+        return sum(1 for start, end in spans if not any(self.marks[start:end]))
+
+    @property
+    def paroxytone(self):
+        return self.analysis.paroxytone
+
+    @property
+    def proparoxytone(self):
+        return self.analysis.proparoxytone
+
+    @property
+    def properispomenon(self):
+        return self.analysis.properispomenon
+
+    def merge(self, new_version, precedence='new'):
+        '''
+        The analysis of merge_or_overwrite_markup(new_version, self.word, precedence), new_version being a string with markup
+        or a WordAnalysis: self if new_version is empty or another word, else the new base with the merged marks.
+        '''
+        if not new_version:
+            return self
+        new = analyze(new_version)
+        if not self:
+            return new
+        if new.base != self.base and new.analysis.normalized != self.analysis.normalized:
+            return self
+        return WordAnalysis(new.base, merge_marks(new.marks, self.marks, precedence))
+
+    def with_mark(self, position, mark):
+        '''
+        The analysis with the mark of the base character at position replaced.
+        '''
+        marks = bytearray(self.marks)
+        marks[position] = mark
+        return WordAnalysis(self.base, bytes(marks))
+
+    def unmark_syllables(self, indices):
+        '''
+        The analysis without the markup of the syllables at indices.
+        '''
+        spans = self.analysis.spans
+        if spans is None: # as the sanity check always did it, on the syllables of the rendered word
+            syllables = [syllable.replace('^', '').replace('_', '') if i in indices else syllable for i, syllable in enumerate(self.syllables)]
+            return analyze(''.join(syllables))
+        if not indices:
+            return self
+        marks = bytearray(self.marks)
+        for i in indices:
+            start, end = spans[i]
+            marks[start:end] = bytes(end - start)
+        return WordAnalysis(self.base, bytes(marks))
+
+    def normalized(self):
+        '''
+        The analysis of normalize_word(self.word).
+        '''
+        if self.analysis.normalized == self.base: # the markup is never touched by the normalization
+            return self
+        return analyze(normalize_word(self.word))
+
+    def __bool__(self):
+        return bool(self.base) or bool(self.word)
+
+    def __eq__(self, other):
+        if isinstance(other, WordAnalysis):
+            return self.base == other.base and self.marks == other.marks
+        return NotImplemented
+
+    def __hash__(self):
+        return hash((self.base, self.marks))
+
+    def __repr__(self):
+        return f"WordAnalysis({self.word!r})"
+
+@lru_cache(maxsize=2**16)
+def _analyze(word):
+    base, marks = split_markup(word)
+    return WordAnalysis(base, marks, word)
+
+def analyze(word):
+    '''
+    The WordAnalysis of word, a string with ^/_ markup; a WordAnalysis is returned as it is.
+    '''
+    if isinstance(word, WordAnalysis):
+        return word
+    return _analyze(word)
+
+def open_dichrona(word):
+    '''
+    Equivalent of grc_utils.count_dichrona_in_open_syllables for a single word (a string or a WordAnalysis).
+    '''
+    return analyze(word).open_dichrona
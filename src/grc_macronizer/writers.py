@@ -0,0 +1,134 @@
+'''
+Token-aligned output, written one sentence at a time.
+
+Instead of a re-rendered string that downstream tools have to tokenize again, Macronizer.write_macronized emits every
+sentence as soon as it is macronized, either as CoNLL-U, with the macronized form in the MISC column,
+
+    # sent_id = 1
+    # text = Δαρείου καὶ Παρυσάτιδος γίγνονται παῖδες δύο, ...
+    # macronized_text = Δα_ρείου καὶ Πα^ρυ^σά_τι^δος γίγνονται παῖδες δύ^ο, ...
+    1	Δαρείου	Δαρεῖος	PROPN	_	Case=Gen|Gender=Masc|Number=Sing	_	_	_	Macronized=Δα_ρείου|LengthSource=wiktionary
+    2	καὶ	καί	CCONJ	_	_	_	_	_	_
+
+or as JSON lines, one object per sentence with the same information.
+
+LengthSource names the module that decided each vowel length, one entry per ^ or _ in Macronized, in order
+(the module names are those of class_macronizer.MODULES). Lengths that were already marked when the token reached the modules,
+such as that of ἂν, are from "preprocessing"; "other" is for lengths the modules did not report, e.g. the ἄλλα special case.
+'''
+
+from collections import namedtuple
+import json
+from pathlib import Path
+
+from grc_utils import only_bases
+
+from .format_macrons import NO_MARK, split_markup
+
+MacronizedToken = namedtuple("MacronizedToken", ["form", "lemma", "upos", "feats", "space_after", "macronized", "sources"])
+MacronizedSentence = namedtuple("MacronizedSentence", ["sent_id", "text", "macronized_text", "tokens"])
+
+def length_sources(token, result, events):
+    '''
+    The module that decided each vowel length of result, one per mark of result, in order.
+    events are the (module, token after the module) pairs reported by macronization_modules; the first module
+    whose token has a mark is credited with it.
+    '''
+    base, marks = split_markup(result)
+    sources = [None] * len(marks)
+
+    token_base, token_marks = split_markup(token)
+    if token_base == base:
+        for i, mark in enumerate(token_marks):
+            if mark != NO_MARK and mark == marks[i]:
+                sources[i] = "preprocessing"
+
+    # Events on the word itself first; then those of recursive passes on variants of it (oxytonized, decapitalized, ...),
+    # which the passes do not always report again after merging their result back
+    variant = only_bases(base).lower()
+    for exact in (True, False):
+        for module, module_token in events:
+            module_base, module_marks = split_markup(module_token)
+            if exact and module_base != base:
+                continue
+            if not exact and (len(module_base) != len(base) or only_bases(module_base).lower() != variant):
+                continue
+            for i, mark in enumerate(module_marks):
+                if mark != NO_MARK and sources[i] is None and mark == marks[i]:
+                    sources[i] = module
+
+    return [source or "other" for source, mark in zip(sources, marks) if mark != NO_MARK]
+
+def one_line(text):
+    '''
+    A sentence text as a single line: sentences that do not end in punctuation keep the line breaks after them.
+    '''
+    return " ".join(text.split())
+
+def word_tokens(sentence):
+    '''
+    The tokens of a sentence without the whitespace tokens spaCy makes of line breaks, which are not words (and cannot be CoNLL-U FORMs).
+    '''
+    return [token for token in sentence.tokens if token.form.strip()]
+
+class ConlluWriter:
+    '''
+    Writes MacronizedSentences as CoNLL-U to a path or an open text file, flushing after every sentence.
+    '''
+
+    def __init__(self, out):
+        self._owns_file = isinstance(out, (str, Path))
+        self.file = open(out, "w", encoding="utf-8") if self._owns_file else out
+        self.sentences = 0
+
+    def write(self, sentence):
+        lines = [f"# sent_id = {sentence.sent_id}", f"# text = {one_line(sentence.text)}", f"# macronized_text = {one_line(sentence.macronized_text)}"]
+        for i, token in enumerate(word_tokens(sentence), start=1):
+            misc = []
+            if not token.space_after:
+                misc.append("SpaceAfter=No")
+            if token.macronized is not None and token.macronized != token.form:
+                misc.append(f"Macronized={token.macronized}")
+                if token.sources:
+                    misc.append(f"LengthSource={','.join(token.sources)}")
+            columns = [str(i), token.form, token.lemma or "_", token.upos or "_", "_", token.feats or "_", "_", "_", "_", "|".join(misc) or "_"]
+            lines.append("\t".join(columns))
+        self.file.write("\n".join(lines) + "\n\n")
+        self.file.flush()
+        self.sentences += 1
+
+    def close(self):
+        if self._owns_file:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+class JsonlWriter(ConlluWriter):
+    '''
+    Writes MacronizedSentences as JSON lines, one object per sentence.
+    '''
+
+    def write(self, sentence):
+        record = {
+            "sent_id": sentence.sent_id,
+            "text": one_line(sentence.text),
+            "macronized_text": one_line(sentence.macronized_text),
+            "tokens": [token._asdict() for token in word_tokens(sentence)],
+        }
+        self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.file.flush()
+        self.sentences += 1
+
+WRITERS = {
+    "conllu": ConlluWriter,
+    "jsonl": JsonlWriter,
+}
+
+def open_writer(out, format="conllu"):
+    if format not in WRITERS:
+        raise ValueError(f"Unknown output format {format!r}; choose one of {', '.join(WRITERS)}")
+    return WRITERS[format](out)